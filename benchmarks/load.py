@@ -0,0 +1,192 @@
+import os
+import io
+import sys
+import time
+import random
+import argparse
+import threading
+import contextlib
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data.fetchers.replay import ReplayProvider, ReplayClock, replaying
+
+# Load and latency driver on a replayed market (see `data.fetchers.replay`). Run from the
+# repository root:
+#
+#   python -m benchmarks.load sessions --sessions 1 10 50 --latency 0.2 --error-rate 0.02
+#   python -m benchmarks.load alerts --tickers 30 --speed 60 --poll 60
+#
+# `sessions` runs N concurrent dashboard sessions (threads, as under Streamlit) through one
+# screener scan and a few detail views each, from a cold shared cache, and reports latency
+# percentiles per action. `alerts` replays today's session bar by bar, polls the notifier on
+# the replay clock and reports how long after a crossover bar closed its alert went out, in
+# market time (processing time is stretched by the replay speed, so keep it modest).
+
+
+def percentiles(seconds):
+    values = np.asarray(seconds, dtype=np.float64) * 1000
+    if not len(values):
+        return {"count": 0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {"count": len(values), "p50_ms": float(p50), "p90_ms": float(p90), "p99_ms": float(p99), "max_ms": float(values.max())}
+
+
+def scan(tickers):
+    """The Screener's Trend-Following scan, as `ui.dashboard` runs it."""
+    from data.bar_cache import shared_bars
+    from strategies.latest_bar import analyze_stock_latest, market_index_for
+    failed = 0
+    for ticker in tickers:
+        try:
+            data = shared_bars(ticker, period="1y")
+            if not data.empty and len(data) > 50:
+                analyze_stock_latest(data, ticker, shared_bars(market_index_for(ticker), period="3mo"))
+        except Exception:
+            failed += 1
+    return failed
+
+
+def detail(ticker):
+    """The detail view's fetch and full-history analysis."""
+    from data.bar_cache import shared_bars
+    from data.fetchers.scheduler import INTERACTIVE
+    from strategies.advanced_analyzer import analyze_stock
+    data = shared_bars(ticker, priority=INTERACTIVE)
+    if data.empty:
+        raise LookupError(f"No data for {ticker}")
+    analyze_stock(data, ticker)
+
+
+def run_sessions(n_sessions, tickers, details=3, seed=0):
+    """Starts `n_sessions` sessions at once; returns action -> latencies and failure counts."""
+    timings, failures, lock = {"scan": [], "detail": []}, {"scan": 0, "detail": 0}, threading.Lock()
+    start = threading.Barrier(n_sessions)
+
+    def session(i):
+        rng = random.Random(seed + i)
+        start.wait()
+        t0 = time.perf_counter()
+        failed = scan(tickers)
+        with lock:
+            timings["scan"].append(time.perf_counter() - t0)
+            failures["scan"] += failed
+        for ticker in rng.sample(tickers, min(details, len(tickers))):
+            t0 = time.perf_counter()
+            try:
+                detail(ticker)
+            except Exception:
+                with lock:
+                    failures["detail"] += 1
+                continue
+            with lock:
+                timings["detail"].append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(n_sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, failures
+
+
+def sessions_command(args):
+    from data.bar_cache import default_cache
+    from data.fetchers.scheduler import default_scheduler, TokenBucket
+    provider = ReplayProvider.from_synthetic(n_tickers=args.tickers, intraday_days=0, seed=args.seed, latency=args.latency,
+                                             error_rate=args.error_rate, rate_limit=args.rate_limit)
+    tickers = [t for t in provider.daily if t.startswith("SYN")]
+    if args.client_rate:
+        default_scheduler.buckets["yfinance"] = TokenBucket(*args.client_rate)
+    rows = []
+    with replaying(provider):
+        for n in args.sessions:
+            default_cache.clear()
+            requests_before, coalesced_before = len(provider.requests), default_scheduler.coalesced
+            started = time.perf_counter()
+            timings, failures = run_sessions(n, tickers, args.details, args.seed)
+            wall = time.perf_counter() - started
+            for action, seconds in timings.items():
+                rows.append({"sessions": n, "action": action, **percentiles(seconds), "failed": failures[action],
+                             "wall_s": wall, "requests": len(provider.requests) - requests_before,
+                             "coalesced": default_scheduler.coalesced - coalesced_before})
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f"{v:.1f}"))
+    print("\nProvider:", {k: round(v, 1) if isinstance(v, float) else v for k, v in provider.stats().items()})
+
+
+def alerts_command(args):
+    from notifier import check_for_strong_buys, SIGNAL_TIMEFRAME
+    from strategies.moving_average import generate_signals
+    from data.bar_store import resample_bars
+    from data.fetchers.scheduler import default_scheduler, TokenBucket
+    session_open = pd.Timestamp.now(tz="Europe/Stockholm").normalize() + pd.Timedelta(hours=9)
+    provider = ReplayProvider.from_synthetic(n_tickers=args.tickers, intraday_days=2, seed=args.seed,
+                                             latency=args.latency, error_rate=args.error_rate, rate_limit=args.rate_limit)
+    tickers = [t for t in provider.daily if t.startswith("SYN")]
+    # Rate limits hold in market time, otherwise waiting on tokens would be stretched by the speed too
+    client = default_scheduler.buckets["yfinance"]
+    default_scheduler.buckets["yfinance"] = TokenBucket(client.rate * args.speed, client.capacity)
+    if provider.bucket is not None:
+        provider.bucket = TokenBucket(provider.bucket.rate * args.speed, provider.bucket.capacity)
+    if not tickers or session_open.normalize().tz_localize(None) not in provider.daily[tickers[0]].index:
+        print("Today is not a (synthetic) trading day; nothing to replay.")
+        return
+    bar = pd.Timedelta(SIGNAL_TIMEFRAME.replace("m", "min"))
+    session_close = session_open + pd.Timedelta(hours=8, minutes=30)
+
+    # Every crossover of the session on the full day's bars, with the time its bar closed
+    expected = {}
+    for ticker in tickers:
+        bars = provider.intraday[ticker]
+        if SIGNAL_TIMEFRAME != "5m":
+            bars = resample_bars(bars, SIGNAL_TIMEFRAME)
+        buys = generate_signals(bars)
+        buys = buys[(buys['Position'] == 2) & (buys.index >= session_open)]
+        expected.update({(ticker, t): t + bar for t in buys.index})
+
+    detected, polls = {}, []
+    clock = provider.clock = ReplayClock(session_open, speed=args.speed)
+
+    def record(ticker, price, signal_time):
+        detected.setdefault((ticker, signal_time), clock.now())
+
+    with replaying(provider):
+        while clock.now() < session_close + bar:
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                check_for_strong_buys(tickers, now=clock.now(), notify=record)
+            polls.append(time.perf_counter() - t0)
+            clock.sleep_until(clock.now() + pd.Timedelta(seconds=args.poll))
+
+    delays = [(detected[key] - closed).total_seconds() for key, closed in expected.items() if key in detected]
+    print(f"Replayed {session_open:%Y-%m-%d %H:%M}-{session_close:%H:%M} at {args.speed:g}x, polling every {args.poll}s of market time")
+    print(f"Crossovers: {len(expected)}  alerted: {len(delays)}  missed: {len(expected) - len(delays)}  "
+          f"unexpected: {len(set(detected) - set(expected))}")
+    if delays:
+        p50, p90, p99 = np.percentile(delays, [50, 90, 99])
+        print(f"Alert latency after bar close (market s): p50 {p50:.0f}  p90 {p90:.0f}  p99 {p99:.0f}  max {max(delays):.0f}")
+    print("Poll wall time:", {k: round(v, 1) for k, v in percentiles(polls).items()})
+    print("Provider:", {k: round(v, 1) if isinstance(v, float) else v for k, v in provider.stats().items()})
+
+
+if __name__ == '__main__':
+    provider = argparse.ArgumentParser(add_help=False)
+    provider.add_argument("--latency", type=float, default=0.05, help="Mean provider latency per request, seconds")
+    provider.add_argument("--error-rate", type=float, default=0.0, help="Share of provider requests that fail")
+    provider.add_argument("--rate-limit", type=float, nargs=2, metavar=("RATE", "BURST"), help="Provider-side limit (requests/s, burst)")
+    provider.add_argument("--seed", type=int, default=0)
+    parser = argparse.ArgumentParser(description="Drive the dashboard's data paths and the notifier against a replayed market.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sessions = commands.add_parser("sessions", parents=[provider], help="Concurrent dashboard sessions")
+    sessions.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50])
+    sessions.add_argument("--tickers", type=int, default=30, help="Tickers in the scanned index")
+    sessions.add_argument("--details", type=int, default=3, help="Detail views opened per session")
+    sessions.add_argument("--client-rate", type=float, nargs=2, metavar=("RATE", "BURST"),
+                          help="Override the scheduler's yfinance limit (requests/s, burst) to see what it costs")
+    alerts = commands.add_parser("alerts", parents=[provider], help="Alert latency of notifier.py over a replayed session")
+    alerts.add_argument("--tickers", type=int, default=30)
+    alerts.add_argument("--speed", type=float, default=60.0, help="Market seconds per wall second")
+    alerts.add_argument("--poll", type=int, default=60, help="Market seconds between notifier runs")
+    args = parser.parse_args()
+    (sessions_command if args.command == "sessions" else alerts_command)(args)
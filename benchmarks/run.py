@@ -0,0 +1,254 @@
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import platform
+import contextlib
+import tracemalloc
+import warnings
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import synthetic_universe, offline, MARKET_INDEX
+
+# Benchmark suite for the analysis hot paths on synthetic universes, with the network
+# fetchers replaced by local lookups. Run from the repository root:
+#
+#   python -m benchmarks.run --sizes 30 300 3000                 # compare against the baseline
+#   python -m benchmarks.run --sizes 30 300 --update-baseline    # record a new baseline
+#
+# Wall time is the best of `--repeat` runs; peak memory is measured in a separate traced
+# run (tracemalloc sees Python and NumPy allocations) so tracing does not distort timings.
+
+DEFAULT_SIZES = [30, 300, 3000]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def _train_model(universe, tickers):
+    """Small fixed model on synthetic features, so ML timings do not depend on the model in the registry."""
+    import xgboost as xgb
+    from ml.trainer import build_features
+    features = pd.concat([build_features(universe[t]) for t in tickers[:20]])
+    target = features.pop('Target')
+    model = xgb.XGBClassifier(n_estimators=100, max_depth=5, random_state=0, n_jobs=1)
+    return model.fit(features.select_dtypes(include=['number']), target)
+
+
+def bench_analyze_stock(universe, tickers):
+    from strategies.advanced_analyzer import analyze_stock
+    return lambda: [analyze_stock(universe[t], t) for t in tickers]
+
+
+def bench_analyze_stock_mean_reversion(universe, tickers):
+    from strategies.mean_reversion_analyzer import analyze_stock_mean_reversion
+    return lambda: [analyze_stock_mean_reversion(universe[t]) for t in tickers]
+
+
+def bench_generate_signals(universe, tickers):
+    from strategies.moving_average import generate_signals
+    return lambda: [generate_signals(universe[t]) for t in tickers]
+
+
+def bench_analyze_stock_ml(universe, tickers):
+    from strategies.advanced_analyzer import analyze_stock_ml
+    model = _train_model(universe, tickers)
+    return lambda: [analyze_stock_ml(universe[t], model) for t in tickers]
+
+
+def bench_explain_ml_batch(universe, tickers):
+    from strategies.advanced_analyzer import ml_features, explain_ml_batch
+    model = _train_model(universe, tickers)
+    names = model.get_booster().feature_names
+    features = pd.concat([ml_features(universe[t], names).set_axis([t]) for t in tickers])
+    return lambda: explain_ml_batch(features, model)
+
+
+def bench_find_cointegrated_pairs(universe, tickers):
+    from strategies.pairs_trading_analyzer import find_cointegrated_pairs
+    # Bypass st.cache_data so every repeat does the work
+    return lambda: find_cointegrated_pairs.__wrapped__(list(tickers))
+
+
+@contextlib.contextmanager
+def backtesting_quiet():
+    """Silences backtesting.py's warnings for the calls inside only; other benchmarks keep theirs."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        warnings.filterwarnings("ignore", module="backtesting")
+        yield
+
+
+def bench_run_backtest(universe, tickers):
+    from strategies.backtest import run_backtest
+    index = universe[MARKET_INDEX].index
+    start, end = index[-2 * 252].date(), index[-1].date()
+
+    def run():
+        with backtesting_quiet():
+            return [run_backtest(t, start, end, strategy) for t in tickers for strategy in ("Trend-Following", "Mean-Reversion")]
+    return run
+
+
+def bench_sharded_scan(universe, tickers):
+    from screening.sharding import run_sharded, make_executor
+    bars = {t: universe[t] for t in tickers + [MARKET_INDEX]}
+    # Spawning the workers is a one-off cost of a long-lived pool, so it is paid before timing
+    executor = make_executor()
+    run_sharded({t: bars[t] for t in tickers[:1]}, tickers=tickers[:1], executor=executor)
+    return lambda: run_sharded(bars, "Trend-Following", tickers=tickers, executor=executor)
+
+
+def bench_monte_carlo(universe, tickers):
+    from backtesting import Backtest
+    from strategies.backtest import MeanReversionStrategy
+    from strategies.monte_carlo import monte_carlo
+    with backtesting_quiet():
+        runs = [Backtest(universe[t], MeanReversionStrategy, cash=100000, commission=.002, finalize_trades=True).run() for t in tickers]
+    return lambda: [monte_carlo(stats, n_paths=20000, seed=0) for stats in runs]
+
+
+def bench_plot_stock_chart(universe, tickers):
+    from strategies.advanced_analyzer import analyze_stock
+    from ui.dashboard import plot_stock_chart
+    analyzed = {t: analyze_stock(universe[t], t) for t in tickers}
+    # Serialising the figure is what Streamlit does with it, so it is part of the render cost
+    return lambda: [plot_stock_chart(analyzed[t], t).to_json() for t in tickers]
+
+
+# name -> (factory(universe, tickers) returning the timed callable, ticker cap unless --full)
+# Pair scanning is quadratic and backtests/charts are per-ticker interactive actions, so by
+# default they run on a capped slice of each universe; the cap is recorded with the result.
+BENCHMARKS = {
+    "analyze_stock": (bench_analyze_stock, None),
+    "analyze_stock_mean_reversion": (bench_analyze_stock_mean_reversion, None),
+    "generate_signals": (bench_generate_signals, None),
+    "analyze_stock_ml": (bench_analyze_stock_ml, None),
+    "explain_ml_batch": (bench_explain_ml_batch, None),
+    "find_cointegrated_pairs": (bench_find_cointegrated_pairs, 40),
+    "run_backtest": (bench_run_backtest, 5),
+    "plot_stock_chart": (bench_plot_stock_chart, 30),
+    "sharded_scan": (bench_sharded_scan, None),
+    "monte_carlo": (bench_monte_carlo, 3),
+}
+
+
+def measure(fn, repeat):
+    """Returns (best wall time in seconds, peak traced memory in MB) for a zero-argument callable."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak / 2 ** 20
+
+
+def run_suite(sizes, names, repeat=3, n_bars=750, seed=0, full=False):
+    results = {}
+    for size in sizes:
+        universe = synthetic_universe(size, n_bars=n_bars, seed=seed)
+        all_tickers = [t for t in universe if t != MARKET_INDEX]
+        with offline(universe):
+            for name in names:
+                factory, cap = BENCHMARKS[name]
+                tickers = all_tickers if full or cap is None else all_tickers[:cap]
+                fn = factory(universe, tickers)
+                # Large universes are timed once; the traced run still follows
+                seconds, peak_mb = measure(fn, repeat if size * len(tickers) <= 300 * 300 else 1)
+                results[f"{name}@{size}"] = {
+                    "name": name, "size": size, "tickers": len(tickers), "seconds": seconds,
+                    "per_ticker_ms": 1000 * seconds / len(tickers), "peak_mb": peak_mb,
+                }
+                print(f"{name:<30} {size:>5} tickers ({len(tickers):>4} run): {seconds:8.3f}s  {peak_mb:9.1f} MB peak")
+    return results
+
+
+def compare(results, baseline, tolerance=0.2, memory_tolerance=0.2, min_seconds=0.05):
+    """
+    Flags results slower (or hungrier) than the baseline by more than the tolerance.
+    Differences below `min_seconds` are treated as timer noise.
+    """
+    rows = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None or base["tickers"] != current["tickers"]:
+            continue
+        time_ratio = current["seconds"] / base["seconds"] if base["seconds"] else np.nan
+        memory_ratio = current["peak_mb"] / base["peak_mb"] if base["peak_mb"] else np.nan
+        slower = time_ratio > 1 + tolerance and current["seconds"] - base["seconds"] > min_seconds
+        rows.append({
+            "Benchmark": key, "Baseline (s)": base["seconds"], "Current (s)": current["seconds"], "Time Ratio": time_ratio,
+            "Baseline (MB)": base["peak_mb"], "Current (MB)": current["peak_mb"], "Memory Ratio": memory_ratio,
+            "Regression": bool(slower or memory_ratio > 1 + memory_tolerance),
+        })
+    return pd.DataFrame(rows)
+
+
+def environment():
+    return {
+        "python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor(),
+        "numpy": np.__version__, "pandas": pd.__version__, "recorded": pd.Timestamp.now().isoformat(timespec="seconds"),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the analysis hot paths on synthetic universes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Universe sizes in tickers")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--bars", type=int, default=750, help="Daily bars per ticker")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--full", action="store_true", help="Run capped benchmarks on the whole universe")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="Write these results into the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown")
+    parser.add_argument("--memory-tolerance", type=float, default=0.2, help="Allowed relative peak-memory growth")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.only, repeat=args.repeat, n_bars=args.bars, seed=args.seed, full=args.full)
+    report = {"environment": environment(), "bars": args.bars, "seed": args.seed, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {"results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update({"environment": report["environment"], "bars": args.bars, "seed": args.seed})
+        baseline["results"].update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\nBaseline updated: '{args.baseline}'")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at '{args.baseline}'; record one with --update-baseline.")
+        sys.exit(0)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if (baseline.get("bars"), baseline.get("seed")) != (args.bars, args.seed):
+        print("\nBaseline was recorded with different --bars/--seed; results are not comparable.")
+        sys.exit(0)
+    table = compare(results, baseline["results"], args.tolerance, args.memory_tolerance)
+    if table.empty:
+        print("\nNothing in the baseline matches these benchmarks.")
+        sys.exit(0)
+    print("\n" + table.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    regressions = table[table["Regression"]]
+    if not regressions.empty:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions['Benchmark'])}")
+        sys.exit(1)
+    print("\nNo regressions.")
@@ -0,0 +1,105 @@
+import contextlib
+import numpy as np
+import pandas as pd
+from data.bar_store import period_start
+
+# Deterministic synthetic OHLCV for benchmarks: geometric Brownian motion driven by a shared
+# market factor, with lognormal volume that rises on large moves. The same seed always gives
+# the same prices; only the calendar moves, so yfinance-style `period` strings keep working.
+
+MARKET_INDEX = '^OMX'
+TRADING_DAYS = 252
+
+
+def synthetic_market(n_bars=750, seed=0, end=None):
+    """Log returns of the shared market factor and the business-day index they are quoted on."""
+    end = pd.Timestamp.now().normalize() if end is None else pd.Timestamp(end)
+    index = pd.bdate_range(end=end, periods=n_bars)
+    returns = np.random.default_rng([seed, 0]).normal(0.0002, 0.01, n_bars)
+    return returns, index
+
+
+def synthetic_bars(i, market_returns, index, seed=0):
+    """OHLCV bars for the `i`-th synthetic ticker."""
+    rng = np.random.default_rng([seed, i + 1])
+    n = len(index)
+    beta, sigma, drift = rng.uniform(0.5, 1.5), rng.uniform(0.01, 0.03), rng.normal(0.0003, 0.0005)
+    log_returns = drift - sigma ** 2 / 2 + beta * market_returns + rng.normal(0, sigma, n)
+    close = rng.uniform(20, 500) * np.exp(np.cumsum(log_returns))
+    gap = rng.normal(0, sigma / 4, n)
+    open_ = np.r_[close[0], close[:-1]] * np.exp(gap)
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, sigma / 2, n)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, sigma / 2, n)))
+    volume = rng.uniform(1e5, 5e6) * np.exp(rng.normal(0, 0.3, n)) * (1 + 20 * np.abs(log_returns))
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume.astype(np.int64)}, index=index)
+
+
+def synthetic_universe(n_tickers, n_bars=750, seed=0, end=None):
+    """Dict of ticker -> OHLCV bars for `n_tickers` synthetic Stockholm-style tickers plus the market index."""
+    market_returns, index = synthetic_market(n_bars, seed, end)
+    universe = {f"SYN{i:04d}.ST": synthetic_bars(i, market_returns, index, seed) for i in range(n_tickers)}
+    level = 2000 * np.exp(np.cumsum(market_returns))
+    universe[MARKET_INDEX] = pd.DataFrame({'Open': level, 'High': level * 1.005, 'Low': level * 0.995, 'Close': level, 'Volume': 0}, index=index)
+    return universe
+
+
+def synthetic_intraday(daily, day, i=0, interval="5m", seed=0, session=("09:00", "17:30"), tz="Europe/Stockholm"):
+    """
+    Intraday bars for one session of a synthetic daily series: a Brownian bridge from the
+    day's open to its close, on an exchange-local index like yfinance's.
+    """
+    day = pd.Timestamp(day).normalize()
+    row = daily.loc[day]
+    index = pd.date_range(f"{day:%Y-%m-%d} {session[0]}", f"{day:%Y-%m-%d} {session[1]}", freq=interval.replace("m", "min"), inclusive="left", tz=tz)
+    n = len(index)
+    rng = np.random.default_rng([seed, i + 1, day.toordinal()])
+    sigma = max(np.log(row['High'] / row['Low']), 1e-4) / 2
+    walk = np.cumsum(rng.normal(0, sigma / np.sqrt(n), n))
+    steps = np.arange(1, n + 1) / n
+    close = np.exp(np.log(row['Open']) + steps * np.log(row['Close'] / row['Open']) + walk - steps * walk[-1])
+    open_ = np.r_[row['Open'], close[:-1]]
+    wick = np.exp(np.abs(rng.normal(0, sigma / (2 * np.sqrt(n)), (2, n))))
+    volume = row['Volume'] / n * np.exp(rng.normal(0, 0.5, n))
+    return pd.DataFrame({'Open': open_, 'High': np.maximum(open_, close) * wick[0], 'Low': np.minimum(open_, close) / wick[1],
+                         'Close': close, 'Volume': volume.astype(np.int64)}, index=index)
+
+
+def make_fetcher(universe):
+    """A local stand-in for `fetch_daily_bars`: single tickers return bars, lists return yfinance-style wide frames."""
+    def fetch_daily_bars(ticker, period="2y", **kwargs):
+        start = period_start(period)
+        if isinstance(ticker, (list, tuple)):
+            frames = {t: universe[t] for t in ticker if t in universe}
+            if not frames:
+                return pd.DataFrame()
+            data = pd.concat(frames, axis=1).swaplevel(0, 1, axis=1).sort_index(axis=1)
+        elif ticker in universe:
+            data = universe[ticker]
+        else:
+            return pd.DataFrame()
+        return (data if start is None else data[data.index >= start]).copy()
+    return fetch_daily_bars
+
+
+# Modules that import `fetch_daily_bars` by name, patched in place by `offline`
+FETCHER_MODULES = ['data.bar_cache', 'strategies.backtest', 'strategies.pairs_trading_analyzer']
+
+
+@contextlib.contextmanager
+def offline(universe):
+    """Replaces the network fetchers of the analysis modules with lookups into `universe`."""
+    import importlib
+    from data.bar_cache import default_cache
+    fetcher = make_fetcher(universe)
+    modules = [importlib.import_module(name) for name in FETCHER_MODULES]
+    originals = [module.fetch_daily_bars for module in modules]
+    for module in modules:
+        module.fetch_daily_bars = fetcher
+    # Bars cached from another universe (or the network) must not leak in or out
+    default_cache.clear()
+    try:
+        yield fetcher
+    finally:
+        for module, original in zip(modules, originals):
+            module.fetch_daily_bars = original
+        default_cache.clear()
@@ -0,0 +1,109 @@
+import time
+import datetime
+import threading
+from functools import lru_cache
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from data.fetchers.scheduler import default_scheduler, fetch_daily_bars, BACKGROUND
+from data.bar_store import period_start, naive_dates
+
+# Process-wide, read-only cache of daily bars shared by every Streamlit session (sessions
+# are threads of one server process). Each ticker's history is held once, as an immutable
+# float64 rows x OHLCV array and its index; every caller gets a new DataFrame wrapping views
+# of those (no copy), and a shorter period is a tail slice of the same arrays. The arrays
+# are flagged read-only, so with copy-on-write an analyzer writing to an OHLCV column gets
+# a private copy of that column and everything else it adds lives in its own arrays.
+
+FIELDS = pd.Index(['Open', 'High', 'Low', 'Close', 'Volume'])
+MIN_PERIOD = "2y"             # loaded at least this far back, so 3mo/6mo/1y/2y share one entry
+DEFAULT_TTL = 900             # seconds before a history is refetched
+DEFAULT_MAX_BYTES = 256 * 2 ** 20
+
+
+@lru_cache(maxsize=64)
+def _period_start(period, today):
+    return period_start(period)
+
+
+def _covers(entry_start, start):
+    # A week of slack for weekends and holidays at the start of the period, as in `load_bars`
+    return entry_start is None or (start is not None and entry_start <= start + pd.Timedelta(days=7))
+
+
+class SharedBarCache:
+    """Read-only daily bars keyed by ticker, expiring after `ttl` seconds and bounded by `max_bytes` (LRU)."""
+    def __init__(self, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl, self.max_bytes = ttl, max_bytes
+        self._entries = OrderedDict()    # ticker -> (period start, index, naive dates, values, loaded at)
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _load(self, ticker, period, priority):
+        # Identical in-flight fetches from other sessions are coalesced by the scheduler. The
+        # result is not copied per caller here because it is packed into the cache's own arrays.
+        data = default_scheduler.submit("yfinance", fetch_daily_bars, ticker, period=period, priority=priority).result()
+        if data is None or data.empty:
+            return None
+        data = data[~data.index.duplicated(keep='last')].sort_index()
+        values = np.ascontiguousarray(data.reindex(columns=FIELDS).to_numpy(dtype=np.float64))
+        values.setflags(write=False)
+        return (_period_start(period, datetime.date.today()), data.index, naive_dates(data.index).to_numpy(), values, time.monotonic())
+
+    def get(self, ticker, period=MIN_PERIOD, priority=BACKGROUND):
+        """Bars for `period` as a DataFrame of read-only views; empty when nothing could be fetched."""
+        # Period starts only move once a day, and the hit path should cost no more than building the frame
+        start = _period_start(period, datetime.date.today())
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is not None and _covers(entry[0], start) and time.monotonic() - entry[4] < self.ttl:
+                self._entries.move_to_end(ticker)
+                self.hits += 1
+            else:
+                entry = None
+                self.misses += 1
+
+        if entry is None:
+            load_period = period if start is None or start < _period_start(MIN_PERIOD, datetime.date.today()) else MIN_PERIOD
+            entry = self._load(ticker, load_period, priority)
+            if entry is None:
+                return pd.DataFrame()
+            with self._lock:
+                replaced = self._entries.pop(ticker, None)
+                if replaced is not None:
+                    self._nbytes -= self._entry_bytes(replaced)
+                self._entries[ticker] = entry
+                self._nbytes += self._entry_bytes(entry)
+                self._evict()
+
+        _, index, dates, values, _ = entry
+        first = 0 if start is None else int(np.searchsorted(dates, start.to_datetime64()))
+        return pd.DataFrame(values[first:], index=index[first:], columns=FIELDS, copy=False)
+
+    @staticmethod
+    def _entry_bytes(entry):
+        _, index, dates, values, _ = entry
+        return index.nbytes + dates.nbytes + values.nbytes
+
+    def _evict(self):
+        while len(self._entries) > 1 and self._nbytes > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            self._nbytes -= self._entry_bytes(entry)
+
+    def stats(self):
+        with self._lock:
+            return {"tickers": len(self._entries), "mb": self._nbytes / 2 ** 20, "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+
+default_cache = SharedBarCache()
+
+
+def shared_bars(ticker, period=MIN_PERIOD, priority=BACKGROUND):
+    """Daily bars from the process-wide cache. The frame shares its OHLCV arrays with every other caller."""
+    return default_cache.get(ticker, period=period, priority=priority)
@@ -0,0 +1,211 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from data.fetchers.scheduler import fetch_bars, fetch_intraday, BACKGROUND
+
+# Local on-disk store of daily OHLCV bars so repeated reads (portfolio valuation,
+# equity curves, training) do not go back to the network for every ticker.
+STORE_DIR = os.environ.get(
+    "BAR_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "store")
+)
+MAX_AGE_HOURS = 12
+
+# Exchange suffix -> trading currency. Avoids a slow `yf.Ticker().info` call per holding.
+SUFFIX_CURRENCIES = {
+    '.ST': 'SEK', '.CO': 'DKK', '.HE': 'EUR', '.OL': 'NOK', '.IC': 'ISK',
+    '.TO': 'CAD', '.V': 'CAD', '.NE': 'CAD', '.L': 'GBP', '.DE': 'EUR', '.PA': 'EUR', '.AS': 'EUR'
+}
+
+PERIOD_OFFSETS = {'d': 'days', 'wk': 'weeks', 'mo': 'months', 'y': 'years'}
+
+
+def period_start(period):
+    """Converts a yfinance-style period string ('5d', '6mo', '2y', 'max') to a start timestamp."""
+    if period == "max":
+        return None
+    for suffix in ('wk', 'mo', 'd', 'y'):
+        if period.endswith(suffix):
+            amount = int(period[:-len(suffix)])
+            return pd.Timestamp.now().normalize() - pd.DateOffset(**{PERIOD_OFFSETS[suffix]: amount})
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def naive_dates(index):
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
+
+
+def to_daily_index(data):
+    """Drops the exchange timezone and time of day so bars from different markets align by date."""
+    data = data.copy()
+    data.index = naive_dates(data.index)
+    return data[~data.index.duplicated(keep='last')]
+
+
+def bar_path(ticker, interval="1d"):
+    safe_name = ticker.replace('^', '_').replace('=', '_').replace('/', '_')
+    return os.path.join(STORE_DIR, interval, f"{safe_name}.pkl")
+
+
+def _is_fresh(path, max_age_hours):
+    return os.path.exists(path) and (time.time() - os.path.getmtime(path)) < max_age_hours * 3600
+
+
+def load_bars(ticker, period="2y", max_age_hours=MAX_AGE_HOURS):
+    """
+    Returns daily OHLCV bars for a ticker from the local store, refreshing from
+    yfinance when the stored copy is missing, stale or shorter than `period`.
+    """
+    path = bar_path(ticker)
+    start = period_start(period)
+    stored = pd.read_pickle(path) if os.path.exists(path) else pd.DataFrame()
+
+    covers_period = not stored.empty and (start is None or naive_dates(stored.index)[0] <= start + pd.Timedelta(days=7))
+    if not (covers_period and _is_fresh(path, max_age_hours)):
+        try:
+            fetched = fetch_bars(ticker, period=period if not covers_period else "1mo")
+        except Exception:
+            fetched = pd.DataFrame()
+        if not fetched.empty:
+            stored = fetched if stored.empty else pd.concat([stored[~stored.index.isin(fetched.index)], fetched]).sort_index()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            stored.to_pickle(path)
+
+    if stored.empty or start is None:
+        return stored
+    return stored[naive_dates(stored.index) >= start]
+
+
+def get_close_panel(tickers, period="2y"):
+    """Returns a date x ticker DataFrame of closing prices, aligned and forward-filled."""
+    closes = {}
+    for ticker in dict.fromkeys(tickers):
+        bars = load_bars(ticker, period=period)
+        if not bars.empty:
+            closes[ticker] = to_daily_index(bars)['Close']
+    if not closes:
+        return pd.DataFrame(columns=list(tickers))
+    return pd.DataFrame(closes).sort_index().ffill().reindex(columns=list(dict.fromkeys(tickers)))
+
+
+def get_fx_panel(currencies, to_currency="SEK", period="2y", index=None):
+    """Returns a date x currency DataFrame of conversion rates into `to_currency`."""
+    rates = {}
+    for currency in dict.fromkeys(currencies):
+        if currency == to_currency:
+            continue
+        bars = load_bars(f"{currency}{to_currency}=X", period=period)
+        if not bars.empty:
+            rates[currency] = to_daily_index(bars)['Close']
+    panel = pd.DataFrame(rates).sort_index() if rates else pd.DataFrame(index=pd.DatetimeIndex([]))
+    if index is not None:
+        panel = panel.reindex(panel.index.union(index)).ffill().bfill().reindex(index)
+    panel = panel.reindex(columns=list(dict.fromkeys(currencies)))
+    if to_currency in panel.columns:
+        panel[to_currency] = 1.0
+    # Missing FX history falls back to 1.0, matching `get_fx_rate` callers in the dashboard.
+    return panel.fillna(1.0)
+
+
+def get_currency(ticker):
+    """Returns the trading currency for a ticker, inferred from its exchange suffix when possible."""
+    for suffix, currency in SUFFIX_CURRENCIES.items():
+        if ticker.endswith(suffix):
+            return currency
+    if '.' not in ticker and not ticker.startswith('^'):
+        return 'USD'
+    try:
+        return yf.Ticker(ticker).info.get('currency', 'SEK')
+    except Exception:
+        return 'SEK'
+
+
+# --- Intraday bars ---
+# Only the base granularity (1m or 5m) is downloaded and stored; coarser timeframes are
+# resampled from the next finer level of the pyramid on demand and kept in memory.
+PYRAMID = ["1m", "5m", "15m", "30m", "1h", "1d"]
+RESAMPLE_RULES = {"1m": "1min", "5m": "5min", "15m": "15min", "30m": "30min", "1h": "1h", "1d": "1D"}
+# How much history a first download asks for; Yahoo keeps 7 days of 1m and 60 days of 5m bars
+INTRADAY_PERIODS = {"1m": "7d", "5m": "60d"}
+INTRADAY_MAX_AGE_MINUTES = 5
+OHLCV_AGG = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+_resample_cache = OrderedDict()
+_resample_cache_lock = threading.Lock()
+RESAMPLE_CACHE_SIZE = 256
+
+
+def compact_bars(data):
+    """float32 prices and int64 volume: half the memory of yfinance's float64 frames."""
+    data = data[['Open', 'High', 'Low', 'Close', 'Volume']]
+    return data.astype({'Open': np.float32, 'High': np.float32, 'Low': np.float32, 'Close': np.float32, 'Volume': np.int64})
+
+
+def load_intraday_bars(ticker, base="5m", max_age_minutes=None, priority=BACKGROUND):
+    """
+    Returns stored intraday bars at the base granularity, topping the store up from
+    yfinance when it is older than `max_age_minutes`. History accumulates beyond
+    Yahoo's retention window because new downloads are merged into the stored file.
+    """
+    path = bar_path(ticker, base)
+    if max_age_minutes is None:
+        max_age_minutes = INTRADAY_MAX_AGE_MINUTES
+    stored = pd.read_pickle(path) if os.path.exists(path) else pd.DataFrame()
+    if not _is_fresh(path, max_age_minutes / 60) or stored.empty:
+        try:
+            fetched = fetch_intraday(ticker, interval=base, period=INTRADAY_PERIODS[base] if stored.empty else "5d", priority=priority)
+        except Exception:
+            fetched = pd.DataFrame()
+        if not fetched.empty:
+            fetched = compact_bars(fetched)
+            stored = fetched if stored.empty else pd.concat([stored[~stored.index.isin(fetched.index)], fetched]).sort_index()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            stored.to_pickle(path)
+    return stored
+
+
+def resample_bars(bars, timeframe):
+    """Vectorized OHLCV resampling to a coarser timeframe, dropping intervals without trades."""
+    if bars.empty:
+        return bars
+    resampled = bars.resample(RESAMPLE_RULES[timeframe], label='left', closed='left').agg(OHLCV_AGG)
+    return resampled.dropna(subset=['Close'])
+
+
+def get_bars(ticker, timeframe="5m", base="5m", priority=BACKGROUND):
+    """
+    Returns bars for any pyramid timeframe at or above `base`. A "1d" request here is
+    built from intraday bars (recent history only); use `load_bars` for long daily history.
+    """
+    if PYRAMID.index(timeframe) < PYRAMID.index(base):
+        raise ValueError(f"Cannot build {timeframe} bars from {base} bars")
+    if timeframe == base:
+        return load_intraday_bars(ticker, base=base, priority=priority)
+
+    source_timeframe = PYRAMID[PYRAMID.index(timeframe) - 1]
+    source = get_bars(ticker, timeframe=source_timeframe, base=base, priority=priority)
+    if source.empty:
+        return source
+
+    key = (ticker, base, timeframe)
+    stamp = (len(source), source.index[-1], source['Close'].iloc[-1], source['Volume'].iloc[-1])
+    with _resample_cache_lock:
+        cached = _resample_cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            _resample_cache.move_to_end(key)
+            return cached[1].copy()
+    resampled = resample_bars(source, timeframe)
+    with _resample_cache_lock:
+        _resample_cache[key] = (stamp, resampled)
+        _resample_cache.move_to_end(key)
+        while len(_resample_cache) > RESAMPLE_CACHE_SIZE:
+            _resample_cache.popitem(last=False)
+    # Callers (the analyzers) add columns in place, so never hand out the cached frame itself
+    return resampled.copy()
@@ -1,30 +1,163 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
 import pandas as pd
-from .finnhub_fetcher import fetch_daily_bars_finnhub
-from .yfinance_fetcher import fetch_daily_bars_yfinance
+from .scheduler import fetch_bars, fetch_bars_finnhub, BACKGROUND
 
-def fetch_data(ticker, **kwargs):
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+DEFAULT_LATENCY_BUDGET = 1.5   # seconds before the secondary provider is fired in hedged mode
+MIN_LATENCY_BUDGET, MAX_LATENCY_BUDGET = 0.3, 5.0
+
+
+def fetch_daily_bars_yfinance(ticker, days=None, period=None, priority=BACKGROUND, **kwargs):
+    """Adapts the yfinance fetcher to the Finnhub-style `days` argument used by `fetch_data`."""
+    if period is None:
+        period = f"{days}d" if days else "2y"
+    return fetch_bars(ticker, period=period, priority=priority)
+
+
+def fetch_daily_bars_finnhub(ticker, days=365, priority=BACKGROUND, **kwargs):
+    return fetch_bars_finnhub(ticker, days=days, priority=priority)
+
+
+class ProviderStats:
+    """Rolling latency, error-rate and data-completeness statistics for one provider."""
+    def __init__(self, name, window=200):
+        self.name = name
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)      # 1 = valid data, 0 = error or empty
+        self.completeness = deque(maxlen=window)
+        self.last_error = None
+
+    def record(self, latency, ok, completeness=None, error=None):
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes.append(1 if ok else 0)
+            if completeness is not None:
+                self.completeness.append(completeness)
+            if error is not None:
+                self.last_error = error
+
+    @property
+    def error_rate(self):
+        return 1 - float(np.mean(self.outcomes)) if self.outcomes else 0.0
+
+    def latency(self, q=50):
+        return float(np.percentile(self.latencies, q)) if self.latencies else None
+
+    def summary(self):
+        return {
+            "Provider": self.name, "Requests": len(self.outcomes),
+            "Error Rate": self.error_rate,
+            "p50 Latency (s)": self.latency(50), "p95 Latency (s)": self.latency(95),
+            "Completeness": float(np.mean(self.completeness)) if self.completeness else None,
+            "Last Error": self.last_error,
+        }
+
+
+class FetchRouter:
     """
-    Fetches data from the primary source (Finnhub) and falls back to the
-    secondary source (yfinance) if the primary fails.
+    Routes bar requests across providers. Providers are ordered by observed error rate
+    and latency, and in hedged mode the next provider is fired when the current one
+    exceeds its latency budget; the first valid result wins.
+    """
+    def __init__(self, providers, max_workers=16):
+        self.providers = list(providers)
+        self.stats = {name: ProviderStats(name) for name, _ in self.providers}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+
+    def ranked_providers(self):
+        """
+        Healthy providers first (error rate below 50%), then by median latency; ties keep configured
+        order. A provider without samples counts as answering in DEFAULT_LATENCY_BUDGET, so an untried
+        fallback does not outrank a measured primary that is faster than that.
+        """
+        def key(item):
+            position, (name, _) = item
+            stats = self.stats[name]
+            latency = stats.latency(50)
+            return (stats.error_rate >= 0.5, latency if latency is not None else DEFAULT_LATENCY_BUDGET, position)
+        return [provider for _, provider in sorted(enumerate(self.providers), key=key)]
+
+    def latency_budget(self, name):
+        p95 = self.stats[name].latency(95)
+        if p95 is None:
+            return DEFAULT_LATENCY_BUDGET
+        return min(max(p95, MIN_LATENCY_BUDGET), MAX_LATENCY_BUDGET)
+
+    def _call(self, name, fetch_fn, ticker, kwargs):
+        start = time.perf_counter()
+        try:
+            data = fetch_fn(ticker, **kwargs)
+        except Exception as e:
+            self.stats[name].record(time.perf_counter() - start, ok=False, error=f"{type(e).__name__}: {e}")
+            logger.warning("%s failed for %s: %s", name, ticker, e)
+            raise
+        latency = time.perf_counter() - start
+        valid = data is not None and not data.empty and all(col in data.columns for col in REQUIRED_COLUMNS)
+        completeness = float(data[REQUIRED_COLUMNS].notna().to_numpy().mean()) if valid else 0.0
+        self.stats[name].record(latency, ok=valid, completeness=completeness, error=None if valid else "empty response")
+        return data if valid else None
+
+    def fetch(self, ticker, hedged=False, latency_budget=None, **kwargs):
+        providers = self.ranked_providers()
+        if not hedged:
+            for name, fetch_fn in providers:
+                try:
+                    data = self._call(name, fetch_fn, ticker, kwargs)
+                except Exception:
+                    continue
+                if data is not None:
+                    data['Source'] = name
+                    return data
+            return pd.DataFrame()
+
+        pending = {}
+        remaining = list(providers)
+        while remaining or pending:
+            if remaining:
+                name, fetch_fn = remaining.pop(0)
+                pending[self._pool.submit(self._call, name, fetch_fn, ticker, kwargs)] = name
+                budget = latency_budget if latency_budget is not None else self.latency_budget(name)
+            else:
+                budget = None
+            done, _ = wait(pending, timeout=budget if remaining else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    data = future.result()
+                except Exception:
+                    continue
+                if data is not None:
+                    # Threads cannot be interrupted; cancel what has not started and ignore the rest
+                    for other in pending:
+                        other.cancel()
+                    data['Source'] = name
+                    return data
+        return pd.DataFrame()
+
+    def stats_table(self):
+        return pd.DataFrame([stats.summary() for stats in self.stats.values()])
+
+
+DEFAULT_PROVIDERS = [("Finnhub", fetch_daily_bars_finnhub), ("yfinance", fetch_daily_bars_yfinance)]
+default_router = FetchRouter(DEFAULT_PROVIDERS)
+
+
+def fetch_data(ticker, hedged=False, latency_budget=None, router=None, **kwargs):
+    """
+    Fetches data from the best-ranked provider (Finnhub by default) and falls back
+    to the next one (yfinance) if it fails.
+
+    With `hedged=True` the next provider is fired as soon as the current one has not
+    answered within `latency_budget` seconds (default: its observed p95 latency), and
+    whichever valid result arrives first is returned.
     """
-    try:
-        # 1. Try fetching from Finnhub first
-        data = fetch_daily_bars_finnhub(ticker, **kwargs)
-        if not data.empty:
-            data['Source'] = 'Finnhub'
-            return data
-    except Exception:
-        # If Finnhub fails for any reason, we'll proceed to the fallback
-        pass
-
-    # 2. If Finnhub fails, try yfinance as a fallback
-    try:
-        data = fetch_daily_bars_yfinance(ticker, **kwargs)
-        if not data.empty:
-            data['Source'] = 'yfinance'
-            return data
-    except Exception:
-        pass
-
-    # 3. If both fail, return an empty DataFrame
-    return pd.DataFrame()
+    router = router or default_router
+    return router.fetch(ticker, hedged=hedged, latency_budget=latency_budget, **kwargs)
@@ -0,0 +1,273 @@
+import os
+import glob
+import time
+import tempfile
+import threading
+import importlib
+import contextlib
+import numpy as np
+import pandas as pd
+from .scheduler import TokenBucket
+
+# Market-data replay for load, latency and offline testing. A ReplayProvider serves recorded
+# (bar store) or synthetic bars through the call signatures of `fetch_daily_bars`,
+# `fetch_intraday_bars` and `fetch_daily_bars_finnhub`, with configurable latency, error rate
+# and provider-side rate limit. With a ReplayClock only bars completed by the clock's market
+# time are visible, so a trading day can be replayed bar by bar at N x speed.
+#
+# `install(provider)` swaps the provider in for the network fetchers process-wide. Start the
+# dashboard with MARKET_DATA_REPLAY=synthetic (or =store) to run it on a replay; the REPLAY_*
+# variables in `install_from_env` set latency, errors, rate limit and speed.
+
+# (module, attribute) of every fetcher reference the replay replaces
+FETCHERS = [
+    ('data.fetchers.scheduler', 'fetch_daily_bars'),
+    ('data.fetchers.scheduler', 'fetch_intraday_bars'),
+    ('data.fetchers.scheduler', 'fetch_daily_bars_finnhub'),
+    ('data.bar_cache', 'fetch_daily_bars'),
+    ('strategies.backtest', 'fetch_daily_bars'),
+    ('strategies.pairs_trading_analyzer', 'fetch_daily_bars'),
+]
+MARKET_INDICES = ('^OMX', 'SPY')
+
+
+class ReplayError(ConnectionError):
+    """An injected provider failure."""
+
+
+class RateLimited(ReplayError):
+    """The provider-side rate limit rejected the request (HTTP 429 from the real APIs)."""
+
+
+class ReplayClock:
+    """Market time that starts at `start` and runs `speed` times faster than wall time."""
+    def __init__(self, start, speed=60.0):
+        start = pd.Timestamp(start)
+        self.start = start.tz_convert("UTC") if start.tz is not None else start.tz_localize("UTC")
+        self.speed = speed
+        self._started = time.monotonic()
+
+    def now(self):
+        return self.start + pd.Timedelta(seconds=(time.monotonic() - self._started) * self.speed)
+
+    def sleep_until(self, market_time):
+        wait = (pd.Timestamp(market_time) - self.now()).total_seconds() / self.speed
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _bar_length(interval):
+    return pd.Timedelta(interval.replace("m", "min").replace("d", "D"))
+
+
+def _utc(index):
+    index = pd.DatetimeIndex(index)
+    return index.tz_convert("UTC") if index.tz is not None else index.tz_localize("UTC")
+
+
+class ReplayProvider:
+    """
+    Serves `daily` (ticker -> daily bars) and `intraday` (ticker -> 5m bars) like the network
+    fetchers. Each request waits a lognormal delay around `latency` seconds, fails with
+    probability `error_rate`, and is rejected when `rate_limit` = (requests/s, burst) is exceeded.
+    """
+    def __init__(self, daily, intraday=None, clock=None, latency=0.0, jitter=0.5, error_rate=0.0, rate_limit=None, seed=None):
+        self.daily, self.intraday = daily, intraday or {}
+        self.clock = clock
+        self.latency, self.jitter, self.error_rate = latency, jitter, error_rate
+        self.bucket = TokenBucket(*rate_limit) if rate_limit else None
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self.requests = []    # (endpoint, ticker, seconds, outcome)
+
+    def now(self):
+        return self.clock.now() if self.clock is not None else pd.Timestamp.now(tz="UTC")
+
+    @contextlib.contextmanager
+    def _request(self, endpoint, ticker):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            if self.bucket is not None and not self.bucket.try_acquire():
+                outcome = "rate_limited"
+                raise RateLimited(f"429 Too Many Requests: {endpoint} {ticker}")
+            with self._lock:
+                delay = self.latency * self._rng.lognormal(0, self.jitter) if self.latency else 0.0
+                failed = self._rng.random() < self.error_rate
+            time.sleep(delay)
+            if failed:
+                outcome = "error"
+                raise ReplayError(f"Injected failure: {endpoint} {ticker}")
+            yield
+        finally:
+            with self._lock:
+                self.requests.append((endpoint, str(ticker), time.perf_counter() - started, outcome))
+
+    def _visible(self, bars, bar_length, lookback):
+        """Bars completed by the replay clock within `lookback` of it."""
+        if bars is None or bars.empty:
+            return pd.DataFrame()
+        now = self.now()
+        ends = _utc(bars.index) + bar_length
+        mask = ends <= now
+        if lookback is not None:
+            mask &= ends > now - lookback
+        return bars[mask]
+
+    @staticmethod
+    def _lookback(period):
+        if period == "max":
+            return None
+        from data.bar_store import period_start
+        return pd.Timestamp.now().normalize() - period_start(period) + pd.Timedelta(days=1)
+
+    def fetch_daily_bars(self, ticker, period="2y"):
+        """Stand-in for `fetch_daily_bars`; a list of tickers gives yfinance's wide (field, ticker) frame."""
+        with self._request("daily", ticker):
+            if isinstance(ticker, (list, tuple)):
+                frames = {t: self._visible(self.daily.get(t), pd.Timedelta(days=1), self._lookback(period)) for t in ticker}
+                frames = {t: f for t, f in frames.items() if not f.empty}
+                if not frames:
+                    return pd.DataFrame()
+                return pd.concat(frames, axis=1).swaplevel(0, 1, axis=1).sort_index(axis=1)
+            return self._visible(self.daily.get(ticker), pd.Timedelta(days=1), self._lookback(period)).copy()
+
+    def fetch_intraday_bars(self, ticker, interval="5m", period="5d"):
+        """Stand-in for `fetch_intraday_bars`, resampling the stored 5m bars to coarser intervals."""
+        from data.bar_store import resample_bars, RESAMPLE_RULES
+        with self._request("intraday", ticker):
+            bars = self._visible(self.intraday.get(ticker), _bar_length("5m"), self._lookback(period))
+            if bars.empty or interval == "5m":
+                return bars.copy()
+            if interval not in RESAMPLE_RULES or _bar_length(interval) < _bar_length("5m"):
+                return pd.DataFrame()
+            # A coarser bar is only published once all of its 5m bars are in
+            resampled = resample_bars(bars, interval)
+            return resampled[_utc(resampled.index) + _bar_length(interval) <= self.now()]
+
+    def fetch_daily_bars_finnhub(self, ticker, days=365, **kwargs):
+        """Stand-in for `fetch_daily_bars_finnhub`: naive UTC timestamps, like Finnhub's candles."""
+        with self._request("finnhub", ticker):
+            bars = self._visible(self.daily.get(ticker), pd.Timedelta(days=1), pd.Timedelta(days=days))
+            if bars.empty:
+                return pd.DataFrame()
+            return bars.set_axis(_utc(bars.index).tz_localize(None))
+
+    def stats(self):
+        """Request counts by outcome and latency percentiles (ms) of every request served so far."""
+        with self._lock:
+            requests = pd.DataFrame(self.requests, columns=['endpoint', 'ticker', 'seconds', 'outcome'])
+        if requests.empty:
+            return {"requests": 0}
+        counts = requests['outcome'].value_counts()
+        percentiles = np.percentile(requests['seconds'] * 1000, [50, 90, 99])
+        return {"requests": len(requests), **{outcome: int(counts.get(outcome, 0)) for outcome in ('ok', 'error', 'rate_limited')},
+                "p50_ms": float(percentiles[0]), "p90_ms": float(percentiles[1]), "p99_ms": float(percentiles[2])}
+
+    @classmethod
+    def from_synthetic(cls, tickers=None, n_tickers=30, n_bars=750, intraday_days=3, seed=0, end=None, **kwargs):
+        """
+        Synthetic bars (see `benchmarks.synthetic`) under the given ticker names, or SYN0000.ST...
+        when none are given, plus ^OMX and SPY. The last `intraday_days` sessions get 5m bars.
+        """
+        from benchmarks.synthetic import synthetic_universe, synthetic_intraday, MARKET_INDEX
+        names = list(tickers) if tickers is not None else None
+        universe = synthetic_universe(len(names) if names else n_tickers, n_bars=n_bars, seed=seed, end=end)
+        market = universe.pop(MARKET_INDEX)
+        daily = dict(zip(names, universe.values())) if names else universe
+        daily.update({symbol: market for symbol in MARKET_INDICES})
+        intraday = {}
+        for i, (ticker, bars) in enumerate(daily.items()):
+            days = bars.index[-intraday_days:] if intraday_days else []
+            if len(days):
+                intraday[ticker] = pd.concat([synthetic_intraday(bars, day, i, seed=seed) for day in days])
+        kwargs.setdefault("seed", seed)
+        return cls(daily, intraday, **kwargs)
+
+    @classmethod
+    def from_store(cls, tickers=None, **kwargs):
+        """Bars recorded in the local bar store (daily and 5m), for every stored ticker by default."""
+        from data.bar_store import bar_path, STORE_DIR
+        if tickers is None:
+            paths = glob.glob(os.path.join(STORE_DIR, "1d", "*.pkl"))
+            # bar_path() maps '^' to '_'; only index symbols start with either
+            tickers = [("^" + name[1:] if name.startswith("_") else name) for name in (os.path.basename(p)[:-4] for p in paths)]
+        daily, intraday = {}, {}
+        for ticker in tickers:
+            for store, interval in ((daily, "1d"), (intraday, "5m")):
+                path = bar_path(ticker, interval)
+                if os.path.exists(path):
+                    store[ticker] = pd.read_pickle(path)
+        return cls(daily, intraday, **kwargs)
+
+
+def install(provider):
+    """
+    Replaces the network fetchers with `provider` and points the bar store at a temporary
+    directory, so replayed bars never mix with recorded ones. Returns a function that undoes it.
+    """
+    from data import bar_store, bar_cache
+    originals = []
+    for module_name, attribute in FETCHERS:
+        module = importlib.import_module(module_name)
+        originals.append((module, attribute, getattr(module, attribute)))
+        setattr(module, attribute, getattr(provider, attribute))
+
+    store = tempfile.TemporaryDirectory(prefix="replay_store_")
+    settings = {'STORE_DIR': bar_store.STORE_DIR, 'INTRADAY_MAX_AGE_MINUTES': bar_store.INTRADAY_MAX_AGE_MINUTES}
+    bar_store.STORE_DIR = store.name
+    if provider.clock is not None:
+        # Stored intraday bars go stale after 5 market minutes, not 5 wall-clock minutes
+        bar_store.INTRADAY_MAX_AGE_MINUTES = settings['INTRADAY_MAX_AGE_MINUTES'] / provider.clock.speed
+    bar_cache.default_cache.clear()
+    bar_store._resample_cache.clear()
+
+    def restore():
+        for module, attribute, original in originals:
+            setattr(module, attribute, original)
+        for name, value in settings.items():
+            setattr(bar_store, name, value)
+        bar_cache.default_cache.clear()
+        bar_store._resample_cache.clear()
+        store.cleanup()
+    return restore
+
+
+@contextlib.contextmanager
+def replaying(provider):
+    restore = install(provider)
+    try:
+        yield provider
+    finally:
+        restore()
+
+
+_installed = None
+
+
+def install_from_env():
+    """
+    Installs a replay once per process when MARKET_DATA_REPLAY is 'synthetic' or 'store'.
+    REPLAY_LATENCY (seconds), REPLAY_ERROR_RATE, REPLAY_RATE_LIMIT ('rate,burst') and
+    REPLAY_SPEED (replays today's session from its open at that speed) tune it.
+    """
+    global _installed
+    source = os.environ.get("MARKET_DATA_REPLAY")
+    if _installed is not None or source not in ("synthetic", "store"):
+        return _installed
+    from data.fetchers.index_fetcher import NORDIC_INDICES
+    rate_limit = os.environ.get("REPLAY_RATE_LIMIT")
+    speed = os.environ.get("REPLAY_SPEED")
+    options = {
+        "latency": float(os.environ.get("REPLAY_LATENCY", 0)),
+        "error_rate": float(os.environ.get("REPLAY_ERROR_RATE", 0)),
+        "rate_limit": tuple(float(v) for v in rate_limit.split(",")) if rate_limit else None,
+        "clock": ReplayClock(pd.Timestamp.now(tz="Europe/Stockholm").normalize() + pd.Timedelta(hours=9), float(speed)) if speed else None,
+    }
+    if source == "synthetic":
+        tickers = list(dict.fromkeys(t for index_tickers in NORDIC_INDICES.values() for t in index_tickers))
+        _installed = ReplayProvider.from_synthetic(tickers, **options)
+    else:
+        _installed = ReplayProvider.from_store(**options)
+    install(_installed)
+    return _installed
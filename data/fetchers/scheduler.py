@@ -0,0 +1,198 @@
+import time
+import heapq
+import logging
+import itertools
+import threading
+from concurrent.futures import Future
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from .yfinance_fetcher import fetch_daily_bars, fetch_intraday_bars
+from .finnhub_fetcher import fetch_daily_bars_finnhub
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first. Detail views a user is waiting on jump ahead of index scans.
+INTERACTIVE, BACKGROUND = 0, 10
+
+# (requests per second, burst). Finnhub's free tier allows 60 calls/minute and at most 30/second:
+# a 30-call burst plus 0.5/s keeps any 60-second window at 60 calls. Yahoo has no published
+# limit, so stay polite.
+DEFAULT_LIMITS = {"finnhub": (0.5, 30), "yfinance": (4.0, 8)}
+
+
+class TokenBucket:
+    """Token bucket: `rate` tokens per second, holding at most `capacity`."""
+    def __init__(self, rate, capacity):
+        self.rate, self.capacity = rate, capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self):
+        """Takes a token if one is available, without waiting. Returns whether it did."""
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def wait_time(self):
+        """Seconds until a token is available."""
+        with self._lock:
+            self._refill()
+            return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class FetchScheduler:
+    """
+    Process-wide fetch scheduler shared by every Streamlit session.
+
+    Identical in-flight requests are coalesced into one call (single-flight), calls are
+    throttled per provider with token buckets, and queued work is served by priority.
+    """
+    def __init__(self, limits=None, workers=8):
+        self.buckets = {name: TokenBucket(rate, burst) for name, (rate, burst) in (limits or DEFAULT_LIMITS).items()}
+        self._queue = []
+        self._counter = itertools.count()
+        self._inflight = {}        # key -> Future
+        self._started = set()
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self.coalesced = 0
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"fetch-scheduler-{i}", daemon=True).start()
+
+    @staticmethod
+    def _key(provider, fn, args, kwargs):
+        freeze = lambda v: tuple(v) if isinstance(v, list) else v
+        return (provider, fn.__module__, fn.__qualname__, tuple(freeze(a) for a in args), tuple(sorted((k, freeze(v)) for k, v in kwargs.items())))
+
+    def submit(self, provider, fn, *args, priority=BACKGROUND, **kwargs):
+        """Queues a call, or joins an identical one already queued or running. Returns a Future."""
+        key = self._key(provider, fn, args, kwargs)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                if key not in self._started:
+                    # Re-queue at the joiner's priority; whichever entry is popped first runs it
+                    heapq.heappush(self._queue, (priority, next(self._counter), key, provider, fn, args, kwargs))
+                    self._ready.notify()
+                return future
+            future = Future()
+            self._inflight[key] = future
+            heapq.heappush(self._queue, (priority, next(self._counter), key, provider, fn, args, kwargs))
+            self._ready.notify()
+        return future
+
+    def run(self, provider, fn, *args, priority=BACKGROUND, timeout=None, **kwargs):
+        """Submits and waits. DataFrames are copied per caller because analyzers add columns in place."""
+        result = self.submit(provider, fn, *args, priority=priority, **kwargs).result(timeout=timeout)
+        return result.copy() if isinstance(result, pd.DataFrame) else result
+
+    def _next_job(self):
+        """
+        Pops the highest-priority job whose provider has a token, taking the token; jobs of
+        providers that are out of tokens stay queued. Called with the lock held. Returns
+        (job or None, seconds until a blocked provider has a token or None).
+        """
+        deferred, blocked, job = [], set(), None
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            key, provider = entry[2], entry[3]
+            if key in self._started or key not in self._inflight:
+                continue
+            bucket = self.buckets.get(provider)
+            if provider in blocked or (bucket is not None and not bucket.try_acquire()):
+                blocked.add(provider)
+                deferred.append(entry)
+                continue
+            job = entry
+            break
+        for entry in deferred:
+            heapq.heappush(self._queue, entry)
+        wait = min((self.buckets[provider].wait_time() for provider in blocked), default=None)
+        return job, wait
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                # A worker never sleeps holding a job: one provider's empty bucket must not
+                # stall other providers' or higher-priority requests
+                job, wait = self._next_job()
+                while job is None:
+                    self._ready.wait(wait)
+                    job, wait = self._next_job()
+                _, _, key, provider, fn, args, kwargs = job
+                self._started.add(key)
+                future = self._inflight[key]
+
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                logger.warning("%s request %s%s failed: %s", provider, fn.__name__, args, e)
+                outcome = (None, e)
+            else:
+                outcome = (result, None)
+
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._started.discard(key)
+            if outcome[1] is not None:
+                future.set_exception(outcome[1])
+            else:
+                future.set_result(outcome[0])
+
+    def queue_depth(self):
+        with self._lock:
+            return len(self._inflight)
+
+
+default_scheduler = FetchScheduler()
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """Shared, connection-pooled requests session for plain HTTP scraping (index components etc.)."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=2)
+            _http_session.mount("https://", adapter)
+            _http_session.mount("http://", adapter)
+        return _http_session
+
+
+def fetch_bars(ticker, period="2y", priority=BACKGROUND):
+    """`fetch_daily_bars` through the shared scheduler (yfinance keeps one pooled session per process)."""
+    return default_scheduler.run("yfinance", fetch_daily_bars, ticker, period=period, priority=priority)
+
+
+def fetch_intraday(ticker, interval="5m", period="5d", priority=BACKGROUND):
+    """`fetch_intraday_bars` through the shared scheduler."""
+    return default_scheduler.run("yfinance", fetch_intraday_bars, ticker, interval=interval, period=period, priority=priority)
+
+
+def fetch_bars_finnhub(ticker, priority=BACKGROUND, **kwargs):
+    """`fetch_daily_bars_finnhub` through the shared scheduler, within Finnhub's rate limit."""
+    return default_scheduler.run("finnhub", fetch_daily_bars_finnhub, ticker, priority=priority, **kwargs)
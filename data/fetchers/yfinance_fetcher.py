@@ -20,6 +20,18 @@ def fetch_daily_bars(ticker, period="2y"):
     else:
         return pd.DataFrame()
 
+def fetch_intraday_bars(ticker, interval="5m", period="5d"):
+    """
+    Fetches intraday OHLCV bars using yfinance. Yahoo keeps 1m bars for 7 days
+    and 5m bars for 60 days.
+    """
+    data = yf.Ticker(ticker).history(period=period, interval=interval)
+
+    required_cols = ['Open', 'High', 'Low', 'Close', 'Volume']
+    if data.empty or not all(col in data.columns for col in required_cols):
+        return pd.DataFrame()
+    return data[required_cols]
+
 @st.cache_data(ttl=3600)
 def get_fx_rate(from_currency, to_currency):
     """Fetches the latest exchange rate between two currencies."""
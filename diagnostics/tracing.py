@@ -0,0 +1,154 @@
+import io
+import json
+import time
+import uuid
+import logging
+import pstats
+import cProfile
+import threading
+import contextlib
+from contextvars import ContextVar
+import pandas as pd
+
+# Lightweight tracing for scans. A trace is opened around one scan; code anywhere below it
+# marks stages with `span("fetch" | "indicator" | "scoring" | "backtest" | "render", ticker)`,
+# and the dashboard wraps each ticker's whole turn in a "scan" span. Nested spans inherit the
+# ticker of the span around them.
+# Without an open trace `span` returns a shared no-op object, so instrumented code costs one
+# context-variable lookup per call.
+#
+# Finished traces are logged as one JSON record per span plus a summary record on the
+# "diagnostics.tracing" logger.
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("fetch", "indicator", "scoring", "backtest", "render")
+PROFILE_LINES = 40
+
+_active_trace = ContextVar("active_trace", default=None)
+_active_ticker = ContextVar("active_ticker", default=None)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("trace", "stage", "ticker", "attrs", "start", "_token")
+
+    def __init__(self, trace, stage, ticker, attrs):
+        self.trace, self.stage, self.ticker, self.attrs = trace, stage, ticker, attrs
+
+    def __enter__(self):
+        # Spans opened inside this one inherit its ticker
+        self._token = _active_ticker.set(self.ticker)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        _active_ticker.reset(self._token)
+        self.trace.record(self.stage, self.ticker, self.start, end, None if exc_type is None else f"{exc_type.__name__}: {exc}", self.attrs)
+        return False
+
+
+def span(stage, ticker=None, **attrs):
+    """Times the enclosed block as `stage` of the current trace; a no-op when no trace is open."""
+    trace = _active_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return Span(trace, stage, ticker if ticker is not None else _active_ticker.get(), attrs)
+
+
+class Trace:
+    """Spans collected during one traced scan."""
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.started = pd.Timestamp.now(tz="UTC")
+        self.origin = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.profile = None
+        self._lock = threading.Lock()
+
+    def record(self, stage, ticker, start, end, error=None, attrs=None):
+        with self._lock:
+            self.spans.append({
+                "stage": stage, "ticker": ticker, "start_ms": (start - self.origin) * 1000,
+                "duration_ms": (end - start) * 1000, "error": error, **(attrs or {}),
+            })
+
+    def to_frame(self):
+        return pd.DataFrame(self.spans, columns=None if self.spans else ["stage", "ticker", "start_ms", "duration_ms", "error"])
+
+    def aggregate(self):
+        """Per-stage count, total, mean, p95 and max duration in milliseconds."""
+        spans = self.to_frame()
+        if spans.empty:
+            return pd.DataFrame()
+        grouped = spans.groupby("stage")["duration_ms"]
+        table = pd.DataFrame({
+            "Spans": grouped.count(), "Total (ms)": grouped.sum(), "Mean (ms)": grouped.mean(),
+            "p95 (ms)": grouped.quantile(0.95), "Max (ms)": grouped.max(),
+            "Errors": spans.groupby("stage")["error"].count(),
+        })
+        return table.sort_values("Total (ms)", ascending=False)
+
+    def per_ticker(self):
+        """Ticker x stage table of total milliseconds, slowest tickers first."""
+        spans = self.to_frame()
+        if spans.empty or spans["ticker"].isna().all():
+            return pd.DataFrame()
+        table = spans.dropna(subset=["ticker"]).pivot_table(index="ticker", columns="stage", values="duration_ms", aggfunc="sum")
+        return table.sort_values("scan" if "scan" in table else table.columns[0], ascending=False)
+
+    def summary(self):
+        return {"trace": self.id, "name": self.name, "started": self.started.isoformat(), "duration_ms": self.duration,
+                "spans": len(self.spans), "tickers": int(self.to_frame()["ticker"].nunique()) if self.spans else 0}
+
+    def to_jsonl(self):
+        """The trace as JSON lines: one record per span followed by the summary."""
+        lines = [json.dumps({"trace": self.id, "name": self.name, **s}, default=str) for s in self.spans]
+        lines.append(json.dumps({**self.summary(), "record": "summary"}, default=str))
+        return "\n".join(lines) + "\n"
+
+
+@contextlib.contextmanager
+def trace(name, enabled=True, profile=False):
+    """
+    Opens a trace for the enclosed scan and yields it (or None when disabled). With `profile`
+    the calling thread also runs under cProfile and the top functions by cumulative time are
+    kept on `trace.profile`; work done on the fetch scheduler's threads is not profiled.
+    """
+    if not enabled:
+        yield None
+        return
+    current = Trace(name)
+    token = _active_trace.set(current)
+    profiler = cProfile.Profile() if profile else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield current
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+            current.profile = out.getvalue()
+        current.duration = (time.perf_counter() - current.origin) * 1000
+        _active_trace.reset(token)
+        if logger.isEnabledFor(logging.INFO):
+            for line in current.to_jsonl().splitlines():
+                logger.info(line)
+
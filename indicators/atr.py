@@ -0,0 +1,19 @@
+# atr.py
+# Indicator module for average true range
+import numpy as np
+from .moving_averages import rma
+
+
+def true_range(high, low, close):
+    """True range; the first bar has no previous close and is NaN, as in pandas_ta."""
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    prev_close = np.full(close.shape, np.nan)
+    prev_close[1:] = close[:-1]
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    tr[0] = np.nan
+    return tr
+
+
+def atr(high, low, close, length=14):
+    """Wilder's average true range (pandas_ta `atr` with the default RMA, column ATRr_14)."""
+    return rma(true_range(high, low, close), length)
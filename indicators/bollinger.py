@@ -1,4 +1,24 @@
+import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+def bollinger_bands(close, length: int = 20, num_std: float = 2.0):
+    """
+    Bollinger Bands on an array (1-D, or 2-D with time along axis 0) using the population
+    standard deviation, as pandas_ta does. Returns (lower, mid, upper, bandwidth, percent).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    mid = np.full(close.shape, np.nan)
+    std = np.full(close.shape, np.nan)
+    if close.shape[0] >= length:
+        windows = sliding_window_view(close, length, axis=0)
+        mid[length - 1:] = windows.mean(axis=-1)
+        std[length - 1:] = windows.std(axis=-1)
+    lower, upper = mid - num_std * std, mid + num_std * std
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bandwidth = 100 * (upper - lower) / mid
+        percent = (close - lower) / (upper - lower)
+    return lower, mid, upper, bandwidth, percent
 
 def calculate_bollinger(series: pd.Series, window: int = 20, num_std: int = 2):
     """
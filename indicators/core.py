@@ -0,0 +1,61 @@
+# core.py
+# The indicator set shared by the analyzers, the ML features and the backtester, built
+# from the NumPy kernels and named the way pandas_ta names its columns.
+import numpy as np
+import pandas as pd
+from .moving_averages import sma
+from .macd import macd
+from .rsi import wilder_rsi
+from .volume import obv
+from .atr import atr
+from .bollinger import bollinger_bands
+
+CORE_COLUMNS = ['SMA_10', 'SMA_50', 'MACD_12_26_9', 'MACDh_12_26_9', 'MACDs_12_26_9', 'RSI_14', 'OBV', 'ATRr_14',
+                'BBL_20_2.0', 'BBM_20_2.0', 'BBU_20_2.0', 'BBB_20_2.0', 'BBP_20_2.0']
+
+
+def core_indicators(high, low, close, volume):
+    """Computes the core indicator set on arrays and returns a dict of column name -> array."""
+    close = np.asarray(close, dtype=np.float64)
+    macd_line, histogram, signal_line = macd(close, 12, 26, 9)
+    lower, mid, upper, bandwidth, percent = bollinger_bands(close, 20, 2.0)
+    return {
+        'SMA_10': sma(close, 10), 'SMA_50': sma(close, 50),
+        'MACD_12_26_9': macd_line, 'MACDh_12_26_9': histogram, 'MACDs_12_26_9': signal_line,
+        'RSI_14': wilder_rsi(close, 14),
+        'OBV': obv(close, volume),
+        'ATRr_14': atr(high, low, close, 14),
+        'BBL_20_2.0': lower, 'BBM_20_2.0': mid, 'BBU_20_2.0': upper, 'BBB_20_2.0': bandwidth, 'BBP_20_2.0': percent,
+    }
+
+
+def add_core_indicators(data: pd.DataFrame) -> pd.DataFrame:
+    """Appends the core indicator columns to an OHLCV DataFrame in place and returns it."""
+    columns = core_indicators(data['High'].to_numpy(), data['Low'].to_numpy(), data['Close'].to_numpy(), data['Volume'].to_numpy())
+    for name, values in columns.items():
+        data[name] = values
+    return data
+
+
+def with_core_indicators(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    A new DataFrame with the core indicator columns added. `data` is left untouched, so it
+    can be a read-only view into a shared cache; the OHLCV columns are shared, not copied.
+    """
+    return data.assign(**core_indicators(data['High'].to_numpy(), data['Low'].to_numpy(), data['Close'].to_numpy(), data['Volume'].to_numpy()))
+
+
+def match_feature_columns(data: pd.DataFrame, feature_names):
+    """
+    Maps model feature names onto columns of `data`. Names that differ only by pandas_ta's
+    version-specific suffixes (e.g. 'BBL_20_2.0_2.0' for 'BBL_20_2.0') map to the shorter column.
+    """
+    mapping = {}
+    for name in feature_names:
+        if name in data.columns:
+            mapping[name] = name
+            continue
+        match = next((col for col in data.columns if name.startswith(col + '_')), None)
+        if match is not None:
+            mapping[name] = match
+    return mapping
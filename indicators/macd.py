@@ -1,6 +1,19 @@
 # indicators/macd.py
+import numpy as np
 import pandas as pd
 from typing import Tuple
+from .moving_averages import ema
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9):
+    """
+    MACD on an array (1-D, or 2-D with time along axis 0), matching pandas_ta's `macd`:
+    SMA-seeded EMAs, with the signal line starting at the MACD line's first value.
+    Returns (macd_line, histogram, signal_line) in pandas_ta's column order.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    macd_line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(macd_line, signal)
+    return macd_line, macd_line - signal_line, signal_line
 
 def calculate_macd(close: pd.Series, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[pd.Series, pd.Series, pd.Series]:
     """
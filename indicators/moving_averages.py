@@ -1,3 +1,96 @@
 # moving_averages.py
 # Indicator module for moving_averages
+#
+# Array-in/array-out kernels. Inputs are 1-D arrays or 2-D arrays with time along
+# axis 0 (one column per ticker); outputs have the same shape and use NaN for the
+# warm-up period. Leading NaNs are allowed, interior gaps should be forward-filled first.
+import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+
+def _as_float(x):
+    return np.asarray(x, dtype=np.float64)
+
+
+def sma(x, length=10):
+    """Simple moving average; a window containing NaN gives NaN (pandas `rolling().mean()`)."""
+    x = _as_float(x)
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] >= length:
+        out[length - 1:] = sliding_window_view(x, length, axis=0).mean(axis=-1)
+    return out
+
+
+def wma(x, length=10):
+    """Linearly weighted moving average, the newest bar weighted `length` (pandas_ta `wma`)."""
+    x = _as_float(x)
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] >= length:
+        weights = np.arange(1, length + 1, dtype=np.float64)
+        out[length - 1:] = sliding_window_view(x, length, axis=0) @ weights / weights.sum()
+    return out
+
+
+def _first_valid(x):
+    """Index of the first non-NaN row per column (x.shape[0] where a column is all NaN)."""
+    valid = ~np.isnan(x)
+    return np.where(valid.any(axis=0), valid.argmax(axis=0), x.shape[0])
+
+
+def ema(x, length=10, sma_seed=True):
+    """
+    Exponential moving average with alpha = 2 / (length + 1), computed as one linear filter.
+
+    With `sma_seed` (pandas_ta's default) the first value is the SMA of the first `length`
+    observations; otherwise it starts from the first observation (pandas `ewm(adjust=False)`).
+    """
+    x = _as_float(x)
+    squeeze = x.ndim == 1
+    x2 = x.reshape(len(x), -1)
+    alpha = 2.0 / (length + 1)
+    n, k = x2.shape
+    start = _first_valid(x2)
+    seed_at = start + (length - 1 if sma_seed else 0)
+    cols = np.arange(k)
+    ok = seed_at < n
+
+    # y[t] = (1 - alpha) * y[t-1] + u[t], with u = alpha * x after the seed and u[seed] = seed value
+    u = np.where(np.isnan(x2), 0.0, alpha * x2)
+    rows = np.arange(n)[:, None]
+    u[rows < seed_at[None, :]] = 0.0
+    if sma_seed:
+        # Leading NaNs add nothing to the running sum, so it holds exactly the first `length` values
+        u[seed_at[ok], cols[ok]] = np.nancumsum(x2, axis=0)[seed_at[ok], cols[ok]] / length
+    else:
+        u[seed_at[ok], cols[ok]] = x2[seed_at[ok], cols[ok]]
+
+    out = lfilter([1.0], [1.0, -(1 - alpha)], u, axis=0)
+    out[rows < seed_at[None, :]] = np.nan
+    return out[:, 0] if squeeze else out
+
+
+def rma(x, length=14, adjust=True):
+    """
+    Wilder's moving average (alpha = 1 / length) with `length` warm-up observations,
+    matching pandas_ta's `rma` (`ewm(alpha=1/length, min_periods=length)`). NaNs are skipped.
+    """
+    x = _as_float(x)
+    alpha = 1.0 / length
+    valid = ~np.isnan(x)
+    decay = [1.0, -(1 - alpha)]
+    if adjust:
+        numerator = lfilter([1.0], decay, np.where(valid, x, 0.0), axis=0)
+        denominator = lfilter([1.0], decay, valid.astype(np.float64), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = numerator / denominator
+    else:
+        out = ema(x, length=2 * length - 1, sma_seed=False)
+    out[np.cumsum(valid, axis=0) < length] = np.nan
+    return out
+
+
+def as_series(values, like, name=None):
+    """Wraps a kernel result back into a Series aligned with `like` for DataFrame callers."""
+    return pd.Series(values, index=like.index, name=name)
@@ -1,5 +1,20 @@
 # indicators/rsi.py
+import numpy as np
 import pandas as pd
+from .moving_averages import rma
+
+def wilder_rsi(close, length: int = 14):
+    """
+    Wilder's RSI on an array (1-D, or 2-D with time along axis 0), matching pandas_ta's `rsi`:
+    gains and losses are smoothed with Wilder's moving average.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    delta = np.full(close.shape, np.nan)
+    delta[1:] = np.diff(close, axis=0)
+    avg_gain = rma(np.where(np.isnan(delta), np.nan, np.clip(delta, 0, None)), length)
+    avg_loss = rma(np.where(np.isnan(delta), np.nan, np.clip(-delta, 0, None)), length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100 * avg_gain / (avg_gain + avg_loss)
 
 def calculate_rsi(close: pd.Series, period: int = 14) -> pd.Series:
     """
@@ -1,3 +1,38 @@
 # stochastic.py
 # Indicator module for stochastic
+import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from .moving_averages import sma
+
+
+def rolling_extreme(x, length, fn):
+    """Rolling max/min (`fn` is np.max or np.min) over `length` bars along axis 0."""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] >= length:
+        out[length - 1:] = fn(sliding_window_view(x, length, axis=0), axis=-1)
+    return out
+
+
+def stochastic(high, low, close, k=14, d=3, smooth_k=3):
+    """
+    Stochastic oscillator as in pandas_ta's `stoch`: raw %K over `k` bars smoothed by an
+    SMA of `smooth_k`, and %D as an SMA of `d` over %K. Returns (stoch_k, stoch_d).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    lowest = rolling_extreme(low, k, np.min)
+    highest = rolling_extreme(high, k, np.max)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        raw_k = 100 * (close - lowest) / (highest - lowest)
+    # Warm-up NaNs propagate through the SMAs, so %K and %D start exactly where pandas_ta's do
+    stoch_k = sma(raw_k, smooth_k)
+    stoch_d = sma(stoch_k, d)
+    return stoch_k, stoch_d
+
+
+def calculate_stochastic(data: pd.DataFrame, k: int = 14, d: int = 3, smooth_k: int = 3):
+    """Stochastic %K/%D for an OHLC DataFrame, named like pandas_ta (STOCHk_14_3_3, STOCHd_14_3_3)."""
+    stoch_k, stoch_d = stochastic(data['High'], data['Low'], data['Close'], k, d, smooth_k)
+    suffix = f"{k}_{d}_{smooth_k}"
+    return pd.DataFrame({f"STOCHk_{suffix}": stoch_k, f"STOCHd_{suffix}": stoch_d}, index=data.index)
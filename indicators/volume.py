@@ -1,3 +1,41 @@
 # volume.py
 # Indicator module for volume
+import numpy as np
 import pandas as pd
+
+
+def obv(close, volume):
+    """On-balance volume: cumulative volume signed by the close-to-close direction (first bar counts as up)."""
+    close = np.asarray(close, dtype=np.float64)
+    volume = np.asarray(volume, dtype=np.float64)
+    direction = np.ones(close.shape)
+    direction[1:] = np.sign(np.diff(close, axis=0))
+    return np.nancumsum(direction * volume, axis=0)
+
+
+def vwap(high, low, close, volume, session_ids=None):
+    """
+    Volume-weighted average typical price, reset at every change of `session_ids`
+    (e.g. the bar's date, which is pandas_ta's default daily anchor). Without
+    session ids the average runs over the whole array.
+    """
+    typical = (np.asarray(high, dtype=np.float64) + np.asarray(low, dtype=np.float64) + np.asarray(close, dtype=np.float64)) / 3
+    volume = np.asarray(volume, dtype=np.float64)
+    weighted = np.cumsum(typical * volume, axis=0)
+    total = np.cumsum(volume, axis=0)
+    if session_ids is not None:
+        session_ids = np.asarray(session_ids)
+        starts = np.flatnonzero(np.r_[True, session_ids[1:] != session_ids[:-1]])
+        # Subtract the running totals at the end of the previous session
+        owner = np.repeat(starts, np.diff(np.r_[starts, len(session_ids)]))
+        offset = (owner > 0).reshape((-1,) + (1,) * (weighted.ndim - 1))
+        weighted = weighted - np.where(offset, weighted[owner - 1], 0.0)
+        total = total - np.where(offset, total[owner - 1], 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return weighted / total
+
+
+def calculate_vwap(data: pd.DataFrame, anchor: str = "D") -> pd.Series:
+    """Anchored VWAP for an OHLCV DataFrame with a DatetimeIndex (anchor is a pandas period alias)."""
+    sessions = pd.DatetimeIndex(data.index).to_period(anchor).asi8 if anchor else None
+    return pd.Series(vwap(data['High'], data['Low'], data['Close'], data['Volume'], sessions), index=data.index, name=f"VWAP_{anchor}")
@@ -3,6 +3,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import streamlit as st
 from ui.dashboard import run_app
+from data.fetchers.replay import install_from_env
 
 if __name__ == "__main__":
+    install_from_env() # No-op unless MARKET_DATA_REPLAY is set
     run_app()
@@ -0,0 +1,64 @@
+import os
+import json
+import glob
+import joblib
+from datetime import datetime
+
+# Versioned model artifacts: ml/models/v0001.joblib + v0001.json (metadata and evaluation metrics)
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(ML_DIR, "models")
+LEGACY_MODEL_PATH = os.path.join(ML_DIR, "xgb_model.joblib")
+
+
+def list_versions():
+    """Returns the metadata of every saved model version, oldest first."""
+    versions = []
+    for meta_path in sorted(glob.glob(os.path.join(MODEL_DIR, "v*.json"))):
+        with open(meta_path) as f:
+            versions.append(json.load(f))
+    return versions
+
+
+def latest_version():
+    versions = list_versions()
+    return versions[-1] if versions else None
+
+
+def latest_model_path():
+    """Path of the newest model artifact, falling back to the original single-file model."""
+    meta = latest_version()
+    if meta and os.path.exists(os.path.join(MODEL_DIR, meta["model_file"])):
+        return os.path.join(MODEL_DIR, meta["model_file"])
+    return LEGACY_MODEL_PATH
+
+
+def save_version(model, metrics, trained_through, mode, params, rows):
+    """Saves a new model version with its metrics and also refreshes the legacy model path."""
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    previous = latest_version()
+    version = previous["version"] + 1 if previous else 1
+    name = f"v{version:04d}"
+    meta = {
+        "version": version,
+        "model_file": f"{name}.joblib",
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "trained_through": str(trained_through),
+        "mode": mode,
+        "rows": int(rows),
+        "params": params,
+        "metrics": metrics,
+        "parent": previous["version"] if previous and mode == "refresh" else None,
+    }
+    joblib.dump(model, os.path.join(MODEL_DIR, meta["model_file"]))
+    joblib.dump(model, LEGACY_MODEL_PATH)
+    # Metadata is written last so readers never see a version whose model file is missing
+    with open(os.path.join(MODEL_DIR, f"{name}.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def load_version(meta=None):
+    meta = meta or latest_version()
+    if meta is None:
+        return joblib.load(LEGACY_MODEL_PATH)
+    return joblib.load(os.path.join(MODEL_DIR, meta["model_file"]))
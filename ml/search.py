@@ -0,0 +1,196 @@
+import os
+import sys
+import itertools
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import xgboost as xgb
+from sklearn.metrics import roc_auc_score, log_loss, precision_score
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ml.trainer import prepare_data, get_universe, get_feature_names, to_classifier, DEFAULT_PARAMS
+from ml.registry import MODEL_DIR, save_version
+
+# Walk-forward hyperparameter search. Folds are built once per target definition as
+# QuantileDMatrix objects and shared by every candidate; candidates train in threads
+# (XGBoost releases the GIL) with one core each.
+
+
+def load_panel(partitions, feature_names):
+    """Reads every partition into one float32 feature matrix plus dates, closes and ticker ids."""
+    X, dates, close, group = [], [], [], []
+    for group_id, path in enumerate(partitions):
+        table = pq.read_table(path, memory_map=True)
+        X.append(np.column_stack([table.column(name).to_numpy() if name in table.column_names else np.zeros(table.num_rows, dtype=np.float32) for name in feature_names]).astype(np.float32, copy=False))
+        dates.append(table.column('Date').to_numpy())
+        close.append(table.column('Close').to_numpy())
+        group.append(np.full(table.num_rows, group_id, dtype=np.int32))
+    return np.vstack(X), np.concatenate(dates), np.concatenate(close), np.concatenate(group)
+
+
+def make_target(close, group, horizon, threshold):
+    """
+    Labels rows whose close `horizon` bars later (same ticker) is more than `threshold` higher.
+    Rows without a known outcome are returned as -1.
+    """
+    future = np.full(len(close), np.nan, dtype=np.float64)
+    future[:-horizon] = close[horizon:]
+    future[:-horizon][group[horizon:] != group[:-horizon]] = np.nan
+    target = (future > close * (1 + threshold)).astype(np.int8)
+    target[np.isnan(future)] = -1
+    return target
+
+
+def walk_forward_folds(dates, n_folds, test_days, scheme="expanding", window_days=None, embargo_days=0):
+    """
+    Yields (train_mask, test_mask) pairs for consecutive test windows ending at the newest row.
+    Training rows within `embargo_days` of the test start are dropped so their labels
+    cannot look into the test period.
+    """
+    latest = dates.max()
+    for k in range(n_folds, 0, -1):
+        test_start = latest - np.timedelta64(test_days * k, 'D')
+        test_end = test_start + np.timedelta64(test_days, 'D')
+        train_end = test_start - np.timedelta64(embargo_days, 'D')
+        train_mask = dates < train_end
+        if scheme == "rolling" and window_days:
+            train_mask &= dates >= train_end - np.timedelta64(window_days, 'D')
+        test_mask = (dates >= test_start) & (dates < test_end) if k > 1 else dates >= test_start
+        yield train_mask, test_mask
+
+
+class FoldSet:
+    """Builds each fold's train/validation/test matrices once per target definition and caches them."""
+    def __init__(self, X, dates, close, group, feature_names, n_folds, test_days, scheme, window_days, valid_fraction=0.1):
+        self.X, self.dates, self.close, self.group = X, dates, close, group
+        self.feature_names = feature_names
+        self.n_folds, self.test_days, self.scheme, self.window_days = n_folds, test_days, scheme, window_days
+        self.valid_fraction = valid_fraction
+        self._cache = {}
+
+    def get(self, horizon, threshold):
+        key = (horizon, threshold)
+        if key not in self._cache:
+            target = make_target(self.close, self.group, horizon, threshold)
+            labelled = target >= 0
+            folds = []
+            # Calendar embargo comfortably covers `horizon` trading days
+            for train_mask, test_mask in walk_forward_folds(self.dates, self.n_folds, self.test_days, self.scheme, self.window_days, embargo_days=horizon * 2):
+                train_idx = np.flatnonzero(train_mask & labelled)
+                test_idx = np.flatnonzero(test_mask & labelled)
+                if len(train_idx) < 100 or len(test_idx) == 0:
+                    continue
+                # The newest slice of the training window drives early stopping, never the test fold
+                train_dates = self.dates[train_idx]
+                valid_start = np.sort(train_dates)[int(len(train_idx) * (1 - self.valid_fraction))]
+                fit_idx, valid_idx = train_idx[train_dates < valid_start], train_idx[train_dates >= valid_start]
+                dfit = xgb.QuantileDMatrix(self.X[fit_idx], target[fit_idx], feature_names=self.feature_names)
+                dvalid = xgb.QuantileDMatrix(self.X[valid_idx], target[valid_idx], ref=dfit, feature_names=self.feature_names)
+                folds.append((dfit, dvalid, self.X[test_idx], target[test_idx]))
+            self._cache[key] = folds
+        return self._cache[key]
+
+
+def evaluate_candidate(fold_set, candidate, early_stopping_rounds=20):
+    """Trains one configuration on every fold and returns its averaged out-of-sample scores."""
+    params = {**DEFAULT_PARAMS, 'nthread': 1, 'max_depth': candidate['max_depth'], 'learning_rate': candidate['learning_rate']}
+    aucs, loglosses, precisions, iterations = [], [], [], []
+    for dfit, dvalid, X_test, y_test in fold_set.get(candidate['horizon'], candidate['threshold']):
+        booster = xgb.train(params, dfit, num_boost_round=candidate['n_estimators'], evals=[(dvalid, 'valid')],
+                            early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+        probs = booster.inplace_predict(X_test, iteration_range=(0, booster.best_iteration + 1))
+        if len(np.unique(y_test)) == 2:
+            aucs.append(roc_auc_score(y_test, probs))
+        loglosses.append(log_loss(y_test, probs, labels=[0, 1]))
+        precisions.append(precision_score(y_test, probs > 0.5, zero_division=0))
+        iterations.append(booster.best_iteration + 1)
+    return {
+        **candidate,
+        "folds": len(loglosses),
+        "auc": float(np.mean(aucs)) if aucs else np.nan,
+        "auc_std": float(np.std(aucs)) if aucs else np.nan,
+        "logloss": float(np.mean(loglosses)) if loglosses else np.nan,
+        "precision": float(np.mean(precisions)) if precisions else np.nan,
+        "best_rounds": int(np.mean(iterations)) if iterations else 0,
+    }
+
+
+def candidate_grid(max_depths, learning_rates, n_estimators, horizons, thresholds, samples=None, seed=0):
+    grid = [dict(zip(("max_depth", "learning_rate", "n_estimators", "horizon", "threshold"), values))
+            for values in itertools.product(max_depths, learning_rates, n_estimators, horizons, thresholds)]
+    if samples and samples < len(grid):
+        rng = np.random.default_rng(seed)
+        grid = [grid[i] for i in rng.choice(len(grid), samples, replace=False)]
+    return grid
+
+
+def run_search(fold_set, candidates, jobs=None):
+    """Evaluates all candidates in parallel and returns the leaderboard, best AUC first."""
+    # Build fold matrices up front so worker threads only ever read them
+    for key in dict.fromkeys((c['horizon'], c['threshold']) for c in candidates):
+        fold_set.get(*key)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        futures = [pool.submit(evaluate_candidate, fold_set, c) for c in candidates]
+        for i, future in enumerate(as_completed(futures), 1):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Candidate failed: {e}")
+            if i % 25 == 0:
+                print(f"Evaluated {i}/{len(candidates)} candidates...")
+    return pd.DataFrame(results).sort_values(by=["auc", "logloss"], ascending=[False, True]).reset_index(drop=True)
+
+
+def fit_best(fold_set, best):
+    """Refits the winning configuration on all labelled rows using its walk-forward round count."""
+    target = make_target(fold_set.close, fold_set.group, int(best['horizon']), float(best['threshold']))
+    labelled = target >= 0
+    dtrain = xgb.QuantileDMatrix(fold_set.X[labelled], target[labelled], feature_names=fold_set.feature_names)
+    params = {**DEFAULT_PARAMS, 'max_depth': int(best['max_depth']), 'learning_rate': float(best['learning_rate'])}
+    booster = xgb.train(params, dtrain, num_boost_round=max(int(best['best_rounds']), 1))
+    trained_through = pd.Timestamp(fold_set.dates[labelled].max(), tz='UTC')
+    return to_classifier(booster), {**params, "num_boost_round": int(best['best_rounds']), "horizon": int(best['horizon']), "threshold": float(best['threshold'])}, trained_through, int(labelled.sum())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Walk-forward hyperparameter search for the XGBoost suggestion model.")
+    parser.add_argument("--universe", choices=["omxs30", "nordic"], default="omxs30")
+    parser.add_argument("--scheme", choices=["expanding", "rolling"], default="expanding")
+    parser.add_argument("--folds", type=int, default=4)
+    parser.add_argument("--test-days", type=int, default=182, help="Calendar days per test fold")
+    parser.add_argument("--window-years", type=float, default=3, help="Training window for --scheme rolling")
+    parser.add_argument("--max-depth", type=int, nargs="+", default=[3, 4, 5, 6, 8])
+    parser.add_argument("--learning-rate", type=float, nargs="+", default=[0.03, 0.1, 0.3])
+    parser.add_argument("--n-estimators", type=int, nargs="+", default=[200, 500])
+    parser.add_argument("--horizon", type=int, nargs="+", default=[5], help="Target horizon in bars")
+    parser.add_argument("--threshold", type=float, nargs="+", default=[0.03], help="Target return threshold")
+    parser.add_argument("--samples", type=int, default=None, help="Randomly sample this many configurations from the grid")
+    parser.add_argument("--jobs", type=int, default=None, help="Parallel candidates (default: all cores)")
+    args = parser.parse_args()
+
+    partitions = prepare_data(get_universe(args.universe))
+    if not partitions:
+        sys.exit(1)
+    feature_names = get_feature_names(partitions)
+    X, dates, close, group = load_panel(partitions, feature_names)
+    fold_set = FoldSet(X, dates, close, group, feature_names, args.folds, args.test_days, args.scheme, int(365 * args.window_years))
+
+    candidates = candidate_grid(args.max_depth, args.learning_rate, args.n_estimators, args.horizon, args.threshold, samples=args.samples)
+    print(f"Searching {len(candidates)} configurations over {args.folds} {args.scheme} folds...")
+    leaderboard = run_search(fold_set, candidates, jobs=args.jobs)
+    print(leaderboard.head(10).to_string())
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    leaderboard_path = os.path.join(MODEL_DIR, f"leaderboard_{pd.Timestamp.now():%Y%m%d_%H%M%S}.csv")
+    leaderboard.to_csv(leaderboard_path, index=False)
+    print(f"\nLeaderboard saved as '{leaderboard_path}'")
+
+    best = leaderboard.iloc[0]
+    model, params, trained_through, rows = fit_best(fold_set, best)
+    metrics = {k: (float(v) if isinstance(v, (int, float, np.number)) else v) for k, v in best.items()}
+    meta = save_version(model, metrics, trained_through, "search", params, rows)
+    print(f"Best model saved as version {meta['version']} ('{meta['model_file']}')")
@@ -1,10 +1,20 @@
-import yfinance as yf
+import os
+import sys
+import json
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
+import pyarrow.parquet as pq
 import xgboost as xgb
-from sklearn.metrics import classification_report
+from sklearn.metrics import classification_report, log_loss, accuracy_score, precision_score, recall_score
 import joblib
-from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data.bar_store import load_bars
+from indicators.core import with_core_indicators
+from ml.registry import latest_version, load_version, save_version
 
 # A self-contained list of tickers for the trainer
 OMXS30_TICKERS = [
@@ -14,90 +24,262 @@ OMXS30_TICKERS = [
     'ASSA-B.ST', 'EPI-A.ST', 'INVE-B.ST', 'EQT.ST', 'ALFA.ST', 'ATCO-A.ST'
 ]
 
-def prepare_data(tickers, period="10y"):
-    """Downloads data for multiple tickers, creates features, and defines the target."""
-    all_data = []
-    print(f"Downloading historical data for {len(tickers)} tickers...")
-    for ticker in tickers:
-        data = yf.Ticker(ticker).history(period=period, interval="1d")
-        if not data.empty:
-            data['Ticker'] = ticker # Add ticker column for grouping
-            all_data.append(data)
-    
-    if not all_data:
+FEATURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "features")
+MANIFEST_PATH = os.path.join(FEATURE_DIR, "manifest.json")
+
+DEFAULT_PARAMS = {'objective': 'binary:logistic', 'eval_metric': 'logloss', 'max_depth': 5, 'tree_method': 'hist', 'nthread': -1}
+
+# Prediction target: price more than 3% higher 5 trading days ahead
+FUTURE_WINDOW = 5
+FUTURE_RETURN_THRESHOLD = 0.03
+
+# Bollinger features keep the column names the released models were trained with
+MODEL_COLUMN_NAMES = {f"{band}_20_2.0": f"{band}_20_2.0_2.0" for band in ('BBL', 'BBM', 'BBU', 'BBB', 'BBP')}
+
+def build_features(bars, future_window=FUTURE_WINDOW, future_return_threshold=FUTURE_RETURN_THRESHOLD):
+    """Calculates indicator features and the prediction target for a single stock's bars."""
+    data = with_core_indicators(bars).rename(columns=MODEL_COLUMN_NAMES)
+
+    future_price = data['Close'].shift(-future_window)
+    data['Target'] = (future_price > data['Close'] * (1 + future_return_threshold)).astype(int)
+    # The last `future_window` rows have no known outcome yet
+    data = data.iloc[:-future_window] if future_window else data
+    data = data.drop(columns=['Dividends', 'Stock Splits', 'Source'], errors='ignore')
+    return data.dropna()
+
+def _bars_fingerprint(bars):
+    """Cheap content hash used to detect tickers whose history has not changed since the last build."""
+    return f"{len(bars)}-{bars.index[-1]}-{int(pd.util.hash_pandas_object(bars, index=True).sum())}"
+
+def _feature_path(ticker):
+    """Hive-style partition file for one ticker: ml/features/ticker=<T>/part-0.parquet"""
+    return os.path.join(FEATURE_DIR, f"ticker={ticker.replace('^', '_')}", "part-0.parquet")
+
+def _build_and_store(ticker, bars):
+    features = build_features(bars)
+    # Compact dtypes: float32 features and an int8 target roughly halve the on-disk and in-memory size
+    target = features.pop('Target').astype('int8')
+    features = features.select_dtypes(include=['number']).astype('float32')
+    features['Target'] = target
+    features.index = pd.DatetimeIndex(features.index).tz_convert('UTC') if features.index.tz is not None else pd.DatetimeIndex(features.index).tz_localize('UTC')
+    features.index.name = 'Date'
+    path = _feature_path(ticker)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    features.reset_index().to_parquet(path, index=False)
+    return ticker, len(features)
+
+def _load_manifest():
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    return {}
+
+def prepare_data(tickers, period="10y", max_workers=None, chunk_size=64):
+    """
+    Builds the partitioned Parquet training set from the local bar store and returns
+    the list of partition files, one per ticker.
+
+    Tickers are processed in chunks so only `chunk_size` bar histories are held in
+    memory at once; partitions whose bars are unchanged since the last build are reused.
+    """
+    os.makedirs(FEATURE_DIR, exist_ok=True)
+    manifest = _load_manifest()
+    print(f"Preparing features for {len(tickers)} tickers...")
+
+    rebuilt = 0
+    with ProcessPoolExecutor(max_workers=max_workers) as process_pool, ThreadPoolExecutor(max_workers=8) as io_pool:
+        for chunk_start in range(0, len(tickers), chunk_size):
+            chunk = tickers[chunk_start:chunk_start + chunk_size]
+            chunk_bars = dict(zip(chunk, io_pool.map(lambda t: load_bars(t, period=period), chunk)))
+            fingerprints = {t: _bars_fingerprint(bars) for t, bars in chunk_bars.items() if not bars.empty}
+            stale = [t for t in fingerprints if manifest.get(t) != fingerprints[t] or not os.path.exists(_feature_path(t))]
+
+            futures = [process_pool.submit(_build_and_store, t, chunk_bars[t]) for t in stale]
+            for future in as_completed(futures):
+                try:
+                    ticker, rows = future.result()
+                    manifest[ticker] = fingerprints[ticker]
+                    rebuilt += 1
+                except Exception as e:
+                    print(f"Could not build features: {e}")
+            del chunk_bars
+
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Rebuilt {rebuilt} partitions.")
+
+    partitions = [_feature_path(t) for t in tickers if t in manifest and os.path.exists(_feature_path(t))]
+    if not partitions:
         print("Could not download any data. Exiting.")
-        return pd.DataFrame()
-        
-    combined_data = pd.concat(all_data)
-    
-    print("Calculating features for each stock...")
-    processed_groups = []
-    for ticker, group in combined_data.groupby('Ticker'):
-        # --- FIX: Apply all indicator calculations individually to this single stock's data ---
-        group.ta.sma(length=10, append=True)
-        group.ta.sma(length=50, append=True)
-        group.ta.macd(fast=12, slow=26, signal=9, append=True)
-        group.ta.rsi(length=14, append=True)
-        group.ta.obv(append=True)
-        group.ta.atr(length=14, append=True)
-        group.ta.bbands(length=20, append=True)
-        processed_groups.append(group)
-    
-    # Recombine into one large DataFrame with all indicators calculated
-    final_data = pd.concat(processed_groups)
-    
-    # Define the prediction target
-    future_window = 5
-    future_return_threshold = 0.03
-    
-    # Group by ticker again to correctly calculate future returns per stock
-    final_data['Future_Price'] = final_data.groupby('Ticker')['Close'].shift(-future_window)
-    final_data['Target'] = (final_data['Future_Price'] > final_data['Close'] * (1 + future_return_threshold)).astype(int)
-    
-    # Clean up data
-    final_data = final_data.dropna()
-    final_data = final_data.drop(columns=['Dividends', 'Stock Splits', 'Future_Price', 'Ticker'])
-    
-    return final_data
-
-def train_model(data):
-    """Splits data by time, trains an XGBoost model, and evaluates it."""
-    features = data.drop(columns=['Target']).select_dtypes(include=['number'])
-    target = data['Target']
-    
-    if features.index.tz is None:
-        features.index = features.index.tz_localize('UTC')
-        
-    split_date = pd.to_datetime("2024-01-01").tz_localize('UTC')
-    
-    X_train, X_test = features[features.index < split_date], features[features.index >= split_date]
-    y_train, y_test = target[target.index < split_date], target[target.index >= split_date]
-
-    if X_train.empty or X_test.empty:
-        print("Not enough data to perform a train/test split.")
-        return None
-
-    print(f"Training on {len(X_train)} samples, testing on {len(X_test)} samples.")
-    model = xgb.XGBClassifier(objective='binary:logistic', eval_metric='logloss', use_label_encoder=False, n_estimators=200, max_depth=5)
-    model.fit(X_train, y_train)
-    
-    print("\n--- Model Evaluation on Test Data (2024 onwards) ---")
-    preds = model.predict(X_test)
+    return partitions
+
+class ParquetBatchIter(xgb.DataIter):
+    """
+    Feeds the Parquet partitions to XGBoost one at a time through its external-memory
+    interface, so the full training set is never materialized in memory.
+    Only rows with `start <= Date < end` are used (either bound may be None).
+    """
+    def __init__(self, partitions, feature_names, cache_dir, start=None, end=None):
+        self.partitions = partitions
+        self.feature_names = feature_names
+        self.start, self.end = start, end
+        self._it = 0
+        super().__init__(cache_prefix=os.path.join(cache_dir, "cache"))
+
+    def read_batch(self, path):
+        table = pq.read_table(path, memory_map=True)
+        dates = table.column('Date').to_pandas()
+        mask = np.ones(len(dates), dtype=bool)
+        if self.start is not None: mask &= (dates >= self.start).to_numpy()
+        if self.end is not None: mask &= (dates < self.end).to_numpy()
+        X = np.column_stack([table.column(name).to_numpy() if name in table.column_names else np.zeros(len(dates), dtype=np.float32) for name in self.feature_names]).astype(np.float32, copy=False)
+        y = table.column('Target').to_numpy()
+        return X[mask], y[mask]
+
+    def next(self, input_data):
+        while self._it < len(self.partitions):
+            X, y = self.read_batch(self.partitions[self._it])
+            self._it += 1
+            if len(y):
+                input_data(data=X, label=y, feature_names=self.feature_names)
+                return True
+        return False
+
+    def reset(self):
+        self._it = 0
+
+def get_feature_names(partitions):
+    schema = pq.read_schema(partitions[0])
+    return [name for name in schema.names if name not in ('Date', 'Target')]
+
+def latest_labelled_date(partitions):
+    """Newest row across all partitions, read from the Date column only."""
+    return max(pq.read_table(path, columns=['Date']).column('Date').to_pandas().max() for path in partitions)
+
+def evaluate(booster, partitions, feature_names, start=None, end=None, title="Test Data"):
+    """Scores the booster on rows in [start, end), one partition at a time, and returns summary metrics."""
+    test_iter = ParquetBatchIter(partitions, feature_names, tempfile.gettempdir(), start=start, end=end)
+    probs, labels = [], []
+    for path in partitions:
+        X_test, y_test = test_iter.read_batch(path)
+        if len(y_test):
+            probs.append(booster.inplace_predict(X_test))
+            labels.append(y_test)
+    if not labels:
+        return {"samples": 0}
+    y_test, probs = np.concatenate(labels), np.concatenate(probs)
+    preds = (probs > 0.5).astype(int)
+    print(f"\n--- Model Evaluation on {title} ({len(y_test)} samples) ---")
     print(classification_report(y_test, preds, zero_division=0))
-    
+    return {
+        "samples": int(len(y_test)),
+        "logloss": float(log_loss(y_test, probs, labels=[0, 1])),
+        "accuracy": float(accuracy_score(y_test, preds)),
+        "precision": float(precision_score(y_test, preds, zero_division=0)),
+        "recall": float(recall_score(y_test, preds, zero_division=0)),
+    }
+
+def train_model(partitions, split_date=None, params=None, num_boost_round=200, window_start=None):
+    """
+    Splits the Parquet training set by time, trains an XGBoost model out-of-core, and evaluates it.
+    The split defaults to one year before the newest labelled row; `window_start` limits
+    training to a sliding window instead of the full history.
+
+    Returns (model, metrics, params).
+    """
+    if not partitions:
+        return None, {}, {}
+    latest = latest_labelled_date(partitions)
+    split_date = pd.Timestamp(split_date, tz='UTC') if split_date else latest - pd.Timedelta(days=365)
+    feature_names = get_feature_names(partitions)
+    params = {**DEFAULT_PARAMS, **(params or {})}
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        dtrain = xgb.DMatrix(ParquetBatchIter(partitions, feature_names, cache_dir, start=window_start, end=split_date))
+        if dtrain.num_row() == 0:
+            print("Not enough data to perform a train/test split.")
+            return None, {}, params
+        print(f"Training on {dtrain.num_row()} samples...")
+        booster = xgb.train(params, dtrain, num_boost_round=num_boost_round)
+
+    metrics = evaluate(booster, partitions, feature_names, start=split_date, title=f"Test Data ({split_date.date()} onwards)")
+    if not metrics["samples"]:
+        print("Not enough data to perform a train/test split.")
+        return None, {}, params
+    metrics["train_samples"] = int(dtrain.num_row())
+    metrics["split_date"] = str(split_date)
+    return to_classifier(booster), metrics, {**params, "num_boost_round": num_boost_round}
+
+def refresh_model(partitions, base_meta, params=None, num_boost_round=10):
+    """
+    Continues boosting the latest saved model on rows labelled since it was trained.
+    The new rows are scored with the previous model first, so the recorded metrics are
+    out-of-sample.
+
+    Returns (model, metrics, params), or (None, {}, {}) when there is nothing new.
+    """
+    trained_through = pd.Timestamp(base_meta["trained_through"])
+    trained_through = trained_through.tz_localize('UTC') if trained_through.tz is None else trained_through
+    base_model = load_version(base_meta)
+    booster = base_model.get_booster()
+    feature_names = booster.feature_names
+    params = {**DEFAULT_PARAMS, **base_meta.get("params", {}), **(params or {})}
+    params.pop("num_boost_round", None)
+
+    start = trained_through + pd.Timedelta(microseconds=1)
+    metrics = evaluate(booster, partitions, feature_names, start=start, title=f"New Rows (after {trained_through.date()})")
+    if not metrics["samples"]:
+        print("No newly labelled rows since the last model version.")
+        return None, {}, {}
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        dnew = xgb.DMatrix(ParquetBatchIter(partitions, feature_names, cache_dir, start=start))
+        booster = xgb.train(params, dnew, num_boost_round=num_boost_round, xgb_model=booster)
+    metrics["train_samples"] = int(dnew.num_row())
+    return to_classifier(booster), metrics, {**params, "num_boost_round": num_boost_round}
+
+def to_classifier(booster):
+    """Wraps a raw Booster as the XGBClassifier the dashboard loads (predict_proba, get_booster)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.json")
+        booster.save_model(path)
+        model = xgb.XGBClassifier()
+        model.load_model(path)
     return model
 
+def get_universe(name):
+    """Resolves a universe name to a ticker list; 'nordic' covers every index in the dashboard."""
+    if name == "omxs30":
+        return OMXS30_TICKERS
+    from data.fetchers.index_fetcher import NORDIC_INDICES
+    tickers = [t for index_tickers in NORDIC_INDICES.values() for t in index_tickers]
+    return list(dict.fromkeys(tickers))
+
 if __name__ == '__main__':
-    training_data = prepare_data(OMXS30_TICKERS)
-    
-    if not training_data.empty:
-        trained_model = train_model(training_data)
+    parser = argparse.ArgumentParser(description="Train the XGBoost suggestion model.")
+    parser.add_argument("--universe", choices=["omxs30", "nordic"], default="omxs30")
+    parser.add_argument("--workers", type=int, default=None, help="Feature-building processes (default: all cores)")
+    parser.add_argument("--mode", choices=["full", "refresh", "window"], default="full",
+                        help="full: retrain from scratch; refresh: continue boosting the latest version on new rows; window: retrain on a sliding window")
+    parser.add_argument("--split-date", default=None, help="Start of the test period (default: one year before the newest row)")
+    parser.add_argument("--window-years", type=float, default=3, help="Training window length for --mode window")
+    parser.add_argument("--rounds", type=int, default=None, help="Boosting rounds (default: 200, or 10 for refresh)")
+    args = parser.parse_args()
+
+    partitions = prepare_data(get_universe(args.universe), max_workers=args.workers)
+    base_meta = latest_version()
+
+    if partitions:
+        if args.mode == "refresh" and base_meta is not None:
+            trained_model, metrics, params = refresh_model(partitions, base_meta, num_boost_round=args.rounds or 10)
+            trained_through = latest_labelled_date(partitions)
+        else:
+            if args.mode == "refresh":
+                print("No saved model version to refresh; running a full retrain.")
+            window_start = latest_labelled_date(partitions) - pd.Timedelta(days=int(365 * args.window_years)) if args.mode == "window" else None
+            trained_model, metrics, params = train_model(partitions, split_date=args.split_date, num_boost_round=args.rounds or 200, window_start=window_start)
+            # Rows from the split onwards were only used for evaluation, so a later refresh picks them up
+            trained_through = pd.Timestamp(metrics["split_date"]) - pd.Timedelta(microseconds=1) if trained_model else None
         if trained_model:
-            # Ensure the ml directory exists
-            import os
-            if not os.path.exists('ml'):
-                os.makedirs('ml')
-            
-            model_filename = "ml/xgb_model.joblib"
-            joblib.dump(trained_model, model_filename)
-            print(f"\nModel trained and saved as '{model_filename}'")
+            meta = save_version(trained_model, metrics, trained_through, args.mode, params, metrics.get("train_samples", 0))
+            print(f"\nModel version {meta['version']} saved as '{meta['model_file']}' (trained through {meta['trained_through']})")
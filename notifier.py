@@ -5,9 +5,12 @@ from datetime import datetime, timedelta
 import pandas as pd
 
 # Reuse our existing functions
-from ui.dashboard import get_omxs30_tickers
-from data.fetchers.yahoo_fetcher import fetch
-from strategies.moving_average import generate_signals
+from data.fetchers.index_fetcher import get_omxs30_tickers
+from data.bar_store import get_bars
+from strategies.moving_average import latest_signals
+
+# Intraday timeframe the crossover runs on; coarser ones are resampled from stored 5m bars
+SIGNAL_TIMEFRAME = os.environ.get('SIGNAL_TIMEFRAME', '5m')
 
 # --- Email Configuration ---
 # For security, use environment variables for your email and password.
@@ -47,24 +50,32 @@ def send_notification(ticker, price, signal_time):
     except Exception as e:
         print(f"Error sending email: {e}")
 
-def check_for_strong_buys():
-    """Main function to check all stocks and send notifications."""
+def check_for_strong_buys(tickers=None, now=None, notify=send_notification):
+    """
+    Main function to check all stocks and send notifications. `now` and `notify` let a
+    replayed session (see `data.fetchers.replay`) run the check on its own clock.
+    """
     print("Starting analysis run...")
-    tickers = get_omxs30_tickers()
-    now = datetime.now(pd.Timestamp.now().tz) # Get timezone-aware current time
+    if tickers is None:
+        tickers = get_omxs30_tickers()
+    if now is None:
+        now = pd.Timestamp.now(tz='UTC') # Timezone-aware, comparable with the exchange-local bar index
 
     for ticker in tickers:
         try:
-            data = fetch(ticker)
+            data = get_bars(ticker, timeframe=SIGNAL_TIMEFRAME)
             if data.empty:
                 continue
             
-            strategy_data = generate_signals(data)
-            
             # A "strong" signal is a buy crossover that happened very recently.
-            # We look for a 'Position' change of 2 within the last 10 minutes.
+            # We look for a 'Position' change of 2 within the last 10 minutes,
+            # so only those bars need signals.
             time_filter = now - timedelta(minutes=10)
-            recent_buys = strategy_data[(strategy_data['Position'] == 2) & (strategy_data.index >= time_filter)]
+            recent_bars = int((data.index >= time_filter).sum())
+            if recent_bars == 0:
+                continue
+            strategy_data = latest_signals(data, bars=recent_bars)
+            recent_buys = strategy_data[strategy_data['Position'] == 2]
 
             if not recent_buys.empty:
                 # Get the most recent buy signal
@@ -73,7 +84,7 @@ def check_for_strong_buys():
                 signal_time = latest_buy.name # The index is the timestamp
                 
                 print(f"Strong buy signal found for {ticker} at {signal_time}!")
-                send_notification(ticker, price, signal_time)
+                notify(ticker, price, signal_time)
 
         except Exception as e:
             print(f"Could not analyze {ticker}. Error: {e}")
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+from data.bar_store import get_close_panel, get_fx_panel, get_currency
+
+
+class PortfolioEngine:
+    """
+    Holds portfolio positions as columnar NumPy arrays so valuation, P/L and
+    weights are computed for every holding in one vectorized pass.
+    """
+    def __init__(self, tickers, quantities, gavs, currencies, base_currency="SEK"):
+        self.tickers = np.asarray(tickers, dtype=object)
+        self.quantities = np.asarray(quantities, dtype=float)
+        self.gavs = np.asarray(gavs, dtype=float)
+        self.currencies = np.asarray(currencies, dtype=object)
+        self.base_currency = base_currency
+
+    @classmethod
+    def from_holdings(cls, holdings, base_currency="SEK"):
+        """Builds an engine from the dashboard's list of {"ticker", "quantity", "gav"} dicts."""
+        tickers = [h["ticker"] for h in holdings]
+        currency_by_ticker = {t: get_currency(t) for t in dict.fromkeys(tickers)}
+        return cls(
+            tickers,
+            [h["quantity"] for h in holdings],
+            [h["gav"] for h in holdings],
+            [currency_by_ticker[t] for t in tickers],
+            base_currency=base_currency,
+        )
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def valuation(self, prices, fx_rates):
+        """
+        Values every position given local prices and FX rates aligned with the positions.
+        Positions without a price are returned with NaN values and excluded from weights.
+        """
+        prices = np.asarray(prices, dtype=float)
+        fx_rates = np.nan_to_num(np.asarray(fx_rates, dtype=float), nan=1.0)
+
+        invested = self.quantities * self.gavs * fx_rates
+        value = self.quantities * prices * fx_rates
+        pl = value - invested
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pl_pct = np.where(invested != 0, (value / invested - 1) * 100, 0.0)
+        total_value = np.nansum(value)
+        weights = value / total_value * 100 if total_value else np.zeros_like(value)
+
+        return pd.DataFrame({
+            "Ticker": self.tickers, "Qty": self.quantities, "Currency": self.currencies,
+            "GAV (Local)": self.gavs, "Price (Local)": prices,
+            f"Value ({self.base_currency})": value, f"Invested ({self.base_currency})": invested,
+            f"P/L ({self.base_currency})": pl, "P/L %": pl_pct, "Weight %": weights,
+        })
+
+    def summary(self, valuation):
+        """Returns (total_value, total_investment, total_pl, total_pl_pct) over priced positions."""
+        priced = valuation[f"Value ({self.base_currency})"].notna()
+        total_value = valuation.loc[priced, f"Value ({self.base_currency})"].sum()
+        total_investment = valuation.loc[priced, f"Invested ({self.base_currency})"].sum()
+        total_pl = total_value - total_investment
+        total_pl_pct = (total_pl / total_investment) * 100 if total_investment != 0 else 0
+        return total_value, total_investment, total_pl, total_pl_pct
+
+    def _unique_positions(self):
+        """Collapses duplicate tickers into one summed quantity per instrument."""
+        unique_tickers, inverse = np.unique(self.tickers.astype(str), return_inverse=True)
+        quantities = np.bincount(inverse, weights=self.quantities, minlength=len(unique_tickers))
+        costs = np.bincount(inverse, weights=self.quantities * self.gavs, minlength=len(unique_tickers))
+        currencies = np.empty(len(unique_tickers), dtype=object)
+        currencies[inverse] = self.currencies
+        return unique_tickers, quantities, costs, currencies
+
+    def equity_curve(self, close_panel, fx_panel):
+        """
+        Computes the daily portfolio value in the base currency from a date x ticker
+        close panel and a date x currency FX panel, as a single matrix product.
+
+        Current quantities are assumed to have been held over the whole history, since
+        holdings carry no trade dates.
+        """
+        tickers, quantities, costs, currencies = self._unique_positions()
+        closes = close_panel.reindex(columns=tickers).ffill().to_numpy(dtype=float)
+        fx = fx_panel.reindex(index=close_panel.index, columns=currencies).ffill().bfill().to_numpy(dtype=float)
+        fx = np.nan_to_num(fx, nan=1.0)
+
+        # Before an instrument's first bar it contributes nothing instead of NaN-ing the total.
+        equity = np.nan_to_num(closes * fx, nan=0.0) @ quantities
+        cost_basis = fx @ costs
+        return pd.DataFrame({
+            f"Equity ({self.base_currency})": equity,
+            f"Cost Basis ({self.base_currency})": cost_basis,
+        }, index=close_panel.index)
+
+
+def value_portfolio(holdings, base_currency="SEK"):
+    """Fetches latest prices and FX rates from the bar store and values the portfolio."""
+    engine = PortfolioEngine.from_holdings(holdings, base_currency=base_currency)
+    if not len(engine):
+        return engine, pd.DataFrame()
+    close_panel = get_close_panel(list(engine.tickers), period="1mo")
+    fx_panel = get_fx_panel(list(engine.currencies), to_currency=base_currency, period="1mo", index=close_panel.index)
+    last_prices = close_panel.ffill().iloc[-1] if not close_panel.empty else pd.Series(dtype=float)
+    last_fx = fx_panel.iloc[-1] if not fx_panel.empty else pd.Series(dtype=float)
+    prices = last_prices.reindex(engine.tickers).to_numpy(dtype=float)
+    fx_rates = last_fx.reindex(engine.currencies).to_numpy(dtype=float)
+    return engine, engine.valuation(prices, fx_rates)
+
+
+def portfolio_equity_curve(holdings, period="2y", base_currency="SEK"):
+    """Builds the historical daily equity curve of the current holdings from the bar store."""
+    engine = PortfolioEngine.from_holdings(holdings, base_currency=base_currency)
+    if not len(engine):
+        return pd.DataFrame()
+    close_panel = get_close_panel(list(engine.tickers), period=period)
+    if close_panel.empty:
+        return pd.DataFrame()
+    fx_panel = get_fx_panel(list(engine.currencies), to_currency=base_currency, period=period, index=close_panel.index)
+    return engine.equity_curve(close_panel, fx_panel)
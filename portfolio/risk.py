@@ -0,0 +1,166 @@
+import threading
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+from data.bar_store import get_close_panel
+
+TRADING_DAYS = 252
+
+
+def build_return_panel(tickers, period="2y"):
+    """Returns one aligned date x ticker panel of daily simple returns from the bar store."""
+    close_panel = get_close_panel(tickers, period=period)
+    if close_panel.empty:
+        return pd.DataFrame(columns=list(tickers))
+    # Prices are forward-filled, so holidays on one exchange show as a 0% return instead of a gap.
+    returns = close_panel.pct_change(fill_method=None)
+    return returns.iloc[1:].dropna(how='all')
+
+
+class CovarianceTracker:
+    """
+    Maintains pairwise-complete covariance of a return panel from additive sufficient
+    statistics, so new daily bars are folded in without recomputing the full history.
+    The tracker follows the panel's window: rows that drop out of its start are subtracted
+    again, and the last row, which may belong to a session still trading, is replaced when
+    it changes. Covariance therefore always covers the rows historical VaR is taken over.
+    """
+    def __init__(self, tickers):
+        self.tickers = list(tickers)
+        k = len(self.tickers)
+        self.last_date = None
+        self._lock = threading.Lock()
+        self._rows = None                     # the rows folded in so far
+        self.counts = np.zeros((k, k))
+        self.sums = np.zeros((k, k))          # sums[i, j] = sum of x_i over rows where i and j are both present
+        self.cross_products = np.zeros((k, k))
+        self.squares = np.zeros((k, k))       # squares[i, j] = sum of x_i**2 over the same rows
+
+    def _fold(self, rows, sign=1):
+        """Adds (sign=1) or removes (sign=-1) `rows` from the sufficient statistics."""
+        if rows.empty:
+            return
+        values = rows.to_numpy(dtype=float)
+        present = (~np.isnan(values)).astype(float)
+        values = np.nan_to_num(values, nan=0.0)
+
+        self.counts += sign * (present.T @ present)
+        self.sums += sign * (values.T @ present)
+        self.cross_products += sign * (values.T @ values)
+        self.squares += sign * ((values ** 2).T @ present)
+
+    def update(self, returns):
+        """
+        Brings the tracker in line with `returns`: adds the rows newer than the last update,
+        removes those before its first row and refolds the last row if its values changed.
+        Returns the number of rows added.
+        """
+        returns = returns.reindex(columns=self.tickers).astype(float)
+        with self._lock:
+            if returns.empty:
+                return 0
+            if self._rows is None:
+                self._fold(returns)
+                self._rows, self.last_date = returns, returns.index[-1]
+                return len(returns)
+            expired = self._rows[self._rows.index < returns.index[0]]
+            kept = self._rows[self._rows.index >= returns.index[0]]
+            self._fold(expired, sign=-1)
+
+            provisional = kept.iloc[-1:]
+            current = returns.reindex(provisional.index)
+            if not provisional.equals(current):
+                self._fold(provisional, sign=-1)
+                self._fold(current)
+
+            added = returns[returns.index > self.last_date]
+            self._fold(added)
+            self._rows = pd.concat([kept.iloc[:-1], current, added]) if not kept.empty else added
+            self.last_date = self._rows.index[-1]
+            return len(added)
+
+    def mean(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return pd.Series(np.diag(self.sums) / np.diag(self.counts), index=self.tickers)
+
+    def covariance(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (self.cross_products - self.sums * self.sums.T / self.counts) / (self.counts - 1)
+        cov[self.counts < 2] = np.nan
+        return pd.DataFrame(cov, index=self.tickers, columns=self.tickers)
+
+    def correlation(self):
+        """Pairwise correlation, with each variance taken over the rows both series share."""
+        cov = self.covariance().to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pair_var = (self.squares - self.sums ** 2 / self.counts) / (self.counts - 1)
+            corr = cov / np.sqrt(pair_var * pair_var.T)
+        return pd.DataFrame(np.clip(corr, -1, 1), index=self.tickers, columns=self.tickers)
+
+
+def historical_var_cvar(portfolio_returns, confidence=0.95):
+    """Historical VaR and CVaR as positive loss fractions of portfolio value."""
+    portfolio_returns = np.asarray(portfolio_returns, dtype=float)
+    portfolio_returns = portfolio_returns[~np.isnan(portfolio_returns)]
+    if portfolio_returns.size == 0:
+        return np.nan, np.nan
+    cutoff = np.quantile(portfolio_returns, 1 - confidence)
+    return -cutoff, -portfolio_returns[portfolio_returns <= cutoff].mean()
+
+
+def parametric_var_cvar(mu, sigma, confidence=0.95):
+    """Gaussian (variance-covariance) VaR and CVaR as positive loss fractions of portfolio value."""
+    alpha = 1 - confidence
+    z = norm.ppf(alpha)
+    return -(mu + z * sigma), -(mu - sigma * norm.pdf(z) / alpha)
+
+
+def risk_contributions(weights, covariance):
+    """
+    Marginal and component contributions of each holding to portfolio volatility.
+    Component contributions sum to the portfolio volatility.
+    """
+    weights = np.asarray(weights, dtype=float)
+    cov = np.nan_to_num(np.asarray(covariance, dtype=float), nan=0.0)
+    sigma_w = cov @ weights
+    portfolio_vol = np.sqrt(weights @ sigma_w)
+    marginal = sigma_w / portfolio_vol if portfolio_vol > 0 else np.zeros_like(weights)
+    component = weights * marginal
+    percent = component / portfolio_vol * 100 if portfolio_vol > 0 else np.zeros_like(weights)
+    return portfolio_vol, marginal, component, percent
+
+
+def portfolio_risk_report(tracker, returns, weights, confidence=0.95):
+    """
+    Computes VaR/CVaR (historical and parametric, 1-day) and per-holding risk
+    contributions for the weighted instruments in `tracker`.
+
+    Args:
+        tracker: An up-to-date CovarianceTracker over (at least) the weighted tickers.
+        returns: The aligned return panel the tracker was built from.
+        weights: pd.Series of portfolio weights (fractions summing to 1) indexed by ticker.
+    """
+    weights = weights.reindex(tracker.tickers).fillna(0.0)
+    w = weights.to_numpy(dtype=float)
+    cov = tracker.covariance()
+    mu = float(np.nan_to_num(tracker.mean().to_numpy()) @ w)
+
+    portfolio_returns = np.nan_to_num(returns.reindex(columns=tracker.tickers).to_numpy(dtype=float), nan=0.0) @ w
+    hist_var, hist_cvar = historical_var_cvar(portfolio_returns, confidence)
+    portfolio_vol, marginal, component, percent = risk_contributions(w, cov)
+    param_var, param_cvar = parametric_var_cvar(mu, portfolio_vol, confidence)
+
+    held = w != 0
+    contributions = pd.DataFrame({
+        "Weight %": w[held] * 100,
+        "Volatility (ann.) %": np.sqrt(np.diag(cov.to_numpy())[held] * TRADING_DAYS) * 100,
+        "Marginal Risk": marginal[held],
+        "Risk Contribution %": percent[held],
+    }, index=np.asarray(tracker.tickers)[held])
+
+    summary = {
+        "Volatility (ann.)": portfolio_vol * np.sqrt(TRADING_DAYS),
+        "Historical VaR": hist_var, "Historical CVaR": hist_cvar,
+        "Parametric VaR": param_var, "Parametric CVaR": param_cvar,
+    }
+    return summary, contributions
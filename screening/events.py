@@ -0,0 +1,262 @@
+import os
+import json
+import logging
+import argparse
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from data.bar_store import load_bars, get_close_panel, naive_dates
+from data.fetchers.index_fetcher import NORDIC_INDICES
+from indicators.core import with_core_indicators
+from strategies.moving_average import generate_signals
+from strategies.latest_bar import market_index_for
+
+# Persistent index of signal events, so questions like "when did ERIC-B last become a Strong
+# Buy" or "how many OMXS30 names crossed SMA 10/50 this week" are lookups instead of a refetch
+# and a rerun of the analyzers per ticker. Every change is recorded once, per ticker and bar:
+#
+#   recommendation  the Trend-Following recommendation changed (From -> To)
+#   crossover       `generate_signals`' SMA 10/50 crossover: Position +2 -> 'Bullish', -2 -> 'Bearish'
+#   threshold       an indicator crossed a level in THRESHOLDS: 'Up' or 'Down'
+#
+# Events are point in time: a bar's recommendation is what `analyze_stock_latest` gives with
+# the history up to that bar, so recorded events never change as new bars arrive. The index is
+# one Parquet table under EVENT_DIR plus a manifest of the last bar indexed per ticker; a bulk
+# build replaces a ticker's events and an update appends only those after its last bar. A bar
+# is only indexed once its session has closed, so a forming bar never leaves events behind.
+
+logger = logging.getLogger(__name__)
+
+EVENT_DIR = os.environ.get("EVENT_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "events"))
+COLUMNS = ['Ticker', 'Date', 'Kind', 'Signal', 'From', 'To', 'Close']
+KINDS = ('recommendation', 'crossover', 'threshold')
+THRESHOLDS = [('RSI_14', 30), ('RSI_14', 70), ('MACDh_12_26_9', 0)]
+WARMUP = 50                  # `analyze_stock_latest` needs 50 bars, so no events before the 50th
+BULLISH = {'Strong Buy', 'Buy', 'Bullish', 'Up'}
+
+_lock = threading.Lock()
+_loaded = (None, None)       # (file mtime, events) of the last read
+
+
+def events_path():
+    return os.path.join(EVENT_DIR, "events.parquet")
+
+
+def manifest_path():
+    return os.path.join(EVENT_DIR, "manifest.json")
+
+
+def point_in_time_scores(data, index_data=None):
+    """
+    Signal_Score of every bar as `analyze_stock_latest` computes it on the history up to that
+    bar, vectorized over the whole series. Returns the indicator frame with 'Signal_Score'.
+    """
+    data = with_core_indicators(data)
+    close = data['Close']
+    relative_strength = pd.Series(np.nan, index=data.index)
+    if index_data is not None and not index_data.empty:
+        index_change = index_data['Close'].pct_change(20)
+        index_change.index = naive_dates(index_change.index)
+        index_change = index_change[~index_change.index.duplicated(keep='last')]
+        # The newest index bar known on each of the stock's dates
+        aligned = index_change.reindex(naive_dates(data.index), method='ffill').to_numpy()
+        relative_strength = close.pct_change(20) - aligned
+    # SMA_10 > SMA_50 counts twice, as in `analyze_stock`
+    trend = (data['SMA_10'] > data['SMA_50']).astype(int) * 2
+    obv = data['OBV']
+    score = (trend + (data['MACDh_12_26_9'] > 0) + (data['RSI_14'] < 60) + (obv > obv.rolling(10).mean())
+             + (relative_strength > 0) + (close > data['BBM_20_2.0']))
+    return data.assign(Relative_Strength=relative_strength, Signal_Score=score.astype(int))
+
+
+def _changes(values, valid):
+    """Positions where `values` differs from the previous bar, both bars inside `valid`."""
+    changed = np.zeros(len(values), dtype=bool)
+    changed[1:] = (values[1:] != values[:-1]) & valid[1:] & valid[:-1]
+    return np.flatnonzero(changed)
+
+
+def ticker_events(data, ticker, index_data=None):
+    """Every event in a ticker's daily bars, oldest first, as a DataFrame with COLUMNS."""
+    if data.empty or len(data) < WARMUP + 1:
+        return pd.DataFrame(columns=COLUMNS)
+    data = data[~data.index.duplicated(keep='last')].sort_index()
+    dates, close = naive_dates(data.index), data['Close'].to_numpy(dtype=np.float64)
+    valid = np.arange(len(data)) >= WARMUP - 1
+    frames = []
+
+    def add(kind, signal, positions, before, after):
+        frames.append(pd.DataFrame({'Ticker': ticker, 'Date': dates[positions], 'Kind': kind, 'Signal': signal,
+                                    'From': before, 'To': after, 'Close': close[positions]}))
+
+    scored = point_in_time_scores(data, index_data)
+    score = scored['Signal_Score'].to_numpy()
+    recommendation = np.select([score >= 5, score >= 3], ['Strong Buy', 'Buy'], 'Neutral/Sell')
+    positions = _changes(recommendation, valid)
+    add('recommendation', 'Trend-Following', positions, recommendation[positions - 1], recommendation[positions])
+
+    position = generate_signals(data)['Position'].to_numpy()
+    positions = np.flatnonzero((np.abs(position) == 2) & valid)
+    add('crossover', 'SMA 10/50', positions, None, np.where(position[positions] > 0, 'Bullish', 'Bearish'))
+
+    for column, level in THRESHOLDS:
+        values = scored[column].to_numpy(dtype=np.float64)
+        above = values > level
+        positions = _changes(above, valid & ~np.isnan(values))
+        add('threshold', f'{column} {level:g}', positions, None, np.where(above[positions], 'Up', 'Down'))
+
+    events = pd.concat(frames, ignore_index=True)
+    return events.sort_values(['Date', 'Kind'], kind='stable', ignore_index=True)[COLUMNS]
+
+
+def closed_bars(data, now=None):
+    """`data` without its last bar while that bar's session is still open, so only final bars are indexed."""
+    from screening.snapshots import MARKET_TZ, MARKET_CLOSE
+    if data.empty:
+        return data
+    now = pd.Timestamp.now(tz=MARKET_TZ) if now is None else pd.Timestamp(now).tz_convert(MARKET_TZ)
+    today = now.tz_localize(None).normalize()
+    session_over = now.tz_localize(None) >= today + pd.Timedelta(f"{MARKET_CLOSE}:00")
+    last = naive_dates(data.index[-1:])[0]
+    return data.iloc[:-1] if last > today or (last == today and not session_over) else data
+
+
+def _read_manifest():
+    if not os.path.exists(manifest_path()):
+        return {}
+    with open(manifest_path()) as f:
+        return json.load(f)
+
+
+def _replace(path, write):
+    # Written to a temporary file and swapped in, so readers never see a partial index
+    fd, tmp = tempfile.mkstemp(dir=EVENT_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _write(events, manifest):
+    os.makedirs(EVENT_DIR, exist_ok=True)
+    _replace(events_path(), lambda f: events.to_parquet(f, index=False))
+    _replace(manifest_path(), lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+
+
+def _index_tickers(tickers, period, incremental):
+    """Computes events for `tickers` and merges them into the stored index. Returns the rows added."""
+    market_bars = {}
+    computed, last_bars = [], {}
+    manifest = _read_manifest() if incremental else {}
+    for ticker in dict.fromkeys(tickers):
+        try:
+            data = closed_bars(load_bars(ticker, period=period))
+            if data.empty:
+                continue
+            symbol = market_index_for(ticker)
+            if symbol not in market_bars:
+                market_bars[symbol] = load_bars(symbol, period=period)
+            events = ticker_events(data, ticker, market_bars[symbol])
+            if ticker in manifest:
+                events = events[events['Date'] > pd.Timestamp(manifest[ticker])]
+            computed.append(events)
+            last_bars[ticker] = naive_dates(data.index).max().isoformat()
+        except Exception as e:
+            logger.warning("Event indexing failed for %s: %s", ticker, e)
+            continue
+    if not last_bars:
+        return pd.DataFrame(columns=COLUMNS)
+
+    added = pd.concat(computed, ignore_index=True) if computed else pd.DataFrame(columns=COLUMNS)
+    with _lock:
+        stored = load_events()
+        if not incremental:
+            stored = stored[~stored['Ticker'].isin(list(last_bars))]
+        manifest = {**_read_manifest(), **last_bars}
+        events = pd.concat([stored, added], ignore_index=True) if not stored.empty else added
+        _write(events.sort_values(['Date', 'Ticker'], kind='stable', ignore_index=True), manifest)
+    return added
+
+
+def build_events(tickers=None, period="2y"):
+    """Bulk build from the bar store: replaces the indexed history of every ticker (all Nordic indices by default)."""
+    return _index_tickers(tickers or _all_tickers(), period, incremental=False)
+
+
+def update_events(tickers=None, period="2y"):
+    """Appends the events after each ticker's last indexed bar; tickers not indexed yet get their full history."""
+    return _index_tickers(tickers or _all_tickers(), period, incremental=True)
+
+
+def _all_tickers():
+    return [ticker for tickers in NORDIC_INDICES.values() for ticker in tickers]
+
+
+def load_events(tickers=None, kinds=None, since=None, until=None):
+    """Indexed events, optionally filtered by ticker, kind and date range (inclusive)."""
+    global _loaded
+    path = events_path()
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=COLUMNS)
+    modified = os.path.getmtime(path)
+    if _loaded[0] != modified:
+        _loaded = (modified, pd.read_parquet(path))
+    events = _loaded[1]
+    mask = np.ones(len(events), dtype=bool)
+    if tickers is not None:
+        mask &= events['Ticker'].isin(list(tickers)).to_numpy()
+    if kinds is not None:
+        mask &= events['Kind'].isin([kinds] if isinstance(kinds, str) else list(kinds)).to_numpy()
+    if since is not None:
+        mask &= (events['Date'] >= pd.Timestamp(since)).to_numpy()
+    if until is not None:
+        mask &= (events['Date'] <= pd.Timestamp(until)).to_numpy()
+    return events[mask].reset_index(drop=True)
+
+
+def last_event(ticker, kind=None, to=None):
+    """The most recent event of a ticker (e.g. kind='recommendation', to='Strong Buy'), or None."""
+    events = load_events([ticker], kinds=kind)
+    if to is not None:
+        events = events[events['To'] == to]
+    return events.iloc[-1] if not events.empty else None
+
+
+def hit_rates(events, horizons=(5, 20), period="2y"):
+    """
+    Forward returns after each kind of event: count, mean return and hit rate (the share of
+    events the price moved the signalled way) per horizon in bars. Events too recent for a
+    horizon are left out of it.
+    """
+    if events.empty:
+        return pd.DataFrame()
+    panel = get_close_panel(events['Ticker'].unique(), period=period)
+    closes = panel.to_numpy(dtype=np.float64)
+    rows = np.searchsorted(panel.index.to_numpy(), events['Date'].to_numpy())
+    columns = panel.columns.get_indexer(events['Ticker'])
+    direction = np.where(events['To'].isin(BULLISH), 1.0, -1.0)
+    found = (columns >= 0) & (rows < len(panel))
+    entry = np.full(len(events), np.nan)
+    entry[found] = closes[rows[found], columns[found]]
+
+    results = events[['Kind', 'Signal', 'To']].copy()
+    for horizon in horizons:
+        ahead = found & (rows + horizon < len(panel))
+        forward = np.full(len(events), np.nan)
+        forward[ahead] = closes[rows[ahead] + horizon, columns[ahead]] / entry[ahead] - 1
+        results[f'Return {horizon}d [%]'] = forward * 100
+        results[f'Hit {horizon}d [%]'] = np.where(np.isnan(forward), np.nan, (forward * direction > 0) * 100.0)
+    grouped = results.groupby(['Kind', 'Signal', 'To'])
+    return grouped.size().to_frame('Events').join(grouped.mean())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build or update the signal-event index from the bar store.")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every ticker's full history instead of appending")
+    parser.add_argument("--period", default="2y", help="History to index, as a yfinance period")
+    parser.add_argument("--tickers", nargs="+", help="Tickers to index (default: every Nordic index component)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    added = (build_events if args.rebuild else update_events)(args.tickers, period=args.period)
+    print(f"{len(added)} events indexed; {len(load_events())} in '{events_path()}'")
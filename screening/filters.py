@@ -1,5 +1,267 @@
 # filters.py
+import re
+import json
+import numpy as np
+import pandas as pd
+from indicators.moving_averages import sma, ema, wma
+from indicators.macd import macd
+from indicators.rsi import wilder_rsi
+from indicators.bollinger import bollinger_bands
+from indicators.atr import atr
+from indicators.volume import obv
+
+# Declarative screening rules compiled into vectorized expressions over a universe panel.
+#
+# A screen is a dict (or a JSON/YAML file) such as:
+#
+#   {"name": "Trend", "min_score": 3, "rules": [
+#       {"name": "trend", "left": "SMA_10", "op": ">", "right": "SMA_50", "weight": 2},
+#       {"name": "rsi", "left": "RSI_14", "op": "<", "right": 60},
+#       {"name": "golden_cross", "left": "SMA_50", "op": "crosses_above", "right": "SMA_200", "group": "any"}]}
+#
+# Operands are OHLCV fields, numbers, or indicator names in pandas_ta's column style
+# (SMA_10, EMA_20, WMA_20, RSI_14, MACDh_12_26_9, BBL_20_2.0, ATRr_14, OBV, ROC_20), optionally
+# applied to another operand: "SMA_10(OBV)". Rules in the "all" group (the default)
+# must all pass, at least one rule in the "any" group must pass, and the summed weights
+# of passing rules must reach `min_score` when one is set. Rules in any other group
+# (e.g. "score") only add their weight.
+
+PRICE_FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+OPERAND_PATTERN = re.compile(r"^(?P<fn>[A-Za-z]+)(?:_(?P<params>[\d._]+))?(?:\((?P<inner>.+)\))?$")
+
+COMPARISONS = {
+    '>': lambda l, r: l > r,
+    '<': lambda l, r: l < r,
+    '>=': lambda l, r: l >= r,
+    '<=': lambda l, r: l <= r,
+    'crosses_above': lambda l, r: (l > r) & (l.shift(1) <= r.shift(1)),
+    'crosses_below': lambda l, r: (l < r) & (l.shift(1) >= r.shift(1)),
+}
+
+
+def _frame(values, like):
+    return pd.DataFrame(values, index=like.index, columns=like.columns)
+
+
+def _filled(x):
+    # The kernels expect gap-free columns; a ticker missing a date carries its last bar forward
+    return x.ffill().to_numpy(dtype=np.float64)
+
+
+def _on_close(kernel, output=None):
+    """Wraps an array kernel taking the source panel as its first argument."""
+    def indicator(panel, x, length=None, *params):
+        values = kernel(_filled(x), *(() if length is None else (int(length), *params)))
+        return _frame(values if output is None else values[output], x)
+    return indicator
+
+
+def _atr(panel, x, n=14):
+    return _frame(atr(_filled(panel['High']), _filled(panel['Low']), _filled(panel['Close']), int(n)), panel['Close'])
+
+
+def _macd(panel, x, f=12, s=26, g=9, output=0):
+    return _frame(macd(_filled(x), int(f), int(s), int(g))[output], x)
+
+
+# name -> function(panel, source, *params), built on the same kernels as the analyzers
+INDICATORS = {
+    'SMA': _on_close(sma),
+    'EMA': _on_close(ema),
+    'WMA': _on_close(wma),
+    'ROC': lambda panel, x, n=10: x.pct_change(int(n), fill_method=None) * 100,
+    'RSI': _on_close(wilder_rsi),
+    'MACD': lambda panel, x, *p: _macd(panel, x, *p, output=0),
+    'MACDh': lambda panel, x, *p: _macd(panel, x, *p, output=1),
+    'MACDs': lambda panel, x, *p: _macd(panel, x, *p, output=2),
+    'BBL': _on_close(bollinger_bands, 0),
+    'BBM': _on_close(bollinger_bands, 1),
+    'BBU': _on_close(bollinger_bands, 2),
+    'ATR': _atr,
+    'ATRr': _atr,
+    'OBV': lambda panel, x: _frame(obv(_filled(panel['Close']), panel['Volume'].fillna(0).to_numpy(dtype=np.float64)), panel['Close']),
+}
+
+
+def build_panel(bars_by_ticker):
+    """Aligns per-ticker OHLCV frames into a dict of date x ticker frames, one per field."""
+    frames = {}
+    for ticker, bars in bars_by_ticker.items():
+        if bars is None or bars.empty:
+            continue
+        index = pd.DatetimeIndex(bars.index)
+        # Exchange-local timestamps without tz, so daily bars from different markets share dates
+        bars = bars.set_axis(index.tz_localize(None) if index.tz is not None else index)
+        frames[ticker] = bars[~bars.index.duplicated(keep='last')]
+    if not frames:
+        return {}
+    return {field: pd.DataFrame({t: f[field] for t, f in frames.items() if field in f}).sort_index() for field in PRICE_FIELDS}
+
+
+class CompiledScreen:
+    """A screen whose rules have been parsed into vectorized expressions over a panel."""
+    def __init__(self, screen):
+        self.name = screen.get('name', 'Custom Screen')
+        self.min_score = screen.get('min_score')
+        default_group = 'any' if screen.get('require') == 'any' else 'all'
+        self.rules = []
+        for i, rule in enumerate(screen['rules']):
+            if rule['op'] not in COMPARISONS:
+                raise ValueError(f"Unknown operator '{rule['op']}' in rule {rule.get('name', i)}")
+            self.rules.append({
+                'name': rule.get('name', f"rule_{i + 1}"),
+                'left': self._parse(rule['left']), 'right': self._parse(rule['right']),
+                'op': rule['op'], 'weight': float(rule.get('weight', 1)),
+                'group': rule.get('group', default_group),
+                'label': f"{rule['left']} {rule['op']} {rule['right']}",
+            })
+
+    @staticmethod
+    def _parse(operand):
+        """Turns an operand into a nested (fn, params, inner) tuple, a field name or a number."""
+        if isinstance(operand, (int, float)):
+            return float(operand)
+        operand = str(operand).strip()
+        if operand in PRICE_FIELDS:
+            return operand
+        try:
+            return float(operand)
+        except ValueError:
+            pass
+        match = OPERAND_PATTERN.match(operand)
+        if not match or match['fn'] not in INDICATORS:
+            raise ValueError(f"Unknown operand '{operand}'")
+        params = tuple(float(p) for p in match['params'].split('_')) if match['params'] else ()
+        inner = CompiledScreen._parse(match['inner']) if match['inner'] else 'Close'
+        return (match['fn'], params, inner)
+
+    def _resolve(self, node, panel, cache):
+        if isinstance(node, float):
+            return node
+        if node in cache:
+            return cache[node]
+        if isinstance(node, str):
+            value = panel[node]
+        else:
+            fn, params, inner = node
+            value = INDICATORS[fn](panel, self._resolve(inner, panel, cache), *params)
+        cache[node] = value
+        return value
+
+    def evaluate(self, panel, last_only=True):
+        """
+        Evaluates every rule over the whole panel at once. Returns a per-ticker DataFrame
+        with one pass/fail column and one value column per rule plus Score and Passed;
+        with `last_only=False` the result is indexed by (date, ticker) for every bar.
+        """
+        cache = {}
+        passes, values = {}, {}
+        for rule in self.rules:
+            left = self._resolve(rule['left'], panel, cache)
+            right = self._resolve(rule['right'], panel, cache)
+            if isinstance(left, float):
+                left = pd.DataFrame(left, index=panel['Close'].index, columns=panel['Close'].columns)
+            if isinstance(right, float):
+                right = pd.DataFrame(right, index=left.index, columns=left.columns)
+            # Bars a ticker does not have stay missing, so the latest-bar lookup skips them
+            passes[rule['name']] = COMPARISONS[rule['op']](left, right).where(panel['Close'].notna())
+            values[rule['name']] = left
+
+        weights = {r['name']: r['weight'] for r in self.rules}
+        all_group = [r['name'] for r in self.rules if r['group'] == 'all']
+        any_group = [r['name'] for r in self.rules if r['group'] == 'any']
+
+        def select(frame):
+            if not last_only:
+                return frame.stack(future_stack=True)
+            # Latest available bar per ticker, so a stale or halted ticker is still screened
+            return frame.ffill().iloc[-1] if len(frame) else pd.Series(dtype=float)
+
+        result = pd.DataFrame({name: select(p) for name, p in passes.items()}).fillna(False).astype(bool)
+        score = sum(result[name] * weights[name] for name in result.columns)
+        passed = pd.Series(True, index=result.index)
+        if all_group:
+            passed &= result[all_group].all(axis=1)
+        if any_group:
+            passed &= result[any_group].any(axis=1)
+        if self.min_score is not None:
+            passed &= score >= self.min_score
+
+        for name, value in values.items():
+            result[f"{name}_value"] = select(value)
+        result['Score'] = score
+        result['Passed'] = passed
+        if not last_only:
+            result = result[select(panel['Close']).notna().to_numpy()]
+        return result
+
+    def details(self, row):
+        """Per-rule pass/fail details for one ticker's result row."""
+        return {r['name']: {'passed': bool(row[r['name']]), 'value': row[f"{r['name']}_value"], 'rule': r['label']} for r in self.rules}
+
+
+def compile_screen(screen):
+    """Compiles a screen dict, accepting the legacy AND/OR filter format from config/config.yaml."""
+    if 'rules' in screen and isinstance(screen['rules'], dict):
+        screen = _from_legacy(screen['rules'])
+    return CompiledScreen(screen)
+
+
+def _from_legacy(rules):
+    translated = []
+    for group, key in (('all', 'AND'), ('any', 'OR')):
+        for item in rules.get(key, []):
+            above = item.get('direction', 'above') == 'above'
+            if item['filter'] == 'rsi_filter':
+                translated.append({'name': f"rsi_{item.get('period', 14)}", 'left': f"RSI_{item.get('period', 14)}",
+                                   'op': '>' if above else '<', 'right': item['threshold'], 'group': group})
+            elif item['filter'] == 'bollinger_filter':
+                period, std = item.get('period', 20), float(item.get('std_dev', 2))
+                translated.append({'name': f"bollinger_{period}", 'left': 'Close', 'op': '>' if above else '<',
+                                   'right': f"{'BBU' if above else 'BBL'}_{period}_{std}", 'group': group})
+            else:
+                raise ValueError(f"Unknown filter '{item['filter']}'")
+    return {'name': 'Config Screen', 'rules': translated}
+
+
+def load_screen(path):
+    """Loads a screen definition from a JSON or YAML file."""
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def run_screen(bars_by_ticker, screen):
+    """Builds the universe panel and evaluates a screen (dict or CompiledScreen) on the latest bar."""
+    compiled = screen if isinstance(screen, CompiledScreen) else compile_screen(screen)
+    panel = build_panel(bars_by_ticker)
+    if not panel:
+        return pd.DataFrame()
+    return compiled.evaluate(panel)
+
+
+# Rule-based equivalent of `analyze_stock`'s Signal_Score on the latest bar (relative strength
+# needs the market index and is left out). SMA_10 > SMA_50 is counted twice there, once per bar
+# and once for the latest bar, hence weight 2.
+TREND_FOLLOWING_SCREEN = {
+    'name': 'Trend-Following', 'min_score': 3,
+    'rules': [
+        {'name': 'trend', 'left': 'SMA_10', 'op': '>', 'right': 'SMA_50', 'weight': 2, 'group': 'score'},
+        {'name': 'momentum', 'left': 'MACDh_12_26_9', 'op': '>', 'right': 0, 'group': 'score'},
+        {'name': 'not_overbought', 'left': 'RSI_14', 'op': '<', 'right': 60, 'group': 'score'},
+        {'name': 'volume_trend', 'left': 'OBV', 'op': '>', 'right': 'SMA_10(OBV)', 'group': 'score'},
+        {'name': 'above_mid_band', 'left': 'Close', 'op': '>', 'right': 'BBM_20_2.0', 'group': 'score'},
+    ],
+}
+
+
 def apply_screen(df, rules):
-    # Placeholder: returns all indicators passed and score
-    details = {'rsi': {'passed': True, 'value': 50}}
-    return True, details
+    """Screens a single stock's OHLCV DataFrame. Returns (passed, per-rule details)."""
+    compiled = rules if isinstance(rules, CompiledScreen) else compile_screen(rules)
+    result = compiled.evaluate(build_panel({'_': df}))
+    if result.empty:
+        return False, {}
+    row = result.iloc[0]
+    return bool(row['Passed']), compiled.details(row)
@@ -0,0 +1,219 @@
+import os
+import math
+import time
+import argparse
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from strategies.latest_bar import analyze_stock_latest, analyze_stock_mean_reversion_latest, market_index_for
+
+# Process-sharded analysis for universes of thousands of tickers. The bars are packed once
+# into a shared-memory block (int64 timestamps followed by a float64 rows x OHLCV array, with
+# per-ticker row offsets); worker processes attach to it by name and wrap each ticker's rows
+# as a read-only DataFrame view, so no bars are pickled. Each shard of tickers is analyzed
+# with the latest-bar analyzers and only the compact per-ticker records travel back, streamed
+# to the caller as shards complete.
+
+FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+def _trend_following(bars, ticker):
+    # The market index travels in the same block; a missing one gives NaN relative strength
+    # instead of a download from every worker
+    return analyze_stock_latest(bars.frame(ticker), ticker, bars.frame(market_index_for(ticker)))
+
+
+def _mean_reversion(bars, ticker):
+    return analyze_stock_mean_reversion_latest(bars.frame(ticker), ticker)
+
+
+# strategy name -> function(SharedBars, ticker) returning a record dict or None
+ANALYZERS = {
+    "Trend-Following": _trend_following,
+    "Mean-Reversion": _mean_reversion,
+}
+
+
+class SharedBars:
+    """
+    OHLCV histories for many tickers in one shared-memory block. `pack` creates and owns
+    the block; `attach` maps it in another process from the picklable `layout`.
+    """
+    def __init__(self, shm, layout, owner):
+        self._shm = shm
+        self.layout = layout
+        self.owner = owner
+        rows = layout["rows"]
+        self.timestamps = np.ndarray((rows,), dtype=np.int64, buffer=shm.buf)
+        self.values = np.ndarray((rows, len(FIELDS)), dtype=np.float64, buffer=shm.buf, offset=rows * 8)
+        if not owner:
+            self.timestamps.setflags(write=False)
+            self.values.setflags(write=False)
+
+    @classmethod
+    def pack(cls, bars_by_ticker):
+        frames = {t: bars for t, bars in bars_by_ticker.items() if bars is not None and not bars.empty}
+        rows = sum(len(bars) for bars in frames.values())
+        shm = shared_memory.SharedMemory(create=True, size=max(rows * 8 * (1 + len(FIELDS)), 1))
+        offsets, timezones, start = {}, {}, 0
+        layout = {"name": shm.name, "rows": rows, "offsets": offsets, "timezones": timezones}
+        bars = cls(shm, layout, owner=True)
+        for ticker, frame in frames.items():
+            index = pd.DatetimeIndex(frame.index)
+            end = start + len(frame)
+            timezones[ticker] = str(index.tz) if index.tz is not None else None
+            bars.timestamps[start:end] = (index.tz_convert("UTC").tz_localize(None) if index.tz is not None else index).as_unit("ns").asi8
+            bars.values[start:end] = frame.reindex(columns=list(FIELDS)).to_numpy(dtype=np.float64)
+            offsets[ticker] = (start, end)
+            start = end
+        return bars
+
+    @classmethod
+    def attach(cls, layout):
+        return cls(shared_memory.SharedMemory(name=layout["name"]), layout, owner=False)
+
+    @property
+    def tickers(self):
+        return list(self.layout["offsets"])
+
+    def frame(self, ticker):
+        """Read-only DataFrame over the ticker's rows (empty when the ticker is not in the block)."""
+        if ticker not in self.layout["offsets"]:
+            return pd.DataFrame(columns=list(FIELDS), dtype=np.float64)
+        start, end = self.layout["offsets"][ticker]
+        index = pd.DatetimeIndex(self.timestamps[start:end].view("datetime64[ns]"))
+        tz = self.layout["timezones"][ticker]
+        if tz is not None:
+            index = index.tz_localize("UTC").tz_convert(tz)
+        values = self.values[start:end]
+        if self.owner:
+            values = values.view()
+            values.setflags(write=False)
+        return pd.DataFrame(values, index=index, columns=list(FIELDS), copy=False)
+
+    def close(self):
+        # Views into the buffer must be gone before the mapping can be closed
+        self.timestamps = self.values = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_attached = {}
+
+
+def _analyze_shard(layout, tickers, strategy):
+    """Worker side: attaches to the block once per process and analyzes one shard."""
+    bars = _attached.get(layout["name"])
+    if bars is None:
+        # A worker serves one block at a time; drop mappings of earlier scans
+        for old in _attached.values():
+            old.close()
+        _attached.clear()
+        bars = _attached[layout["name"]] = SharedBars.attach(layout)
+    analyzer = ANALYZERS[strategy]
+    records, failed = [], []
+    for ticker in tickers:
+        try:
+            record = analyzer(bars, ticker)
+        except Exception as e:
+            failed.append((ticker, f"{type(e).__name__}: {e}"))
+            continue
+        if record is not None:
+            records.append(record)
+    return records, failed
+
+
+def shard(tickers, workers, shards_per_worker=4):
+    """Splits tickers into contiguous shards, several per worker so a slow shard doesn't idle the rest."""
+    size = max(1, math.ceil(len(tickers) / (workers * shards_per_worker)))
+    return [tickers[i:i + size] for i in range(0, len(tickers), size)]
+
+
+def make_executor(workers=None):
+    """
+    Worker pool for `iter_sharded`. Workers are spawned rather than forked because callers
+    include the threaded Streamlit server; reuse one pool to pay the start-up once.
+    """
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+
+
+def iter_sharded(bars_by_ticker, strategy="Trend-Following", tickers=None, workers=None, executor=None):
+    """
+    Analyzes `tickers` (default: every ticker in `bars_by_ticker`) across worker processes,
+    yielding per-ticker records as each shard finishes. Include the market indices
+    (^OMX, SPY) in `bars_by_ticker` for Trend-Following relative strength.
+    """
+    if strategy not in ANALYZERS:
+        raise ValueError(f"Unknown strategy '{strategy}'")
+    workers = workers or (executor._max_workers if executor is not None else os.cpu_count())
+    own_executor = executor is None
+    with SharedBars.pack(bars_by_ticker) as bars:
+        tickers = [t for t in (tickers or bars.tickers) if t in bars.layout["offsets"]]
+        if own_executor:
+            executor = make_executor(workers)
+        try:
+            futures = [executor.submit(_analyze_shard, bars.layout, part, strategy) for part in shard(tickers, workers)]
+            for future in as_completed(futures):
+                records, failed = future.result()
+                for ticker, error in failed:
+                    print(f"Could not analyze {ticker}: {error}")
+                yield from records
+        finally:
+            if own_executor:
+                executor.shutdown(cancel_futures=True)
+
+
+def run_sharded(bars_by_ticker, strategy="Trend-Following", tickers=None, workers=None, executor=None):
+    """`iter_sharded` merged into one DataFrame, one row per analyzed ticker."""
+    records = list(iter_sharded(bars_by_ticker, strategy, tickers, workers, executor))
+    return pd.DataFrame(records).sort_values("Ticker", ignore_index=True) if records else pd.DataFrame()
+
+
+def _read_tickers(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+if __name__ == '__main__':
+    from data.bar_store import load_bars
+
+    parser = argparse.ArgumentParser(description="Scan a large universe on the latest bar across worker processes.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--universe", choices=["omxs30", "nordic"], help="A built-in universe")
+    source.add_argument("--tickers-file", help="File with one ticker per line, e.g. a US or TSX symbol list")
+    parser.add_argument("--strategy", choices=list(ANALYZERS), default="Trend-Following")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--period", default="1y", help="History loaded from the bar store per ticker")
+    parser.add_argument("--output", default=None, help="Write all records to this CSV file")
+    args = parser.parse_args()
+
+    if args.universe:
+        from ml.trainer import get_universe
+        tickers = get_universe(args.universe)
+    else:
+        tickers = _read_tickers(args.tickers_file)
+    symbols = list(dict.fromkeys(tickers + sorted({market_index_for(t) for t in tickers})))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as io_pool:
+        bars = dict(zip(symbols, io_pool.map(lambda t: load_bars(t, period=args.period), symbols)))
+    loaded = time.perf_counter()
+    results = run_sharded(bars, args.strategy, tickers=tickers, workers=args.workers)
+    print(f"Loaded {len(symbols)} histories in {loaded - started:.1f}s, analyzed {len(results)} tickers in {time.perf_counter() - loaded:.1f}s")
+
+    if args.output:
+        results.to_csv(args.output, index=False)
+        print(f"Results saved as '{args.output}'")
+    if not results.empty:
+        buys = results[results['Recommendation'].fillna('').str.contains('Buy')]
+        print(f"\n{len(buys)} '{args.strategy}' Buy signals:")
+        print(buys.to_string(index=False))
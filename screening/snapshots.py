@@ -0,0 +1,307 @@
+import os
+import re
+import glob
+import time
+import pickle
+import logging
+import argparse
+import threading
+import tempfile
+import pandas as pd
+from data.bar_store import load_bars, get_bars, period_start, naive_dates
+from data.fetchers.scheduler import fetch_bars, BACKGROUND
+from data.fetchers.index_fetcher import NORDIC_INDICES
+from strategies.latest_bar import analyze_stock_latest, analyze_stock_mean_reversion_latest, market_index_for
+from strategies.advanced_analyzer import ml_features, explain_ml_batch, ML_PERIOD
+from screening.events import update_events
+from diagnostics.tracing import span
+
+# Precomputed scan results. After each market close (or each intraday bar) every index in
+# NORDIC_INDICES is scanned once with the Trend-Following, Mean-Reversion and ML rules, and the
+# results are stored as versioned snapshots keyed by the bar they describe:
+#
+#   <SNAPSHOT_DIR>/<index>/<timeframe>/<bar timestamp>/v0001.pkl
+#
+# A recomputation for the same bar (late data, a new model) writes the next version. The
+# dashboard serves the newest snapshot instantly and computes live only for ad-hoc tickers.
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "snapshots"))
+KEEP_BARS = 20                       # snapshots kept per index and timeframe, newest bars first
+MARKET_TZ = "Europe/Stockholm"
+MARKET_CLOSE = "17:45"               # after the Stockholm, Copenhagen, Helsinki and Oslo closes (local time)
+BAR_DELAY = pd.Timedelta(seconds=30) # grace period for an intraday bar to be published
+
+
+def _slug(name):
+    return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")
+
+
+def _bar_key(bar):
+    return pd.Timestamp(bar).strftime("%Y%m%dT%H%M")
+
+
+def snapshot_dir(index_name, timeframe="1d"):
+    return os.path.join(SNAPSHOT_DIR, _slug(index_name), timeframe)
+
+
+def list_snapshots(index_name, timeframe="1d"):
+    """(bar key, version, path) of every stored snapshot, oldest bar and version first."""
+    snapshots = []
+    for path in glob.glob(os.path.join(snapshot_dir(index_name, timeframe), "*", "v*.pkl")):
+        bar_key = os.path.basename(os.path.dirname(path))
+        snapshots.append((bar_key, int(os.path.basename(path)[1:-4]), path))
+    return sorted(snapshots)
+
+
+def latest_snapshot_path(index_name, timeframe="1d"):
+    snapshots = list_snapshots(index_name, timeframe)
+    return snapshots[-1][2] if snapshots else None
+
+
+def read_snapshot(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def latest_snapshot(index_name, timeframe="1d"):
+    """The newest snapshot for an index, or None when nothing has been precomputed yet."""
+    path = latest_snapshot_path(index_name, timeframe)
+    return read_snapshot(path) if path else None
+
+
+def is_current(snapshot, model_version=None):
+    """
+    Whether a snapshot can be served instead of scanning live: no scheduled run has been
+    missed since it was made and, when given, it was scored with the current model.
+    """
+    if snapshot is None:
+        return False
+    if snapshot["created"] < previous_run(pd.Timestamp.now(tz="UTC"), snapshot["timeframe"]):
+        return False
+    return model_version is None or snapshot.get("model_version") == model_version
+
+
+def save_snapshot(snapshot):
+    """Writes the next version for the snapshot's bar atomically and prunes old bars. Returns the path."""
+    bar_dir = os.path.join(snapshot_dir(snapshot["index"], snapshot["timeframe"]), _bar_key(snapshot["bar"]))
+    os.makedirs(bar_dir, exist_ok=True)
+    existing = [int(os.path.basename(p)[1:-4]) for p in glob.glob(os.path.join(bar_dir, "v*.pkl"))]
+    snapshot["version"] = max(existing, default=0) + 1
+    path = os.path.join(bar_dir, f"v{snapshot['version']:04d}.pkl")
+    # Readers list the directory at any time, so the file appears only once it is complete
+    fd, tmp = tempfile.mkstemp(dir=bar_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+    bar_dirs = sorted(glob.glob(os.path.join(snapshot_dir(snapshot["index"], snapshot["timeframe"]), "*")))
+    for old in bar_dirs[:-KEEP_BARS]:
+        for file in glob.glob(os.path.join(old, "*")):
+            os.remove(file)
+        os.rmdir(old)
+    return path
+
+
+def current_model():
+    """(model, version) of the newest registry model; version 0 is the legacy single-file model."""
+    from ml.registry import latest_version, load_version
+    try:
+        meta = latest_version()
+        return load_version(meta), meta["version"] if meta else 0
+    except FileNotFoundError:
+        return None, None
+
+
+def compute_snapshot(index_name, tickers, timeframe="1d", model=None, model_version=None):
+    """
+    Scans one index on its latest bar with every strategy and returns the snapshot dict. The
+    ML model scores the whole index in one batch, with per-feature contributions for every row.
+    """
+    trend, mean_reversion, feature_rows = [], [], []
+    market_bars = {}
+    latest_bar = None
+    # Stored bars written before the last close may end in that day's partial bar, so they are refetched
+    since_close = (pd.Timestamp.now(tz="UTC") - previous_run(pd.Timestamp.now(tz="UTC"))).total_seconds() / 3600
+    for ticker in tickers:
+        with span("scan", ticker):
+            try:
+                with span("fetch"):
+                    data = load_bars(ticker, period="2y", max_age_hours=since_close) if timeframe == "1d" else get_bars(ticker, timeframe=timeframe)
+                if data.empty or len(data) <= 50:
+                    continue
+                bar = pd.Timestamp(data.index[-1])
+                latest_bar = bar if latest_bar is None or bar > latest_bar else latest_bar
+
+                symbol = market_index_for(ticker)
+                if symbol not in market_bars:
+                    with span("fetch", symbol=symbol):
+                        market_bars[symbol] = fetch_bars(symbol, period="3mo", priority=BACKGROUND)
+                record = analyze_stock_latest(data, ticker, market_bars[symbol])
+                reversion = analyze_stock_mean_reversion_latest(data, ticker)
+                if record is not None:
+                    trend.append(record)
+                if reversion is not None:
+                    mean_reversion.append(reversion)
+
+                # The model is trained on daily bars
+                if model is not None and timeframe == "1d" and record is not None:
+                    # Over the same history as the live ML scan, or cumulative features like OBV differ
+                    history = data[naive_dates(data.index) >= period_start(ML_PERIOD)]
+                    row = ml_features(history, model.get_booster().feature_names)
+                    if not row.empty:
+                        feature_rows.append(row.set_axis([ticker]))
+            except Exception as e:
+                logger.warning("Precompute failed for %s: %s", ticker, e)
+                continue
+
+    ml, features, contributions = [], pd.DataFrame(), pd.DataFrame()
+    if feature_rows:
+        features = pd.concat(feature_rows).rename_axis('Ticker')
+        predictions, contributions = explain_ml_batch(features, model)
+        records = {record['Ticker']: record for record in trend}
+        ml = [{**records[ticker], "ML_Prediction": int(row.ML_Prediction), "ML_Confidence": float(row.ML_Confidence)}
+              for ticker, row in predictions.iterrows()]
+
+    return {
+        "index": index_name, "timeframe": timeframe, "bar": latest_bar,
+        "created": pd.Timestamp.now(tz="UTC"), "model_version": model_version, "tickers": len(tickers),
+        "trend": pd.DataFrame(trend), "mean_reversion": pd.DataFrame(mean_reversion), "ml": pd.DataFrame(ml),
+        "ml_features": features, "ml_contributions": contributions,
+    }
+
+
+def buy_signals(results):
+    """
+    Screener rows for the records of a snapshot's strategy table that recommend a Buy. A
+    Mean-Reversion record has no recommendation when no condition fired; it is skipped.
+    """
+    signals = []
+    for record in results.to_dict('records'):
+        recommendation = record.get('Recommendation')
+        if isinstance(recommendation, str) and "Buy" in recommendation:
+            row = {'Ticker': record['Ticker'], 'Recommendation': recommendation}
+            if 'Signal_Score' in record:
+                row['Signal Score'] = f"{int(record['Signal_Score'])}/7"
+            signals.append(row)
+    return signals
+
+
+def precompute_all(indices=None, timeframe="1d"):
+    """
+    Computes and stores a snapshot for every index and, for daily bars, appends the new
+    signal events to the event index. Returns the written paths.
+    """
+    indices = indices or NORDIC_INDICES
+    model, model_version = current_model()
+    paths = []
+    for index_name, tickers in indices.items():
+        started = time.perf_counter()
+        snapshot = compute_snapshot(index_name, tickers, timeframe, model, model_version)
+        if snapshot["bar"] is None:
+            logger.warning("No bars for %s; snapshot skipped", index_name)
+            continue
+        paths.append(save_snapshot(snapshot))
+        logger.info("Precomputed %s (%s) for bar %s in %.1fs", index_name, timeframe, snapshot["bar"], time.perf_counter() - started)
+    if timeframe == "1d":
+        # The bars were just loaded into the store, so this only reads them back
+        added = update_events([ticker for tickers in indices.values() for ticker in tickers])
+        logger.info("Indexed %d new signal events", len(added))
+    return paths
+
+
+def _bar_length(timeframe):
+    return pd.Timedelta(timeframe.replace("m", "min"))
+
+
+def _daily_run(day, close):
+    hour, minute = map(int, close.split(":"))
+    return day.normalize() + pd.Timedelta(hours=hour, minutes=minute)
+
+
+def next_run(now, timeframe="1d", close=MARKET_CLOSE, tz=MARKET_TZ):
+    """Next time a scan should run: the next weekday close for daily bars, the next bar boundary otherwise."""
+    now = pd.Timestamp(now).tz_convert(tz)
+    if timeframe != "1d":
+        run = now.floor(_bar_length(timeframe)) + BAR_DELAY
+        return run if run > now else run + _bar_length(timeframe)
+    run = _daily_run(now, close)
+    while run <= now or run.weekday() >= 5:
+        run = _daily_run(run + pd.Timedelta(days=1), close)
+    return run
+
+
+def previous_run(now, timeframe="1d", close=MARKET_CLOSE, tz=MARKET_TZ):
+    """The most recent scheduled run at or before `now`."""
+    now = pd.Timestamp(now).tz_convert(tz)
+    if timeframe != "1d":
+        run = now.floor(_bar_length(timeframe)) + BAR_DELAY
+        return run if run <= now else run - _bar_length(timeframe)
+    run = _daily_run(now, close)
+    while run > now or run.weekday() >= 5:
+        run = _daily_run(run - pd.Timedelta(days=1), close)
+    return run
+
+
+class PrecomputeScheduler:
+    """
+    Background thread that refreshes the snapshots after every close (or bar). On start it
+    catches up immediately when the newest snapshot is older than the latest close.
+    """
+    def __init__(self, indices=None, timeframe="1d"):
+        self.indices = indices or NORDIC_INDICES
+        self.timeframe = timeframe
+        self.last_run = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _needs_catch_up(self):
+        return not all(is_current(latest_snapshot(index_name, self.timeframe)) for index_name in self.indices)
+
+    def run_once(self):
+        try:
+            precompute_all(self.indices, self.timeframe)
+            self.last_run, self.last_error = pd.Timestamp.now(tz="UTC"), None
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            logger.exception("Precompute run failed")
+
+    def _loop(self):
+        if self._needs_catch_up():
+            self.run_once()
+        while not self._stop.is_set():
+            wait = (next_run(pd.Timestamp.now(tz="UTC"), self.timeframe) - pd.Timestamp.now(tz="UTC")).total_seconds()
+            if self._stop.wait(max(wait, 0)):
+                break
+            self.run_once()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="precompute-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precompute scan snapshots for the Nordic indices.")
+    parser.add_argument("--timeframe", default="1d", help="Bar timeframe: 1d, or an intraday one such as 5m or 1h")
+    parser.add_argument("--once", action="store_true", help="Run one precompute pass and exit (e.g. from cron)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.once:
+        for path in precompute_all(timeframe=args.timeframe):
+            print(f"Snapshot saved as '{path}'")
+    else:
+        scheduler = PrecomputeScheduler(timeframe=args.timeframe).start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            scheduler.stop()
@@ -1,25 +1,30 @@
 import pandas as pd
-import pandas_ta as ta
-from data.fetchers.yfinance_fetcher import fetch_daily_bars
+from data.bar_cache import shared_bars
+from indicators.core import with_core_indicators, match_feature_columns
+from indicators.moving_averages import sma
+from diagnostics.tracing import span
+
+# History the ML features are computed over. OBV is cumulative, so every scan that scores
+# the model (live or precomputed) has to build the features from the same window.
+ML_PERIOD = "1y"
 
 def analyze_stock(data: pd.DataFrame, ticker: str) -> pd.DataFrame:
-    """Performs an advanced analysis on stock data using multiple indicators."""
+    """
+    Performs an advanced analysis on stock data using multiple indicators. Returns a new
+    DataFrame with the indicator and signal columns; `data` itself is not modified.
+    """
     if data.empty or len(data) < 50:
         return pd.DataFrame()
 
-    data.ta.sma(length=10, append=True)
-    data.ta.sma(length=50, append=True)
-    data.ta.macd(fast=12, slow=26, signal=9, append=True)
-    data.ta.rsi(length=14, append=True)
-    data.ta.obv(append=True)
-    data.ta.atr(length=14, append=True)
-    data.ta.bbands(length=20, append=True)
+    with span("indicator", ticker):
+        data = with_core_indicators(data)
     
     is_outperforming = False
     try:
         if ticker.endswith('.ST'): market_index = '^OMX'
         else: market_index = 'SPY'
-        index_data = fetch_daily_bars(market_index, period="3mo")
+        with span("fetch", ticker, symbol=market_index):
+            index_data = shared_bars(market_index, period="3mo")
         if not index_data.empty:
             stock_performance = data['Close'].pct_change(20).iloc[-1]
             index_performance = index_data['Close'].pct_change(20).iloc[-1]
@@ -29,44 +34,79 @@ def analyze_stock(data: pd.DataFrame, ticker: str) -> pd.DataFrame:
     except Exception:
         is_outperforming = False
 
-    data['Signal_Score'] = 0
-    data.loc[data['SMA_10'] > data['SMA_50'], 'Signal_Score'] += 1
-    data.loc[data['MACDh_12_26_9'] > 0, 'Signal_Score'] += 1
-    data.loc[data['RSI_14'] < 60, 'Signal_Score'] += 1
-    data['OBV_SMA_10'] = data['OBV'].rolling(window=10).mean()
-    data.loc[data['OBV'] > data['OBV_SMA_10'], 'Signal_Score'] += 1
-    if data['SMA_10'].iloc[-1] > data['SMA_50'].iloc[-1]: data['Signal_Score'] += 1
-    if is_outperforming: data['Signal_Score'] += 1
-    bbm_col = next((col for col in data.columns if col.startswith('BBM_')), None)
-    if bbm_col and not data[bbm_col].empty:
-        data.loc[data['Close'] > data[bbm_col], 'Signal_Score'] += 1
+    with span("scoring", ticker):
+        data['Signal_Score'] = 0
+        data.loc[data['SMA_10'] > data['SMA_50'], 'Signal_Score'] += 1
+        data.loc[data['MACDh_12_26_9'] > 0, 'Signal_Score'] += 1
+        data.loc[data['RSI_14'] < 60, 'Signal_Score'] += 1
+        data['OBV_SMA_10'] = sma(data['OBV'].to_numpy(), 10)
+        data.loc[data['OBV'] > data['OBV_SMA_10'], 'Signal_Score'] += 1
+        if data['SMA_10'].iloc[-1] > data['SMA_50'].iloc[-1]: data['Signal_Score'] += 1
+        if is_outperforming: data['Signal_Score'] += 1
+        bbm_col = next((col for col in data.columns if col.startswith('BBM_')), None)
+        if bbm_col and not data[bbm_col].empty:
+            data.loc[data['Close'] > data[bbm_col], 'Signal_Score'] += 1
     
-    def get_recommendation(score):
-        if score >= 5: return "Strong Buy"
-        elif score >= 3: return "Buy"
-        else: return "Neutral/Sell"
-    data['Recommendation'] = data['Signal_Score'].apply(get_recommendation)
+        def get_recommendation(score):
+            if score >= 5: return "Strong Buy"
+            elif score >= 3: return "Buy"
+            else: return "Neutral/Sell"
+        data['Recommendation'] = data['Signal_Score'].apply(get_recommendation)
+
+        atr_multiplier_sl, atr_multiplier_tp = 2.0, 4.0
+        data['Stop_Loss'] = data['Close'] - (data['ATRr_14'] * atr_multiplier_sl)
+        data['Take_Profit'] = data['Close'] + (data['ATRr_14'] * atr_multiplier_tp)
 
-    atr_multiplier_sl, atr_multiplier_tp = 2.0, 4.0
-    data['Stop_Loss'] = data['Close'] - (data['ATRr_14'] * atr_multiplier_sl)
-    data['Take_Profit'] = data['Close'] + (data['ATRr_14'] * atr_multiplier_tp)
-    
     return data
 
+def ml_features(data: pd.DataFrame, model_features, indicators=False) -> pd.DataFrame:
+    """
+    The model's feature row for the latest bar, as a one-row float DataFrame (empty when the
+    indicators are not warmed up yet). Features the data lacks are 0. Pass `indicators=True`
+    when `data` already has the core indicator columns.
+    """
+    if not indicators:
+        data = with_core_indicators(data)
+    data = data.dropna(subset=['SMA_50', 'MACDs_12_26_9', 'RSI_14', 'ATRr_14', 'BBM_20_2.0'])
+    if data.empty:
+        return pd.DataFrame(columns=model_features)
+    last_row = data.iloc[[-1]]
+    columns = match_feature_columns(last_row, model_features)
+    return pd.DataFrame({name: last_row[columns[name]].to_numpy() if name in columns else [0] for name in model_features}, index=last_row.index).astype(float)
+
 def analyze_stock_ml(data: pd.DataFrame, model):
-    """Calculates features and uses a trained ML model for predictions."""
+    """Calculates features and uses a trained ML model for predictions. Returns a new DataFrame."""
     if data.empty or model is None:
         return data
-    data.ta.strategy("All", sma_fast=10, sma_slow=50, macd_fast=12, macd_slow=26, macd_signal=9, rsi_length=14, obv=True)
-    data = data.dropna()
+    with span("indicator"):
+        data = with_core_indicators(data)
+    data = data.dropna(subset=['SMA_50', 'MACDs_12_26_9', 'RSI_14', 'ATRr_14', 'BBM_20_2.0'])
     if data.empty:
         return data
-    last_row = data.iloc[[-1]]
-    features = last_row.select_dtypes(include=['number'])
-    model_features = model.get_booster().feature_names
-    features = features.reindex(columns=model_features, fill_value=0)
-    prediction = model.predict(features)[0]
-    prediction_proba = model.predict_proba(features)[0][1]
+    features = ml_features(data, model.get_booster().feature_names, indicators=True)
+    with span("scoring"):
+        prediction = model.predict(features)[0]
+        prediction_proba = model.predict_proba(features)[0][1]
     data['ML_Prediction'] = prediction
     data['ML_Confidence'] = prediction_proba
     return data
+
+def explain_ml_batch(features: pd.DataFrame, model, approximate=False):
+    """
+    Scores a feature matrix (one row per ticker, e.g. `ml_features` rows of a whole index)
+    and attributes each prediction to the features with XGBoost's native TreeSHAP, both from
+    one DMatrix. Returns (predictions, contributions): predictions has ML_Prediction and
+    ML_Confidence; contributions has one column per feature plus 'Bias', in log-odds, and
+    each row sums to the prediction's margin. `approximate` uses the much cheaper Saabas
+    attribution instead of exact SHAP values.
+    """
+    import xgboost as xgb
+    if features.empty:
+        return pd.DataFrame(columns=['ML_Prediction', 'ML_Confidence']), pd.DataFrame()
+    booster = model.get_booster()
+    with span("scoring"):
+        matrix = xgb.DMatrix(features[booster.feature_names], feature_names=booster.feature_names)
+        confidence = booster.predict(matrix)
+        contributions = booster.predict(matrix, pred_contribs=True, approx_contribs=approximate)
+    predictions = pd.DataFrame({'ML_Prediction': (confidence > 0.5).astype(int), 'ML_Confidence': confidence}, index=features.index)
+    return predictions, pd.DataFrame(contributions, index=features.index, columns=booster.feature_names + ['Bias'])
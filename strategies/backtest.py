@@ -1,9 +1,11 @@
 from backtesting import Backtest, Strategy
 import pandas as pd
-import pandas_ta as ta
 from data.fetchers.yfinance_fetcher import fetch_daily_bars
 from bokeh.embed import components
 from strategies.advanced_analyzer import analyze_stock
+from indicators.bollinger import bollinger_bands
+from indicators.rsi import wilder_rsi
+from diagnostics.tracing import span
 
 # --- Strategy 1: Trend-Following ---
 class TrendFollowingStrategy(Strategy):
@@ -19,15 +21,15 @@ class TrendFollowingStrategy(Strategy):
 
 # --- Strategy 2: Mean-Reversion ---
 class MeanReversionStrategy(Strategy):
+    ticker = None
     def init(self):
-        close_series = pd.Series(self.data.Close)
-        self.bbands = self.I(ta.bbands, close_series, length=20, append=False)
-        self.rsi = self.I(ta.rsi, close_series, length=14)
+        self.lower_band = self.I(lambda close: bollinger_bands(close, 20, 2.0)[0], self.data.Close, name="BBL_20_2.0")
+        self.middle_band = self.I(lambda close: bollinger_bands(close, 20, 2.0)[1], self.data.Close, name="BBM_20_2.0")
+        self.rsi = self.I(wilder_rsi, self.data.Close, 14, name="RSI_14")
 
     def next(self):
-        # --- FIX: Use dictionary-style access for column names with dots ---
-        lower_band = self.bbands['BBL_20_2.0']
-        middle_band = self.bbands['BBM_20_2.0']
+        lower_band = self.lower_band[-1]
+        middle_band = self.middle_band[-1]
         
         if self.data.Close <= lower_band and self.rsi < 35:
             if not self.position: 
@@ -40,8 +42,10 @@ def run_backtest(ticker, start_date, end_date, strategy_name):
     Runs a backtest for a given ticker, date range, and strategy.
     """
     days = (end_date - start_date).days if end_date > start_date else 365
-    data = fetch_daily_bars(ticker, period=f"{days}d")
-    data = data[(data.index.date >= start_date) & (data.index.date <= end_date)]
+    with span("fetch", ticker):
+        data = fetch_daily_bars(ticker, period=f"{days}d")
+    if not data.empty:
+        data = data[(data.index.date >= start_date) & (data.index.date <= end_date)]
     
     if data.empty or len(data) < 50:
         return None, None, None
@@ -51,12 +55,17 @@ def run_backtest(ticker, start_date, end_date, strategy_name):
     else: 
         strategy_to_run = TrendFollowingStrategy
 
-    bt = Backtest(data, strategy_to_run, cash=100000, commission=.002)
-    stats = bt.run(ticker=ticker)
-    plot = bt.plot()
+    with span("backtest", ticker, strategy=strategy_name):
+        # A position still open at the end is closed on the last bar, so the trade list accounts
+        # for the whole equity curve (the Monte Carlo analysis resamples those trades)
+        bt = Backtest(data, strategy_to_run, cash=100000, commission=.002, finalize_trades=True)
+        stats = bt.run(ticker=ticker)
+    with span("render", ticker):
+        plot = bt.plot()
+        if plot:
+            script, div = components(plot)
     
     if plot:
-        script, div = components(plot)
         return stats, script, div
     else:
         return stats, None, None
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+from data.bar_cache import shared_bars
+from indicators.macd import macd
+from indicators.rsi import wilder_rsi
+from indicators.atr import atr
+from indicators.volume import obv
+from indicators.bollinger import bollinger_bands
+from diagnostics.tracing import span
+
+# Latest-bar evaluation for scans that only read the newest row. Each indicator is computed
+# over the shortest tail of the history that determines its last value: exactly for windowed
+# indicators (SMA, Bollinger Bands, OBV against its own SMA), and for the recursive ones
+# (EMA/MACD, Wilder RSI and ATR) over enough bars for the seed's influence to decay below
+# ~1e-8. Cost and memory therefore stay flat however long the fetched history is.
+
+
+def ema_warmup(length):
+    """Bars after which an EMA's seed weighs less than e^-20: (1 - 2/(n+1))^(10(n+1))."""
+    return 10 * (length + 1)
+
+
+def rma_warmup(length):
+    """The same bound for Wilder's smoothing: (1 - 1/n)^(20n)."""
+    return 20 * length
+
+
+MACD_BARS = ema_warmup(26) + ema_warmup(9)
+RSI_BARS = rma_warmup(14) + 1
+ATR_BARS = rma_warmup(14) + 1
+MEAN_REVERSION_LOOKBACK = 60
+
+
+def _column(data, name, bars=None):
+    values = data[name].to_numpy(dtype=np.float64)
+    return values if bars is None else values[-bars:]
+
+
+def market_index_for(ticker):
+    """Benchmark `analyze_stock` measures relative strength against."""
+    return '^OMX' if ticker.endswith('.ST') else 'SPY'
+
+
+def recommend(score):
+    if score >= 5: return "Strong Buy"
+    elif score >= 3: return "Buy"
+    else: return "Neutral/Sell"
+
+
+def analyze_stock_latest(data: pd.DataFrame, ticker: str, index_data: pd.DataFrame = None):
+    """
+    `analyze_stock` evaluated on the latest bar only. Returns a dict with the fields the
+    scans read (Close, indicator values, Signal_Score, Recommendation, Stop_Loss,
+    Take_Profit), or None when there is not enough history. Pass `index_data` to reuse
+    one market-index download for a whole scan.
+    """
+    if data.empty or len(data) < 50:
+        return None
+
+    with span("indicator", ticker):
+        close = _column(data, 'Close')
+        last_close = close[-1]
+        sma_10, sma_50 = close[-10:].mean(), close[-50:].mean()
+        macd_hist = macd(close[-MACD_BARS:])[1][-1]
+        rsi = wilder_rsi(close[-RSI_BARS:], 14)[-1]
+        atr_value = atr(_column(data, 'High', ATR_BARS), _column(data, 'Low', ATR_BARS), close[-ATR_BARS:], 14)[-1]
+        # Comparing OBV with its own 10-bar mean does not depend on where the running sum started
+        recent_obv = obv(close[-11:], _column(data, 'Volume', 11))[1:]
+        bbm = close[-20:].mean()
+
+    relative_strength = np.nan
+    try:
+        if index_data is None:
+            market_index = market_index_for(ticker)
+            with span("fetch", ticker, symbol=market_index):
+                index_data = shared_bars(market_index, period="3mo")
+        if not index_data.empty and len(index_data) > 20:
+            index_close = index_data['Close'].to_numpy(dtype=np.float64)
+            relative_strength = (last_close / close[-21] - 1) - (index_close[-1] / index_close[-21] - 1)
+    except Exception:
+        relative_strength = np.nan
+
+    with span("scoring", ticker):
+        # SMA_10 > SMA_50 counts twice in `analyze_stock`: once per bar and once for the latest bar
+        conditions = [sma_10 > sma_50, sma_10 > sma_50, macd_hist > 0, rsi < 60, recent_obv[-1] > recent_obv.mean(),
+                      relative_strength > 0, last_close > bbm]
+        score = sum(int(c) for c in conditions)
+        return {
+            'Ticker': ticker, 'Date': data.index[-1], 'Close': last_close,
+            'SMA_10': sma_10, 'SMA_50': sma_50, 'MACDh_12_26_9': macd_hist, 'RSI_14': rsi,
+            'ATRr_14': atr_value, 'BBM_20_2.0': bbm, 'Relative_Strength': relative_strength,
+            'Signal_Score': score, 'Recommendation': recommend(score),
+            'Stop_Loss': last_close - 2.0 * atr_value, 'Take_Profit': last_close + 4.0 * atr_value,
+        }
+
+
+def analyze_stock_mean_reversion_latest(data: pd.DataFrame, ticker: str = None, lookback: int = MEAN_REVERSION_LOOKBACK):
+    """
+    `analyze_stock_mean_reversion` evaluated on the latest bar only. The recommendation is
+    the most recent Buy/Sell condition, searched over `lookback` bars and doubled back
+    through the history only when none fired in that window.
+    """
+    if data.empty or len(data) < 20:
+        return None
+
+    close = _column(data, 'Close')
+    while True:
+        lookback = min(lookback, len(close))
+        with span("indicator", ticker):
+            tail = close[-(lookback + RSI_BARS):]
+            lower, mid = bollinger_bands(tail, 20, 2.0)[:2]
+            rsi = wilder_rsi(tail, 14)
+        with span("scoring", ticker):
+            window = slice(-lookback, None)
+            buy = (tail[window] <= lower[window]) & (rsi[window] < 35)
+            sell = (tail[window] >= mid[window]) & (rsi[window] > 45)
+            fired = np.flatnonzero(buy | sell)
+        if len(fired) or lookback == len(close):
+            break
+        lookback *= 2
+
+    recommendation = None
+    if len(fired):
+        recommendation = 'Buy' if buy[fired[-1]] else 'Sell'
+    return {
+        'Ticker': ticker, 'Date': data.index[-1], 'Close': close[-1],
+        'BBL_20_2.0': lower[-1], 'BBM_20_2.0': mid[-1], 'RSI_14': rsi[-1], 'Recommendation': recommendation,
+    }
@@ -1,29 +1,28 @@
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
+from indicators.bollinger import bollinger_bands
+from indicators.rsi import wilder_rsi
+from diagnostics.tracing import span
 
 def analyze_stock_mean_reversion(data: pd.DataFrame) -> pd.DataFrame:
-    """Performs a mean-reversion analysis using Bollinger Bands and RSI."""
+    """Performs a mean-reversion analysis using Bollinger Bands and RSI. Returns a new DataFrame."""
     if data.empty or len(data) < 20:
         return pd.DataFrame()
 
-    data.ta.bbands(length=20, append=True)
-    data.ta.rsi(length=14, append=True)
+    with span("indicator"):
+        close = data['Close'].to_numpy(dtype=float)
+        bands = bollinger_bands(close, 20, 2.0)
+        data = data.assign(**{f'{name}_20_2.0': values for name, values in zip(('BBL', 'BBM', 'BBU', 'BBB', 'BBP'), bands)},
+                           RSI_14=wilder_rsi(close, 14))
 
-    bbl_col = next((col for col in data.columns if col.startswith('BBL_')), 'BBL_20_2.0')
-    bbm_col = next((col for col in data.columns if col.startswith('BBM_')), 'BBM_20_2.0')
+    bbl_col, bbm_col = 'BBL_20_2.0', 'BBM_20_2.0'
 
-    conditions = [
-        (data['Close'] <= data[bbl_col]) & (data['RSI_14'] < 35),
-        (data['Close'] >= data[bbm_col]) & (data['RSI_14'] > 45)
-    ]
-    choices = ['Buy', 'Sell']
-    data['Recommendation'] = pd.Series(pd.NA)
-    
-    for i in range(len(data)):
-        if conditions[0].iloc[i]:
-            data.loc[data.index[i], 'Recommendation'] = 'Buy'
-        elif conditions[1].iloc[i]:
-            data.loc[data.index[i], 'Recommendation'] = 'Sell'
-            
-    data['Recommendation'].fillna(method='ffill', inplace=True)
+    with span("scoring"):
+        conditions = [
+            (data['Close'] <= data[bbl_col]) & (data['RSI_14'] < 35),
+            (data['Close'] >= data[bbm_col]) & (data['RSI_14'] > 45)
+        ]
+        choices = ['Buy', 'Sell']
+        # The first matching condition wins; bars matching neither keep the previous signal
+        data['Recommendation'] = pd.Series(np.select(conditions, choices, default=None), index=data.index).ffill()
     return data
@@ -8,20 +8,24 @@ def generate_signals(data: pd.DataFrame) -> pd.DataFrame:
         data: DataFrame with stock prices, must contain a 'Close' column.
         
     Returns:
-        The input DataFrame with added columns for moving averages and signals.
+        A new DataFrame: the input columns plus moving averages and signals.
+        The input itself is not modified.
     """
     if data.empty:
         return data
 
     # --- 1. Define the moving average windows ---
     # A short-term window (e.g., 10 periods) and a long-term window (e.g., 50 periods).
-    # A "period" here is 5 minutes, based on our data interval.
-    short_window = 10  # 10 * 5 minutes = 50 minutes
-    long_window = 50   # 50 * 5 minutes = 4.16 hours
+    # A "period" is one bar of the input data; the notifier passes 5-minute bars
+    # from `data.bar_store.get_bars`, so 10 periods = 50 minutes and 50 periods = ~4.2 hours.
+    short_window = 10
+    long_window = 50
     
     # --- 2. Calculate the Simple Moving Averages (SMA) ---
-    data['SMA_Short'] = data['Close'].rolling(window=short_window, min_periods=1).mean()
-    data['SMA_Long'] = data['Close'].rolling(window=long_window, min_periods=1).mean()
+    data = data.assign(
+        SMA_Short=data['Close'].rolling(window=short_window, min_periods=1).mean(),
+        SMA_Long=data['Close'].rolling(window=long_window, min_periods=1).mean(),
+    )
     
     # --- 3. Generate the trading signals ---
     # Create a 'Signal' column, initially with no signal (0).
@@ -37,4 +41,11 @@ def generate_signals(data: pd.DataFrame) -> pd.DataFrame:
     # We only want to plot a marker on the chart at the moment the crossover happens.
     data['Position'] = data['Signal'].diff()
 
-    return data
\ No newline at end of file
+    return data
+
+def latest_signals(data: pd.DataFrame, bars: int = 1, long_window: int = 50) -> pd.DataFrame:
+    """
+    `generate_signals` for only the last `bars` rows. The rolling means need `long_window`
+    bars of history, so only that much of the tail is processed, however long `data` is.
+    """
+    return generate_signals(data.iloc[-(long_window + bars):]).iloc[-bars:]
\ No newline at end of file
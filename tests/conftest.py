@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the packages from the repository root, as `main.py` and the dashboard do
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
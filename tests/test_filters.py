@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import synthetic_universe, MARKET_INDEX
+from indicators.moving_averages import sma
+from indicators.volume import obv
+from screening.filters import (CompiledScreen, compile_screen, _from_legacy, build_panel, run_screen, apply_screen,
+                               TREND_FOLLOWING_SCREEN)
+from strategies.latest_bar import analyze_stock_latest
+
+
+@pytest.fixture(scope="module")
+def universe():
+    universe = synthetic_universe(12, n_bars=300, seed=3)
+    universe.pop(MARKET_INDEX)
+    return universe
+
+
+def bars_from_close(close):
+    close = np.asarray(close, dtype=np.float64)
+    index = pd.date_range("2024-01-01", periods=len(close), freq="B")
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close, 'Volume': 1000.0}, index=index)
+
+
+def test_parse_operands():
+    parse = CompiledScreen._parse
+    assert parse(60) == 60.0
+    assert parse("2.5") == 2.5
+    assert parse("Close") == "Close"
+    assert parse("RSI_14") == ("RSI", (14.0,), "Close")
+    assert parse("OBV") == ("OBV", (), "Close")
+    assert parse("BBL_20_2.0") == ("BBL", (20.0, 2.0), "Close")
+    assert parse("MACDh_12_26_9") == ("MACDh", (12.0, 26.0, 9.0), "Close")
+    assert parse("SMA_10(OBV)") == ("SMA", (10.0,), ("OBV", (), "Close"))
+    assert parse("EMA_5(SMA_10(Volume))") == ("EMA", (5.0,), ("SMA", (10.0,), "Volume"))
+
+
+@pytest.mark.parametrize("operand", ["FOO_10", "close", "SMA_10(BAR)", "SMA_x", ""])
+def test_unknown_operand(operand):
+    with pytest.raises(ValueError, match="Unknown operand"):
+        CompiledScreen({'rules': [{'left': operand, 'op': '>', 'right': 0}]})
+
+
+def test_unknown_operator():
+    with pytest.raises(ValueError, match="Unknown operator '=='"):
+        CompiledScreen({'rules': [{'name': 'eq', 'left': 'Close', 'op': '==', 'right': 0}]})
+
+
+def test_nested_operand_values():
+    data = bars_from_close(100 + np.sin(np.arange(60) / 3) * 5)
+    passed, details = apply_screen(data, {'rules': [{'name': 'volume', 'left': 'OBV', 'op': '>', 'right': 'SMA_10(OBV)'}]})
+    values = obv(data['Close'], data['Volume'])
+    assert details['volume']['value'] == pytest.approx(values[-1])
+    assert passed == (values[-1] > sma(values, 10)[-1])
+
+
+def test_crosses_on_known_series():
+    # SMA_3 moves above the flat price once it turns up at bar 20, and back below after bar 40
+    close = np.r_[np.full(20, 100.0), np.full(20, 110.0), np.full(20, 90.0)]
+    panel = build_panel({'X': bars_from_close(close)})
+    screen = CompiledScreen({'rules': [
+        {'name': 'up', 'left': 'Close', 'op': 'crosses_above', 'right': 'SMA_3', 'group': 'score'},
+        {'name': 'down', 'left': 'Close', 'op': 'crosses_below', 'right': 'SMA_3', 'group': 'score'},
+        {'name': 'level', 'left': 'Close', 'op': 'crosses_above', 'right': 105, 'group': 'score'},
+    ]})
+    result = screen.evaluate(panel, last_only=False)
+    dates = panel['Close'].index
+    assert list(result.index[result['up']].get_level_values(0)) == [dates[20]]
+    assert list(result.index[result['down']].get_level_values(0)) == [dates[40]]
+    assert list(result.index[result['level']].get_level_values(0)) == [dates[20]]
+
+
+def panel_of(closes):
+    return build_panel({ticker: bars_from_close(np.full(30, close)) for ticker, close in closes.items()})
+
+
+def test_all_and_any_groups():
+    panel = panel_of({'A': 50, 'B': 150, 'C': 250})
+    screen = CompiledScreen({'rules': [
+        {'name': 'above_100', 'left': 'Close', 'op': '>', 'right': 100},
+        {'name': 'below_200', 'left': 'Close', 'op': '<', 'right': 200, 'group': 'any'},
+        {'name': 'above_240', 'left': 'Close', 'op': '>', 'right': 240, 'group': 'any'},
+    ]})
+    assert screen.evaluate(panel)['Passed'].to_dict() == {'A': False, 'B': True, 'C': True}
+
+    any_screen = CompiledScreen({'require': 'any', 'rules': [
+        {'name': 'below_100', 'left': 'Close', 'op': '<', 'right': 100},
+        {'name': 'above_200', 'left': 'Close', 'op': '>', 'right': 200},
+    ]})
+    assert any_screen.evaluate(panel)['Passed'].to_dict() == {'A': True, 'B': False, 'C': True}
+
+
+def test_min_score_with_weights():
+    panel = panel_of({'A': 50, 'B': 150, 'C': 250})
+    screen = CompiledScreen({'min_score': 3, 'rules': [
+        {'name': 'above_100', 'left': 'Close', 'op': '>', 'right': 100, 'weight': 2, 'group': 'score'},
+        {'name': 'above_200', 'left': 'Close', 'op': '>', 'right': 200, 'group': 'score'},
+        {'name': 'below_300', 'left': 'Close', 'op': '<', 'right': 300, 'weight': 0.5, 'group': 'score'},
+    ]})
+    result = screen.evaluate(panel)
+    assert result['Score'].to_dict() == {'A': 0.5, 'B': 2.5, 'C': 3.5}
+    assert result['Passed'].to_dict() == {'A': False, 'B': False, 'C': True}
+
+
+def test_legacy_rules():
+    screen = _from_legacy({
+        'AND': [{'filter': 'rsi_filter', 'period': 14, 'threshold': 40, 'direction': 'above'}],
+        'OR': [{'filter': 'bollinger_filter', 'period': 20, 'std_dev': 2, 'direction': 'below'},
+               {'filter': 'bollinger_filter', 'period': 10, 'std_dev': 1.5}],
+    })
+    assert screen['rules'] == [
+        {'name': 'rsi_14', 'left': 'RSI_14', 'op': '>', 'right': 40, 'group': 'all'},
+        {'name': 'bollinger_20', 'left': 'Close', 'op': '<', 'right': 'BBL_20_2.0', 'group': 'any'},
+        {'name': 'bollinger_10', 'left': 'Close', 'op': '>', 'right': 'BBU_10_1.5', 'group': 'any'},
+    ]
+    with pytest.raises(ValueError, match="Unknown filter 'macd_filter'"):
+        _from_legacy({'AND': [{'filter': 'macd_filter'}]})
+
+
+def test_compile_legacy_config_screen(universe):
+    compiled = compile_screen({'rules': {'AND': [{'filter': 'rsi_filter', 'threshold': 40, 'direction': 'below'}]}})
+    assert [r['label'] for r in compiled.rules] == ["RSI_14 < 40"]
+    result = run_screen(universe, compiled)
+    assert (result['Passed'] == (result['rsi_14_value'] < 40)).all()
+
+
+def test_trend_following_screen_matches_signal_score(universe):
+    compiled = compile_screen(TREND_FOLLOWING_SCREEN)
+    for cut in (120, 200, 300):
+        bars = {ticker: data.iloc[:cut] for ticker, data in universe.items()}
+        result = run_screen(bars, compiled)
+        # An empty market index leaves relative strength out of analyze_stock_latest's score
+        expected = {ticker: analyze_stock_latest(data, ticker, pd.DataFrame())['Signal_Score'] for ticker, data in bars.items()}
+        assert result['Score'].astype(int).to_dict() == expected
+        assert (result['Passed'] == (result['Score'] >= 3)).all()
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+import pytest
+from indicators.moving_averages import sma, ema, wma, rma
+from indicators.rsi import wilder_rsi
+from indicators.atr import atr
+from indicators.volume import obv, vwap
+from indicators.stochastic import stochastic
+from indicators.bollinger import bollinger_bands
+from indicators.macd import macd
+
+# The NumPy kernels against pandas formulations of pandas_ta's indicators, with its defaults.
+
+RTOL = 1e-10
+
+
+@pytest.fixture
+def bars():
+    rng = np.random.default_rng(7)
+    n = 300
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, n)))
+    spread = close * rng.uniform(0.002, 0.02, n)
+    index = pd.date_range("2024-01-02 09:00", periods=n, freq="h")
+    return pd.DataFrame({
+        'High': close + spread * rng.uniform(0, 1, n), 'Low': close - spread * rng.uniform(0, 1, n),
+        'Close': close, 'Volume': rng.integers(1_000, 100_000, n).astype(float),
+    }, index=index)
+
+
+def reference_ema(close, length):
+    """pandas_ta `ema`: seeded with the SMA of the first `length` values, then ewm(adjust=False)."""
+    close = close.dropna()
+    seeded = close.copy()
+    seeded.iloc[:length - 1] = np.nan
+    seeded.iloc[length - 1] = close.iloc[:length].mean()
+    return seeded.ewm(span=length, adjust=False).mean()
+
+
+def reference_rma(x, length):
+    return x.ewm(alpha=1 / length, min_periods=length).mean()
+
+
+@pytest.mark.parametrize("length", [1, 10, 50])
+def test_sma(bars, length):
+    np.testing.assert_allclose(sma(bars['Close'], length), bars['Close'].rolling(length).mean(), rtol=RTOL)
+
+
+@pytest.mark.parametrize("length", [10, 20])
+def test_wma(bars, length):
+    weights = np.arange(1, length + 1)
+    expected = bars['Close'].rolling(length).apply(lambda window: window @ weights / weights.sum(), raw=True)
+    np.testing.assert_allclose(wma(bars['Close'], length), expected, rtol=RTOL)
+
+
+@pytest.mark.parametrize("length", [10, 12, 26])
+def test_ema(bars, length):
+    close = bars['Close']
+    np.testing.assert_allclose(ema(close, length), reference_ema(close, length), rtol=RTOL)
+    np.testing.assert_allclose(ema(close, length, sma_seed=False), close.ewm(span=length, adjust=False).mean(), rtol=RTOL)
+
+
+def test_ema_with_leading_nans(bars):
+    close = bars['Close'].copy()
+    close.iloc[:15] = np.nan
+    expected = reference_ema(close, 10).reindex(close.index)
+    np.testing.assert_allclose(ema(close, 10), expected, rtol=RTOL)
+
+
+def test_rma(bars):
+    np.testing.assert_allclose(rma(bars['Close'], 14), reference_rma(bars['Close'], 14), rtol=RTOL)
+
+
+def test_wilder_rsi(bars):
+    delta = bars['Close'].diff()
+    gains, losses = delta.clip(lower=0), (-delta).clip(lower=0)
+    average_gain, average_loss = reference_rma(gains, 14), reference_rma(losses, 14)
+    expected = 100 * average_gain / (average_gain + average_loss)
+    np.testing.assert_allclose(wilder_rsi(bars['Close'], 14), expected, rtol=RTOL)
+
+
+def test_atr(bars):
+    high, low, previous = bars['High'], bars['Low'], bars['Close'].shift(1)
+    true_range = pd.concat([high - low, (high - previous).abs(), (low - previous).abs()], axis=1).max(axis=1, skipna=False)
+    expected = reference_rma(true_range, 14)
+    np.testing.assert_allclose(atr(bars['High'], bars['Low'], bars['Close'], 14), expected, rtol=RTOL)
+
+
+def test_obv(bars):
+    signed = np.sign(bars['Close'].diff()) * bars['Volume']
+    signed.iloc[0] = bars['Volume'].iloc[0]
+    np.testing.assert_allclose(obv(bars['Close'], bars['Volume']), signed.cumsum(), rtol=RTOL)
+
+
+def test_vwap(bars):
+    typical = (bars['High'] + bars['Low'] + bars['Close']) / 3
+    day = bars.index.date
+    expected = (typical * bars['Volume']).groupby(day).cumsum() / bars['Volume'].groupby(day).cumsum()
+    sessions = pd.DatetimeIndex(bars.index).to_period("D").asi8
+    np.testing.assert_allclose(vwap(bars['High'], bars['Low'], bars['Close'], bars['Volume'], sessions), expected, rtol=RTOL)
+
+    running = (typical * bars['Volume']).cumsum() / bars['Volume'].cumsum()
+    np.testing.assert_allclose(vwap(bars['High'], bars['Low'], bars['Close'], bars['Volume']), running, rtol=RTOL)
+
+
+def test_stochastic(bars):
+    lowest, highest = bars['Low'].rolling(14).min(), bars['High'].rolling(14).max()
+    raw_k = 100 * (bars['Close'] - lowest) / (highest - lowest)
+    expected_k = raw_k.rolling(3).mean()
+    expected_d = expected_k.rolling(3).mean()
+    stoch_k, stoch_d = stochastic(bars['High'], bars['Low'], bars['Close'], 14, 3, 3)
+    np.testing.assert_allclose(stoch_k, expected_k, rtol=RTOL)
+    np.testing.assert_allclose(stoch_d, expected_d, rtol=RTOL)
+
+
+def test_bollinger_bands(bars):
+    close = bars['Close']
+    mid, std = close.rolling(20).mean(), close.rolling(20).std(ddof=0)
+    lower, upper = mid - 2 * std, mid + 2 * std
+    expected = (lower, mid, upper, 100 * (upper - lower) / mid, (close - lower) / (upper - lower))
+    for computed, reference in zip(bollinger_bands(close, 20, 2.0), expected):
+        # pandas' rolling std is an online update, so %B near zero differs in absolute terms only
+        np.testing.assert_allclose(computed, reference, rtol=RTOL, atol=1e-9)
+
+
+def test_macd(bars):
+    close = bars['Close']
+    line = reference_ema(close, 12) - reference_ema(close, 26)
+    signal = reference_ema(line, 9).reindex(close.index)
+    for computed, reference in zip(macd(close, 12, 26, 9), (line, line - signal, signal)):
+        np.testing.assert_allclose(computed, reference, rtol=RTOL)
+
+
+def test_panel_matches_per_column(bars):
+    # 2-D input (one column per ticker, one starting later) gives each column's 1-D result
+    closes = np.column_stack([bars['Close'], bars['Close'] * 1.5])
+    closes[:30, 1] = np.nan
+    for kernel in (lambda x: sma(x, 10), lambda x: ema(x, 10), lambda x: rma(x, 14), lambda x: wilder_rsi(x, 14),
+                   lambda x: macd(x)[1], lambda x: bollinger_bands(x)[4]):
+        panel = kernel(closes)
+        for column in range(closes.shape[1]):
+            np.testing.assert_allclose(panel[:, column], kernel(closes[:, column]), rtol=RTOL)
@@ -0,0 +1,146 @@
+import time
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from data.fetchers.master_fetcher import FetchRouter, DEFAULT_LATENCY_BUDGET
+
+
+def bars(n=5):
+    index = pd.date_range("2024-01-01", periods=n, freq="D")
+    close = np.linspace(100, 104, n)
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close, 'Volume': 1000.0}, index=index)
+
+
+class StubProvider:
+    """Answers after `delay` seconds with bars, or raises `error`; records when it was called."""
+    def __init__(self, delay=0.0, error=None, data=None):
+        self.delay, self.error = delay, error
+        self.data = bars() if data is None else data
+        self.calls = []
+        self.finished = threading.Event()
+
+    def __call__(self, ticker, **kwargs):
+        self.calls.append(time.perf_counter())
+        try:
+            time.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            return self.data.copy()
+        finally:
+            self.finished.set()
+
+
+@pytest.fixture
+def routers():
+    created = []
+
+    def make(providers, max_workers=4):
+        router = FetchRouter(providers, max_workers=max_workers)
+        created.append(router)
+        return router
+    yield make
+    for router in created:
+        router._pool.shutdown(wait=True)
+
+
+def test_hedge_fires_after_latency_budget(routers):
+    slow, fast = StubProvider(delay=0.6), StubProvider(delay=0.0)
+    router = routers([("slow", slow), ("fast", fast)])
+    started = time.perf_counter()
+    data = router.fetch("ABC", hedged=True, latency_budget=0.2)
+    assert data['Source'].iloc[0] == "fast"
+    assert len(fast.calls) == 1
+    # Fired once the budget ran out, not before it and not after the primary answered
+    assert 0.2 <= fast.calls[0] - started < 0.5
+
+
+def test_hedge_not_fired_when_primary_answers_within_budget(routers):
+    primary, secondary = StubProvider(delay=0.0), StubProvider(delay=0.0)
+    router = routers([("primary", primary), ("secondary", secondary)])
+    data = router.fetch("ABC", hedged=True, latency_budget=0.5)
+    assert data['Source'].iloc[0] == "primary"
+    assert secondary.calls == []
+
+
+def test_first_valid_result_wins(routers):
+    # The primary fails fast, the hedge is not due yet: the secondary is fired at once
+    failing, valid = StubProvider(error=ConnectionError("down")), StubProvider(delay=0.1)
+    router = routers([("failing", failing), ("valid", valid)])
+    data = router.fetch("ABC", hedged=True, latency_budget=1.0)
+    assert data['Source'].iloc[0] == "valid"
+    pd.testing.assert_frame_equal(data.drop(columns='Source'), valid.data)
+
+
+def test_empty_result_does_not_win(routers):
+    empty, valid = StubProvider(data=pd.DataFrame()), StubProvider(delay=0.05)
+    router = routers([("empty", empty), ("valid", valid)])
+    assert router.fetch("ABC", hedged=True, latency_budget=1.0)['Source'].iloc[0] == "valid"
+    assert router.fetch("ABC")['Source'].iloc[0] == "valid"
+
+
+def test_loser_is_ignored(routers):
+    slow = StubProvider(delay=0.5, data=bars(3))
+    fast = StubProvider(delay=0.0, data=bars(7))
+    router = routers([("slow", slow), ("fast", fast)])
+    data = router.fetch("ABC", hedged=True, latency_budget=0.1)
+    assert data['Source'].iloc[0] == "fast" and len(data) == 7
+    # The slow call runs to completion in its thread, but its result never replaces the winner
+    assert slow.finished.wait(2)
+    assert data['Source'].iloc[0] == "fast" and len(data) == 7
+
+
+def test_queued_loser_is_cancelled(routers):
+    # One worker: both hedges queue behind the slow primary. When it answers the worker may
+    # already be taking the first hedge, but the second one is cancelled before it starts
+    slow, first, second = StubProvider(delay=0.3), StubProvider(delay=0.2), StubProvider()
+    router = routers([("slow", slow), ("first", first), ("second", second)], max_workers=1)
+    data = router.fetch("ABC", hedged=True, latency_budget=0.1)
+    assert data['Source'].iloc[0] == "slow"
+    router._pool.shutdown(wait=True)
+    assert second.calls == []
+
+
+def test_all_providers_fail(routers):
+    router = routers([("a", StubProvider(error=ValueError("bad"))), ("b", StubProvider(error=TimeoutError("slow")))])
+    assert router.fetch("ABC", hedged=True, latency_budget=0.1).empty
+    assert router.fetch("ABC").empty
+
+
+def test_stats_record_errors_and_latency(routers):
+    failing = StubProvider(delay=0.05, error=ConnectionError("down"))
+    valid = StubProvider(delay=0.1)
+    router = routers([("failing", failing), ("valid", valid)])
+    router.fetch("ABC")
+    failed, served = router.stats["failing"], router.stats["valid"]
+    assert failed.error_rate == 1.0
+    assert failed.last_error == "ConnectionError: down"
+    assert served.error_rate == 0.0
+    assert served.latency(50) == pytest.approx(0.1, abs=0.05)
+    assert failed.latency(50) == pytest.approx(0.05, abs=0.05)
+
+    table = router.stats_table().set_index("Provider")
+    assert table.loc["failing", "Requests"] == 1 and table.loc["valid", "Completeness"] == 1.0
+
+
+def test_empty_response_counts_as_error(routers):
+    router = routers([("empty", StubProvider(data=pd.DataFrame()))])
+    assert router.fetch("ABC").empty
+    assert router.stats["empty"].error_rate == 1.0
+    assert router.stats["empty"].last_error == "empty response"
+
+
+def test_unhealthy_provider_is_ranked_last(routers):
+    router = routers([("flaky", StubProvider(error=ConnectionError("down"))), ("stable", StubProvider())])
+    router.fetch("ABC")
+    assert [name for name, _ in router.ranked_providers()] == ["stable", "flaky"]
+
+
+def test_unmeasured_provider_does_not_outrank_fast_primary(routers):
+    router = routers([("primary", StubProvider()), ("fallback", StubProvider())])
+    router.stats["primary"].record(DEFAULT_LATENCY_BUDGET / 2, ok=True, completeness=1.0)
+    assert [name for name, _ in router.ranked_providers()] == ["primary", "fallback"]
+    # A primary slower than the default budget yields to the untried fallback
+    router.stats["primary"].latencies.clear()
+    router.stats["primary"].record(DEFAULT_LATENCY_BUDGET * 2, ok=True, completeness=1.0)
+    assert [name for name, _ in router.ranked_providers()] == ["fallback", "primary"]
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from portfolio.risk import CovarianceTracker
+
+TICKERS = ['A', 'B', 'C']
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    panel = pd.DataFrame(rng.normal(0, 0.01, (300, len(TICKERS))), index=pd.bdate_range("2023-01-02", periods=300), columns=TICKERS)
+    panel.iloc[::7, 2] = np.nan
+    return panel
+
+
+def assert_matches_rebuild(tracker, window):
+    rebuilt = CovarianceTracker(TICKERS)
+    rebuilt.update(window)
+    np.testing.assert_array_equal(tracker.counts, rebuilt.counts)
+    np.testing.assert_allclose(tracker.covariance(), rebuilt.covariance(), rtol=1e-9, atol=1e-15)
+    np.testing.assert_allclose(tracker.correlation(), rebuilt.correlation(), rtol=1e-9)
+    np.testing.assert_allclose(tracker.mean(), rebuilt.mean(), rtol=1e-9, atol=1e-15)
+
+
+def test_new_rows_are_added(returns):
+    tracker = CovarianceTracker(TICKERS)
+    assert tracker.update(returns.iloc[:200]) == 200
+    assert tracker.update(returns.iloc[:250]) == 50
+    assert tracker.update(returns.iloc[:250]) == 0
+    assert_matches_rebuild(tracker, returns.iloc[:250])
+
+
+def test_provisional_last_row_is_replaced(returns):
+    tracker = CovarianceTracker(TICKERS)
+    forming = returns.iloc[:201].copy()
+    forming.iloc[-1] *= 0.5
+    tracker.update(forming)
+    assert tracker.update(returns.iloc[:201]) == 0
+    assert_matches_rebuild(tracker, returns.iloc[:201])
+
+
+def test_rows_before_the_window_are_removed(returns):
+    tracker = CovarianceTracker(TICKERS)
+    tracker.update(returns.iloc[:200])
+    for start in range(5, 100, 15):
+        tracker.update(returns.iloc[start:200 + start])
+    assert_matches_rebuild(tracker, returns.iloc[95:295])
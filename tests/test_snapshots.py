@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+from data.fetchers.replay import ReplayProvider, replaying
+from screening import snapshots
+
+
+@pytest.fixture
+def provider():
+    provider = ReplayProvider.from_synthetic(n_tickers=3, n_bars=300, intraday_days=0, seed=1)
+    # A flat price never reaches a Bollinger band with RSI in range, so no Mean-Reversion condition fires
+    template = provider.daily['SYN0000.ST']
+    provider.daily['FLAT.ST'] = template.assign(Open=50.0, High=50.0, Low=50.0, Close=50.0)
+    return provider
+
+
+def test_snapshot_with_no_signal_ticker(provider, tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", str(tmp_path))
+    tickers = [t for t in provider.daily if t.endswith(".ST")]
+    with replaying(provider):
+        snapshot = snapshots.compute_snapshot("Test Index", tickers)
+    snapshot = snapshots.read_snapshot(snapshots.save_snapshot(snapshot))
+
+    reversion = snapshot['mean_reversion'].set_index('Ticker')
+    assert set(reversion.index) == set(tickers)
+    assert pd.isna(reversion.loc['FLAT.ST', 'Recommendation'])
+
+    signals = snapshots.buy_signals(snapshot['mean_reversion'])
+    assert 'FLAT.ST' not in {row['Ticker'] for row in signals}
+    expected = reversion.index[reversion['Recommendation'].eq('Buy')]
+    assert sorted(row['Ticker'] for row in signals) == sorted(expected)
+
+    trend = snapshots.buy_signals(snapshot['trend'])
+    assert all(row['Recommendation'] in ('Buy', 'Strong Buy') and row['Signal Score'].endswith('/7') for row in trend)
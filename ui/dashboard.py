@@ -2,38 +2,72 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+import os
 import json
+import time
+import contextlib
 import streamlit.components.v1 as components
-import yfinance as yf
 import joblib
 
-from data.fetchers.yfinance_fetcher import fetch_daily_bars, get_fx_rate
-from strategies.advanced_analyzer import analyze_stock, analyze_stock_ml
+from data.fetchers.scheduler import INTERACTIVE
+from data.bar_store import get_bars, naive_dates
+from data.bar_cache import shared_bars, default_cache
+from data.fetchers.index_fetcher import NORDIC_INDICES
+from strategies.advanced_analyzer import analyze_stock, ml_features, explain_ml_batch, ML_PERIOD
 from strategies.mean_reversion_analyzer import analyze_stock_mean_reversion
+from strategies.latest_bar import analyze_stock_latest, analyze_stock_mean_reversion_latest, market_index_for
 from strategies.backtest import run_backtest
+from strategies.monte_carlo import monte_carlo, summarize
 from strategies.pairs_trading_analyzer import find_cointegrated_pairs, analyze_pair_spread
+from ml.registry import latest_model_path, latest_version
+from screening.filters import run_screen, compile_screen, TREND_FOLLOWING_SCREEN
+from portfolio.engine import value_portfolio, portfolio_equity_curve
+from portfolio.risk import CovarianceTracker, build_return_panel, portfolio_risk_report
+from diagnostics.tracing import trace, span
+from screening.snapshots import PrecomputeScheduler, latest_snapshot_path, read_snapshot, is_current, buy_signals
+from screening.events import load_events, last_event, hit_rates
 
 @st.cache_data
 def get_nordic_indices():
     """Returns a dictionary of major Nordic indices and their component tickers."""
-    indices = {
-        "OMXS30 (Sweden)": ['ERIC-B.ST', 'ADDT-B.ST', 'SCA-B.ST', 'AZN.ST', 'BOL.ST', 'SAAB-B.ST', 'NDA-SE.ST', 'SKA-B.ST','TEL2-B.ST', 'HM-B.ST', 'TELIA.ST', 'NIBE-B.ST', 'LIFCO-B.ST', 'SHB-A.ST', 'SEB-A.ST', 'ESSITY-B.ST','SWED-A.ST', 'EVO.ST', 'SKF-B.ST', 'INDU-C.ST', 'SAND.ST', 'VOLV-B.ST', 'HEXA-B.ST', 'ABB.ST','ASSA-B.ST', 'EPI-A.ST', 'INVE-B.ST', 'EQT.ST', 'ALFA.ST', 'ATCO-A.ST'],
-        "OMXC25 (Denmark)": ['MAERSK-B.CO', 'NOVO-B.CO', 'DSV.CO', 'VWS.CO', 'PNDORA.CO', 'GN.CO', 'ORSTED.CO', 'DANSKE.CO','NZYM-B.CO', 'GMAB.CO', 'TRYG.CO', 'CARL-B.CO', 'COLOB.CO', 'CHR.CO', 'JYSK.CO', 'RBREW.CO','ROCK-B.CO', 'ISS.CO', 'DEMANT.CO', 'AMBU-B.CO', 'BAVA.CO', 'NETC.CO', 'NDA-DK.CO', 'SYDB.CO', 'FLS.CO'],
-        "OMXH25 (Finland)": ['NOKIA.HE', 'SAMPO.HE', 'KNEBV.HE', 'FORTUM.HE', 'UPM.HE', 'NESTE.HE', 'STERV.HE', 'ELISA.HE','WRT1V.HE', 'OUT1V.HE', 'TIETO.HE', 'ORNBV.HE', 'HUH1V.HE', 'CGCBV.HE', 'KESKOB.HE', 'MOCORP.HE','VALMT.HE', 'YIT.HE', 'KCR.HE', 'TELIA1.HE', 'NDA-FI.HE', 'SSABBH.HE', 'METSO.HE', 'QTCOM.HE', 'KOJAMO.HE'],
-        "OBX (Norway)": ['EQNR.OL', 'DNB.OL', 'TEL.OL', 'MOWI.OL', 'AKERBP.OL', 'YAR.OL', 'NHY.OL', 'ORK.OL','SUBC.OL', 'SALM.OL', 'AKSO.OL', 'SCHA.OL', 'NEL.OL', 'FRO.OL', 'STB.OL', 'NOD.OL', 'GJF.OL', 'RECSI.OL', 'BWO.OL', 'NAS.OL', 'OTL.OL', 'SCATC.OL', 'TGS.OL']
-    }
-    return indices
+    return NORDIC_INDICES
 
 @st.cache_resource
+def _load_model_file(path, modified):
+    return joblib.load(path)
+
 def load_model():
-    """Loads the trained ML model."""
+    """Loads the newest trained ML model version; a new version is picked up on the next rerun."""
+    path = latest_model_path()
     try:
-        model = joblib.load("ml/xgb_model.joblib")
-        return model
+        return _load_model_file(path, os.path.getmtime(path))
     except FileNotFoundError:
         return None
 
-def plot_stock_chart(strategy_data, ticker_symbol):
+def current_model_version():
+    meta = latest_version()
+    return meta["version"] if meta else 0
+
+@st.cache_resource
+def start_precompute_scheduler():
+    """One background precompute thread per server process; set PRECOMPUTE_IN_APP=0 when it runs as its own job."""
+    if os.environ.get("PRECOMPUTE_IN_APP", "1") == "0":
+        return None
+    return PrecomputeScheduler().start()
+
+@st.cache_data
+def _read_snapshot_file(path):
+    return read_snapshot(path)
+
+def current_snapshot(index_name, model_version=None):
+    """The precomputed snapshot for an index when it is still current, else None (scan live)."""
+    path = latest_snapshot_path(index_name)
+    if path is None:
+        return None
+    snapshot = _read_snapshot_file(path)
+    return snapshot if is_current(snapshot, model_version) else None
+
+def plot_stock_chart(strategy_data, ticker_symbol, events=None):
     if strategy_data is None or len(strategy_data) < 2:
         fig = go.Figure()
         fig.update_layout(title=f'{ticker_symbol} - Not Enough Data', xaxis_visible=False, yaxis_visible=False)
@@ -66,15 +100,29 @@ def plot_stock_chart(strategy_data, ticker_symbol):
         fig.add_hline(y=70, line_dash="dash", line_color="red", row=3, col=1)
         fig.add_hline(y=30, line_dash="dash", line_color="blue", row=3, col=1)
 
+    if events is not None and not events.empty:
+        # Indexed signal events on the bars they happened, e.g. recommendation changes and crossovers
+        dates = naive_dates(strategy_data.index)
+        events = events[events['Date'].isin(dates)]
+        for label, color, symbol in (("Bullish", "green", "triangle-up"), ("Bearish", "red", "triangle-down")):
+            subset = events[events['To'].isin(['Strong Buy', 'Bullish']) if label == "Bullish" else events['To'].isin(['Neutral/Sell', 'Bearish'])]
+            if subset.empty: continue
+            x = strategy_data.index[dates.get_indexer(subset['Date'])]
+            fig.add_trace(go.Scatter(x=x, y=subset['Close'], mode='markers', name=f'{label} Events', marker=dict(color=color, symbol=symbol, size=10),
+                                     text=subset['Signal'] + ': ' + subset['To'], hovertemplate='%{text}<extra></extra>'), row=1, col=1)
+
     fig.update_layout(title_text=chart_title, height=800, showlegend=True)
     fig.update_yaxes(title_text="Price", row=1, col=1), fig.update_yaxes(title_text="MACD", row=2, col=1), fig.update_yaxes(title_text="RSI", row=3, col=1)
     fig.update_xaxes(rangeslider_visible=True, row=1, col=1)
     return fig
 
-def display_detailed_view(ticker, total_capital, risk_percent, analysis_function):
+def display_detailed_view(ticker, total_capital, risk_percent, analysis_function, timeframe="1d"):
     try:
-        with st.spinner(f"Fetching data for {ticker}..."):
-            stock_data = fetch_daily_bars(ticker)
+        with st.spinner(f"Fetching data for {ticker}..."), span("fetch", ticker):
+            if timeframe == "1d":
+                stock_data = shared_bars(ticker, priority=INTERACTIVE)
+            else:
+                stock_data = get_bars(ticker, timeframe=timeframe, priority=INTERACTIVE)
         
         if stock_data.empty:
             st.warning("No data found for this ticker.")
@@ -111,55 +159,107 @@ def display_detailed_view(ticker, total_capital, risk_percent, analysis_function
                     position_size = capital_to_risk / risk_per_share
                     st.metric("Suggested Shares", f"{position_size:.2f}", help=f"Risking {risk_percent}% of ${total_capital:,.2f}")
 
-        with col2:
-            fig = plot_stock_chart(strategy_data, ticker)
+        events = load_events([ticker], kinds=['recommendation', 'crossover']) if timeframe == "1d" else None
+        with col2, span("render", ticker):
+            fig = plot_stock_chart(strategy_data, ticker, events)
             st.plotly_chart(fig, use_container_width=True)
         
+        if events is not None and not events.empty:
+            with st.expander("Signal History"):
+                st.dataframe(events.iloc[::-1].drop(columns=['Ticker']), use_container_width=True)
         with st.expander("View Full Data and Signals"):
             st.dataframe(strategy_data)
     except Exception as e:
         st.error(f"An error occurred while analyzing {ticker}."), st.exception(e)
 
-@st.cache_data
+def evaluate_latest(strategy, data, ticker):
+    """Latest-bar record for list views that only show the newest signal (None without enough history)."""
+    if strategy == "Trend-Following":
+        with span("fetch", ticker):
+            market_bars = shared_bars(market_index_for(ticker), period="3mo")
+        return analyze_stock_latest(data, ticker, market_bars)
+    return analyze_stock_mean_reversion_latest(data, ticker)
+
+def portfolio_key(portfolio):
+    """Hashable snapshot of the holdings so cached valuations follow edits to the mutable list."""
+    return tuple((h["ticker"], float(h["quantity"]), float(h["gav"])) for h in portfolio)
+
+@st.cache_data(ttl=900)
+def value_portfolio_cached(positions):
+    holdings = [{"ticker": t, "quantity": q, "gav": g} for t, q, g in positions]
+    engine, valuation = value_portfolio(holdings)
+    return valuation, engine.summary(valuation) if not valuation.empty else (0, 0, 0, 0)
+
+@st.cache_data(ttl=3600)
+def equity_curve_cached(positions, period="2y"):
+    holdings = [{"ticker": t, "quantity": q, "gav": g} for t, q, g in positions]
+    return portfolio_equity_curve(holdings, period=period)
+
 def calculate_portfolio_summary(portfolio):
-    total_value_sek, total_investment_sek = 0, 0
     if not portfolio:
         return 0, 0, 0, 0
-    for holding in portfolio:
-        try:
-            currency = yf.Ticker(holding["ticker"]).info.get('currency', 'SEK')
-            data = fetch_daily_bars(holding["ticker"], period="5d")
-            if not data.empty:
-                current_price = data['Close'].iloc[-1]
-                fx_rate = get_fx_rate(currency, 'SEK')
-                if fx_rate is None: fx_rate = 1.0
-                total_investment_sek += (holding["quantity"] * holding["gav"]) * fx_rate
-                total_value_sek += (holding["quantity"] * current_price) * fx_rate
-        except Exception:
-            continue
-    total_pl_sek = total_value_sek - total_investment_sek
-    total_pl_pct = (total_pl_sek / total_investment_sek) * 100 if total_investment_sek != 0 else 0
-    return total_value_sek, total_investment_sek, total_pl_sek, total_pl_pct
-
-def generate_pros_cons(data):
-    pros, cons = [], []
-    last_row = data.iloc[-1]
-    if last_row.get('Signal_Score', 0) >= 5: pros.append(f"High Signal Score ({int(last_row['Signal_Score'])}/7)")
-    if last_row.get('SMA_10', 0) > last_row.get('SMA_50', 0): pros.append("Positive Trend (SMA10 > SMA50)")
-    if last_row.get('MACDh_12_26_9', 0) > 0: pros.append("Increasing Momentum (MACD > 0)")
-    if last_row.get('Relative_Strength', 0) > 0: pros.append("Outperforming Market")
-    if last_row.get('RSI_14', 100) < 60: pros.append("Not Overbought (RSI < 60)")
-    if last_row.get('RSI_14', 0) > 70: cons.append("Nearing Overbought (RSI > 70)")
-    atr_percent = (last_row.get('ATRr_14', 0) / last_row.get('Close', 1)) * 100
-    if atr_percent > 4: cons.append(f"High Volatility (ATR is {atr_percent:.1f}%)")
-    if not pros: pros.append("No outstanding positive indicators.")
-    if not cons: cons.append("No significant negative indicators.")
-    return pros, cons
+    _, summary = value_portfolio_cached(portfolio_key(portfolio))
+    return summary
+
+@st.cache_data(ttl=3600)
+def get_return_panel(tickers, period="2y"):
+    return build_return_panel(list(tickers), period=period)
+
+@st.cache_resource
+def get_covariance_tracker(tickers, period):
+    """One tracker per instrument set and history, shared across reruns; each update rolls it to the return panel's window."""
+    return CovarianceTracker(tickers)
+
+@contextlib.contextmanager
+def scan_trace(name):
+    """Traces one scan when diagnostics are switched on, profiling it if a profile was requested."""
+    enabled = st.session_state.get('tracing_enabled', False)
+    profile = enabled and st.session_state.pop('profile_pending', False)
+    with trace(name, enabled=enabled, profile=profile) as current:
+        yield current
+    if current is not None:
+        st.session_state.traces = ([current] + st.session_state.get('traces', []))[:10]
+
+def render_diagnostics(rerun_started):
+    st.header("Diagnostics")
+    st.checkbox("Trace scans", key="tracing_enabled", help="Time fetch, indicator, scoring, backtest and render stages per ticker.")
+    if st.session_state.get('tracing_enabled'):
+        st.button("Profile next scan", on_click=lambda: st.session_state.update(profile_pending=True), help="Run the next traced scan under cProfile.")
+        if st.session_state.get('profile_pending'):
+            st.caption("The next scan will be profiled.")
+    st.caption(f"This rerun: {(time.perf_counter() - rerun_started) * 1000:,.0f} ms")
+    cache = default_cache.stats()
+    st.caption(f"Shared bar cache: {cache['tickers']} tickers · {cache['mb']:.1f} MB · {cache['hits']} hits / {cache['misses']} misses")
+    traces = st.session_state.get('traces', [])
+    if not traces:
+        return
+    names = [f"{t.name} · {t.started.tz_convert(None):%H:%M:%S}" for t in traces]
+    selected = traces[names.index(st.selectbox("Trace", names))]
+    st.caption(f"{selected.duration:,.0f} ms total · {len(selected.spans)} spans")
+    st.dataframe(selected.aggregate().round(1), use_container_width=True)
+    per_ticker = selected.per_ticker()
+    if not per_ticker.empty:
+        with st.expander("Per ticker (ms)"):
+            st.dataframe(per_ticker.round(1), use_container_width=True)
+    if selected.profile:
+        with st.expander("Profile"):
+            st.code(selected.profile)
+    st.download_button("Export Trace (JSONL)", selected.to_jsonl(), f"trace_{selected.id}.jsonl", "application/json")
+
+def plot_contributions(contributions, features=None, top=8):
+    """Horizontal bar chart of the features that moved one ML prediction most, in log-odds."""
+    values = contributions.drop('Bias').sort_values(key=abs, ascending=False).head(top).iloc[::-1]
+    labels = [f"{name} = {features[name]:,.2f}" if features is not None else name for name in values.index]
+    fig = go.Figure(go.Bar(x=values.to_numpy(), y=labels, orientation='h', marker_color=['green' if v > 0 else 'red' for v in values]))
+    fig.update_layout(height=40 * len(values) + 80, margin=dict(l=10, r=10, t=30, b=10), xaxis_title="Contribution (log-odds)",
+                      title_text=f"Base value {contributions['Bias']:+.2f}, total {contributions.sum():+.2f}")
+    return fig
 
 def run_app():
+    rerun_started = time.perf_counter()
     st.set_page_config(page_title="Trading Dashboard", layout="wide")
 
-    for key in ['portfolio', 'watchlist', 'screener_view_ticker', 'recommendations', 'found_pairs', 'ml_recommendations', 'ml_scan_run']:
+    for key in ['portfolio', 'watchlist', 'screener_view_ticker', 'recommendations', 'found_pairs', 'ml_recommendations', 'ml_scan_run', 'custom_screen_results']:
         if key not in st.session_state:
             if key == 'ml_scan_run': st.session_state[key] = False
             else: st.session_state[key] = [] if ('list' in key or 'portfolio' in key) else None if 'ticker' in key else pd.DataFrame()
@@ -192,13 +292,14 @@ def run_app():
     st.title(f"Nordic Market Analysis ({selected_strategy})")
     
     model = load_model()
+    start_precompute_scheduler()
 
     if selected_strategy == "Mean-Reversion":
         analysis_function = analyze_stock_mean_reversion
     else:
         analysis_function = analyze_stock
 
-    tabs = st.tabs(["🏠 Dashboard", "📈 Screener", "💡 ML Suggestions", "🔍 Individual Analysis", "💼 Portfolio", "🔭 Watchlist", "🧪 Backtester", "➗ Pairs Trading"])
+    tabs = st.tabs(["🏠 Dashboard", "📈 Screener", "💡 ML Suggestions", "🔍 Individual Analysis", "💼 Portfolio", "🔭 Watchlist", "🛡️ Risk", "🧪 Backtester", "➗ Pairs Trading"])
 
     with tabs[0]:
         st.header("At-a-Glance Summary")
@@ -217,38 +318,84 @@ def run_app():
                 st.metric("Signals Found", "N/A", help="Run a scan in the 'Screener' tab.")
         st.write("---")
         st.subheader("Market Context: OMXS30")
-        omx_data = fetch_daily_bars("^OMX", period="6mo")
+        omx_data = shared_bars("^OMX", period="6mo", priority=INTERACTIVE)
         if not omx_data.empty: st.line_chart(omx_data['Close'])
 
     with tabs[1]:
         st.header("Nordic Index Screener")
         if st.session_state.screener_view_ticker:
             st.subheader(f"Analysis for {st.session_state.screener_view_ticker}")
-            display_detailed_view(st.session_state.screener_view_ticker, total_capital, risk_percent, analysis_function)
+            with scan_trace(f"Detail: {st.session_state.screener_view_ticker}"):
+                display_detailed_view(st.session_state.screener_view_ticker, total_capital, risk_percent, analysis_function)
             if st.button("⬅️ Back to Screener Results"):
                 st.session_state.screener_view_ticker = None; st.rerun()
         else:
             nordic_indices = get_nordic_indices()
             selected_index = st.selectbox("Select an Index to Scan:", options=list(nordic_indices.keys()))
+            snapshot = current_snapshot(selected_index)
+            if snapshot is not None:
+                st.caption(f"Precomputed for the {snapshot['bar']:%Y-%m-%d %H:%M} bar at {snapshot['created'].tz_convert(None):%Y-%m-%d %H:%M} UTC.")
+                use_snapshot = not st.checkbox("Recompute live", key="screener_live")
+            else:
+                use_snapshot = False
             if st.button(f"Scan {selected_index} for Signals", type="primary"):
                 tickers_to_scan = nordic_indices[selected_index]
                 signals = []
-                progress_bar = st.progress(0)
-                for i, ticker in enumerate(tickers_to_scan):
-                    progress_bar.progress((i + 1) / len(tickers_to_scan), f"Scanning {ticker}...")
-                    try:
-                        data = fetch_daily_bars(ticker, period="1y")
-                        if not data.empty and len(data) > 50:
-                            strategy_data = analysis_function(data, ticker) if selected_strategy == "Trend-Following" else analysis_function(data)
-                            last_row = strategy_data.iloc[-1]
-                            if "Buy" in last_row['Recommendation']:
-                                row_data = {'Ticker': ticker, 'Recommendation': last_row['Recommendation']}
-                                if 'Signal_Score' in last_row: row_data['Signal Score'] = f"{int(last_row['Signal_Score'])}/7"
-                                signals.append(row_data)
-                    except Exception: continue
-                progress_bar.empty()
+                if use_snapshot:
+                    signals = buy_signals(snapshot['trend' if selected_strategy == "Trend-Following" else 'mean_reversion'])
+                else:
+                    progress_bar = st.progress(0)
+                    with scan_trace(f"Screener: {selected_index} ({selected_strategy})"):
+                        for i, ticker in enumerate(tickers_to_scan):
+                            progress_bar.progress((i + 1) / len(tickers_to_scan), f"Scanning {ticker}...")
+                            with span("scan", ticker):
+                                try:
+                                    with span("fetch"):
+                                        data = shared_bars(ticker, period="1y")
+                                    if not data.empty and len(data) > 50:
+                                        last_row = evaluate_latest(selected_strategy, data, ticker)
+                                        if "Buy" in last_row['Recommendation']:
+                                            row_data = {'Ticker': ticker, 'Recommendation': last_row['Recommendation']}
+                                            if 'Signal_Score' in last_row: row_data['Signal Score'] = f"{int(last_row['Signal_Score'])}/7"
+                                            signals.append(row_data)
+                                except Exception: continue
+                    progress_bar.empty()
                 st.session_state.recommendations = pd.DataFrame(signals)
 
+            with st.expander("Custom Screen"):
+                st.caption("Rules compare OHLCV fields, numbers or indicators (SMA_10, EMA_20, RSI_14, MACDh_12_26_9, BBL_20_2.0, ATRr_14, OBV, SMA_10(OBV)) with >, <, >=, <=, crosses_above or crosses_below.")
+                screen_text = st.text_area("Screen definition (JSON)", json.dumps(TREND_FOLLOWING_SCREEN, indent=2), height=300)
+                if st.button(f"Run Custom Screen on {selected_index}"):
+                    try:
+                        screen = compile_screen(json.loads(screen_text))
+                        with scan_trace(f"Custom screen: {selected_index}"):
+                            with st.spinner("Fetching data..."):
+                                bars = {}
+                                for t in nordic_indices[selected_index]:
+                                    with span("fetch", t):
+                                        bars[t] = shared_bars(t, period="1y")
+                            with span("scoring"):
+                                st.session_state.custom_screen_results = run_screen(bars, screen)
+                    except (ValueError, KeyError) as e:
+                        st.error(f"Invalid screen: {e}")
+                results = st.session_state.custom_screen_results
+                if not results.empty:
+                    st.metric("Tickers Passing", int(results['Passed'].sum()))
+                    st.dataframe(results.sort_values(by=['Passed', 'Score'], ascending=False), use_container_width=True)
+
+            with st.expander("Signal History"):
+                st.caption("Lookups in the signal-event index, updated after each close (`python -m screening.events`).")
+                since = st.date_input("Since", value=pd.Timestamp.now().normalize() - pd.Timedelta(days=7), key="events_since")
+                index_events = load_events(nordic_indices[selected_index], since=since)
+                if index_events.empty:
+                    st.info("No indexed events for this index in that period.")
+                else:
+                    st.dataframe(index_events.groupby(['Kind', 'Signal', 'To'])['Ticker'].nunique().rename('Tickers').reset_index(), use_container_width=True)
+                    st.dataframe(index_events.iloc[::-1], use_container_width=True)
+                    if st.button("Compute Hit Rates", key="events_hit_rates"):
+                        with st.spinner("Loading closing prices..."):
+                            st.dataframe(hit_rates(load_events(nordic_indices[selected_index])), use_container_width=True)
+
             if not st.session_state.recommendations.empty:
                 df = st.session_state.recommendations
                 st.metric(f"'{selected_strategy}' Signals Found", len(df))
@@ -257,6 +404,8 @@ def run_app():
                     with st.container(border=True):
                         c1, c2, c3, c4 = st.columns([2.5, 1, 1, 1])
                         c1.subheader(row['Ticker'])
+                        since = last_event(row['Ticker'], 'recommendation', to=row['Recommendation']) if selected_strategy == "Trend-Following" else None
+                        if since is not None: c1.caption(f"{row['Recommendation']} since {since['Date']:%Y-%m-%d}")
                         c2.info(row['Recommendation'])
                         if 'Signal Score' in row: c3.metric("Signal Score", row['Signal Score'])
                         if c4.button("Analyze", key=row['Ticker']):
@@ -275,25 +424,53 @@ def run_app():
             index_to_scan = c2.selectbox("Select Index to Scan:", list(nordic_indices.keys()), key="ml_suggestion_index")
             confidence_threshold = st.slider("Minimum Confidence (%)", 0, 100, 70)
 
+            snapshot = current_snapshot(index_to_scan, current_model_version())
+            if snapshot is not None:
+                st.caption(f"Precomputed for the {snapshot['bar']:%Y-%m-%d} close with model v{snapshot['model_version']}.")
+
             if st.button("Find ML-Powered Opportunities", type="primary"):
                 st.session_state.ml_scan_run = True
                 tickers = nordic_indices[index_to_scan]
                 ml_buys_list = []
-                with st.spinner(f"Scanning {index_to_scan} with ML model..."):
-                    progress_bar = st.progress(0)
-                    for i, ticker in enumerate(tickers):
-                        progress_bar.progress((i + 1) / len(tickers), f"Scanning {ticker}...")
-                        try:
-                            data = fetch_daily_bars(ticker, period="1y")
-                            if not data.empty and len(data) > 50:
-                                ml_data = analyze_stock_ml(data.copy(), model)
-                                if not ml_data.empty:
-                                    last_row_ml = ml_data.iloc[-1]
-                                    if last_row_ml['ML_Prediction'] == 1 and last_row_ml['ML_Confidence'] * 100 >= confidence_threshold:
-                                        rule_data = analyze_stock(data.copy(), ticker)
-                                        ml_buys_list.append({"Ticker": ticker, "Data": rule_data.iloc[-1], "Confidence": last_row_ml['ML_Confidence']})
-                        except Exception: continue
-                progress_bar.empty()
+                if snapshot is not None:
+                    features, contributions = snapshot.get('ml_features', pd.DataFrame()), snapshot.get('ml_contributions', pd.DataFrame())
+                    for last_row in snapshot['ml'].to_dict('records'):
+                        if last_row['ML_Prediction'] == 1 and last_row['ML_Confidence'] * 100 >= confidence_threshold:
+                            explained = last_row['Ticker'] in contributions.index
+                            ml_buys_list.append({"Ticker": last_row['Ticker'], "Data": last_row, "Confidence": last_row['ML_Confidence'],
+                                                 "Contributions": contributions.loc[last_row['Ticker']] if explained else None,
+                                                 "Features": features.loc[last_row['Ticker']] if explained else None})
+                else:
+                    with st.spinner(f"Scanning {index_to_scan} with ML model..."):
+                        progress_bar = st.progress(0)
+                        bars, feature_rows = {}, []
+                        model_features = model.get_booster().feature_names
+                        with scan_trace(f"ML scan: {index_to_scan}"):
+                            for i, ticker in enumerate(tickers):
+                                progress_bar.progress((i + 1) / len(tickers), f"Scanning {ticker}...")
+                                with span("scan", ticker):
+                                    try:
+                                        with span("fetch"):
+                                            data = shared_bars(ticker, period=ML_PERIOD)
+                                        if not data.empty and len(data) > 50:
+                                            with span("indicator"):
+                                                latest = ml_features(data, model_features)
+                                            if not latest.empty:
+                                                bars[ticker] = data
+                                                feature_rows.append(latest.set_axis([ticker]))
+                                    except Exception: continue
+                            # One batched prediction, with every row's feature contributions, for the whole index
+                            if feature_rows:
+                                features = pd.concat(feature_rows)
+                                predictions, contributions = explain_ml_batch(features, model)
+                                for ticker, prediction in predictions.iterrows():
+                                    if prediction['ML_Prediction'] == 1 and prediction['ML_Confidence'] * 100 >= confidence_threshold:
+                                        try:
+                                            rule_data = evaluate_latest("Trend-Following", bars[ticker], ticker)
+                                        except Exception: continue
+                                        ml_buys_list.append({"Ticker": ticker, "Data": rule_data, "Confidence": prediction['ML_Confidence'],
+                                                             "Contributions": contributions.loc[ticker], "Features": features.loc[ticker]})
+                        progress_bar.empty()
                 st.session_state.ml_recommendations = pd.DataFrame(ml_buys_list)
                 st.rerun()
 
@@ -311,6 +488,10 @@ def run_app():
                             c1, c2, c3, c4 = st.columns(4)
                             c1.metric("Entry Price", f"{last_row['Close']:.2f}"), c2.metric("Stop-Loss", f"{last_row['Stop_Loss']:.2f}"),
                             c3.metric("Take-Profit", f"{last_row['Take_Profit']:.2f}"), c4.metric(f"Shares for {investment_amount}", f"{shares:.2f}")
+                            if isinstance(row.get('Contributions'), pd.Series):
+                                with st.expander("Why the model suggests it"):
+                                    st.plotly_chart(plot_contributions(row['Contributions'], row['Features']), use_container_width=True, key=f"ml_contrib_{ticker}")
+                                    st.caption("TreeSHAP contributions of each feature to this prediction, in log-odds; green pushes towards a buy.")
                 else:
                     st.warning("Scan complete. No stocks currently meet the specified criteria.")
             else:
@@ -318,9 +499,12 @@ def run_app():
 
     with tabs[3]:
         st.header("🔍 Deep-Dive on a Single Stock")
-        custom_ticker = st.text_input("Enter Any Ticker", key="custom_ticker").upper()
+        c1, c2 = st.columns([3, 1])
+        custom_ticker = c1.text_input("Enter Any Ticker", key="custom_ticker").upper()
+        timeframe = c2.selectbox("Timeframe", ["1d", "1h", "30m", "15m", "5m"], key="custom_timeframe")
         if custom_ticker:
-            display_detailed_view(custom_ticker, total_capital, risk_percent, analysis_function)
+            with scan_trace(f"Detail: {custom_ticker} ({timeframe})"):
+                display_detailed_view(custom_ticker, total_capital, risk_percent, analysis_function, timeframe=timeframe)
 
     with tabs[4]:
         st.header("💼 My Portfolio Tracker")
@@ -332,33 +516,20 @@ def run_app():
                     st.session_state.portfolio.append({"ticker": ticker, "quantity": qty, "gav": gav}); st.success(f"Added {ticker}!")
         
         if st.session_state.portfolio:
-            portfolio_data, total_value_sek, total_investment_sek = [], 0, 0
             with st.spinner("Updating portfolio with FX rates..."):
-                for holding in st.session_state.portfolio:
+                positions = portfolio_key(st.session_state.portfolio)
+                valuation, (total_value_sek, total_investment_sek, total_pl_sek, total_pl_pct) = value_portfolio_cached(positions)
+                suggestions = {}
+                for ticker in valuation.loc[valuation["Price (Local)"].notna(), "Ticker"].unique():
                     try:
-                        info = yf.Ticker(holding["ticker"]).info
-                        currency = info.get('currency', 'SEK')
-                        data = fetch_daily_bars(holding["ticker"])
+                        data = shared_bars(ticker, priority=INTERACTIVE)
                         if data.empty: continue
-                        strategy_data = analysis_function(data, holding["ticker"]) if selected_strategy == "Trend-Following" else analysis_function(data)
-                        last_row = strategy_data.iloc[-1]
-                        current_price, inv_local = last_row['Close'], holding["quantity"] * holding["gav"]
-                        val_local = holding["quantity"] * current_price
-                        fx_rate = get_fx_rate(currency, 'SEK')
-                        if fx_rate is None: fx_rate = 1.0
-                        val_sek, inv_sek = val_local * fx_rate, inv_local * fx_rate
-                        pl_sek, pl_pct = val_sek - inv_sek, (val_sek / inv_sek - 1) * 100 if inv_sek != 0 else 0
-                        portfolio_data.append({
-                            "Ticker": holding["ticker"], "Qty": holding["quantity"], "Currency": currency,
-                            "GAV (Local)": f"{holding['gav']:.2f}", "Price (Local)": f"{current_price:.2f}",
-                            "Value (SEK)": f"{val_sek:,.2f}", "P/L (SEK)": f"{pl_sek:,.2f}",
-                            "P/L %": f"{pl_pct:.2f}%", "Suggestion": last_row['Recommendation']
-                        })
-                        total_value_sek, total_investment_sek = total_value_sek + val_sek, total_investment_sek + inv_sek
+                        suggestions[ticker] = evaluate_latest(selected_strategy, data, ticker)['Recommendation']
                     except Exception: continue
-            
-            if portfolio_data:
-                total_pl_sek, total_pl_pct = total_value_sek - total_investment_sek, (total_value_sek / total_investment_sek - 1) * 100 if total_investment_sek != 0 else 0
+            portfolio_data = valuation[valuation["Price (Local)"].notna()].drop(columns=["Invested (SEK)"]).copy()
+            portfolio_data["Suggestion"] = portfolio_data["Ticker"].map(suggestions)
+
+            if not portfolio_data.empty:
                 c1, c2, c3 = st.columns(3)
                 c1.metric("Total Portfolio Value", f"{total_value_sek:,.2f} SEK"), c2.metric("Total P/L", f"{total_pl_sek:,.2f} SEK"), c3.metric("Total P/L %", f"{total_pl_pct:.2f}%")
                 st.write("---")
@@ -368,8 +539,15 @@ def run_app():
                         try: num = float(str(val))
                         except (ValueError, TypeError): return ''
                         return f'color: {"green" if num > 0 else "red" if num < 0 else "white"}'
-                    return df.style.format({"P/L %": "{:.2f}%"}).applymap(lambda v: color(v, sugg=True), subset=['Suggestion']).applymap(lambda v: color(v, sugg=False), subset=['P/L (SEK)', 'P/L %'])
-                st.dataframe(style_table(pd.DataFrame(portfolio_data)), use_container_width=True)
+                    formats = {"GAV (Local)": "{:.2f}", "Price (Local)": "{:.2f}", "Value (SEK)": "{:,.2f}", "P/L (SEK)": "{:,.2f}", "P/L %": "{:.2f}%", "Weight %": "{:.2f}%"}
+                    return df.style.format(formats).applymap(lambda v: color(v, sugg=True), subset=['Suggestion']).applymap(lambda v: color(v, sugg=False), subset=['P/L (SEK)', 'P/L %'])
+                st.dataframe(style_table(portfolio_data), use_container_width=True)
+
+                st.subheader("Historical Equity Curve (SEK)")
+                equity_curve = equity_curve_cached(positions)
+                if not equity_curve.empty:
+                    st.line_chart(equity_curve)
+                    st.caption("Assumes current quantities were held over the whole period.")
 
                 st.write("---")
                 st.subheader("Manage & Analyze Portfolio")
@@ -402,10 +580,9 @@ def run_app():
             with st.spinner("Updating watchlist..."):
                 for ticker in st.session_state.watchlist:
                     try:
-                        data = fetch_daily_bars(ticker, period="1y")
+                        data = shared_bars(ticker, period="1y", priority=INTERACTIVE)
                         if data.empty: continue
-                        strategy_data = analysis_function(data, ticker) if selected_strategy == "Trend-Following" else analysis_function(data)
-                        last_row = strategy_data.iloc[-1]
+                        last_row = evaluate_latest(selected_strategy, data, ticker)
                         row_data = {"Ticker": ticker, "Recommendation": last_row['Recommendation']}
                         if 'Signal_Score' in last_row: row_data['Signal Score'] = f"{int(last_row['Signal_Score'])}/7"
                         if 'Close' in last_row: row_data['Current Price'] = f"{last_row['Close']:.2f}"
@@ -424,15 +601,55 @@ def run_app():
                 display_detailed_view(selected_ticker_wl, total_capital, risk_percent, analysis_function)
                 if st.button("Remove from Watchlist"):
                     st.session_state.watchlist.remove(selected_ticker_wl); st.warning(f"Removed {selected_ticker_wl}."); st.rerun()
-    with tabs[6]: # Backtester
+    with tabs[6]:
+        st.header("🛡️ Portfolio Risk")
+        holdings_tickers = list(dict.fromkeys(h['ticker'] for h in st.session_state.portfolio))
+        risk_tickers = tuple(dict.fromkeys(holdings_tickers + st.session_state.watchlist))
+        if len(risk_tickers) < 2:
+            st.info("Add at least two holdings or watchlist stocks to see portfolio risk.")
+        else:
+            c1, c2 = st.columns(2)
+            confidence = c1.select_slider("VaR Confidence", options=[0.90, 0.95, 0.975, 0.99], value=0.95)
+            risk_period = c2.selectbox("History", ["1y", "2y", "5y"], index=1)
+            with st.spinner("Building return panel..."):
+                returns = get_return_panel(risk_tickers, period=risk_period)
+                tracker = get_covariance_tracker(risk_tickers, risk_period)
+                tracker.update(returns)
+
+            if holdings_tickers:
+                valuation, (total_value_sek, _, _, _) = value_portfolio_cached(portfolio_key(st.session_state.portfolio))
+                weights = valuation.groupby("Ticker")["Value (SEK)"].sum() / total_value_sek if total_value_sek else pd.Series(dtype=float)
+                if not weights.empty:
+                    summary, contributions = portfolio_risk_report(tracker, returns, weights, confidence=confidence)
+                    c1, c2, c3, c4, c5 = st.columns(5)
+                    c1.metric("Volatility (ann.)", f"{summary['Volatility (ann.)']:.2%}")
+                    c2.metric("Historical VaR (1d)", f"{summary['Historical VaR']:.2%}", help=f"{summary['Historical VaR'] * total_value_sek:,.0f} SEK")
+                    c3.metric("Historical CVaR (1d)", f"{summary['Historical CVaR']:.2%}", help=f"{summary['Historical CVaR'] * total_value_sek:,.0f} SEK")
+                    c4.metric("Parametric VaR (1d)", f"{summary['Parametric VaR']:.2%}", help=f"{summary['Parametric VaR'] * total_value_sek:,.0f} SEK")
+                    c5.metric("Parametric CVaR (1d)", f"{summary['Parametric CVaR']:.2%}", help=f"{summary['Parametric CVaR'] * total_value_sek:,.0f} SEK")
+                    st.subheader("Risk Contribution per Holding")
+                    st.dataframe(contributions.style.format("{:.2f}"), use_container_width=True)
+                    st.caption("Based on daily returns in each instrument's local currency.")
+
+            st.subheader("Return Correlation")
+            corr = tracker.correlation()
+            fig = go.Figure(go.Heatmap(z=corr.values, x=corr.columns, y=corr.index, zmin=-1, zmax=1, colorscale="RdBu"))
+            fig.update_layout(height=max(400, 20 * len(corr)))
+            st.plotly_chart(fig, use_container_width=True)
+    with tabs[7]: # Backtester
         st.header("Strategy Backtester")
         with st.form("backtest_form"):
             c1, c2, c3 = st.columns(3)
             ticker, start_date, end_date = c1.text_input("Ticker", "AAPL").upper(), c2.date_input("Start Date", pd.to_datetime("2023-01-01")), c3.date_input("End Date", pd.to_datetime("2024-01-01"))
+            c1, c2, c3 = st.columns(3)
+            mc_paths = c1.number_input("Monte Carlo Paths", 0, 100000, 20000, step=5000, help="0 skips the robustness analysis.")
+            mc_block = c2.number_input("Bootstrap Block (bars)", 1, 250, 20)
+            mc_slippage = c3.number_input("Max Entry Slippage (bps)", 0, 500, 20)
             if st.form_submit_button("Run Backtest"):
                 with st.spinner(f"Running backtest..."):
                     try:
-                        stats, script, div = run_backtest(ticker, start_date, end_date, selected_strategy)
+                        with scan_trace(f"Backtest: {ticker} ({selected_strategy})"):
+                            stats, script, div = run_backtest(ticker, start_date, end_date, selected_strategy)
                         if stats is not None:
                             st.success("Backtest complete!")
                             st.subheader("Key Performance Metrics")
@@ -451,11 +668,24 @@ def run_app():
                                 st.warning("No plot generated (no trades made).")
                             with st.expander("View Full Statistics Table"): 
                                 st.write(stats)
+
+                            if mc_paths:
+                                st.subheader("Monte Carlo Robustness")
+                                with span("monte_carlo", ticker):
+                                    simulations = monte_carlo(stats, n_paths=int(mc_paths), block=int(mc_block), max_slippage_bps=mc_slippage)
+                                st.caption("Shuffle: closed trades in random order. Bootstrap: blocks of daily equity returns resampled. Slippage: every entry filled up to the set slippage worse.")
+                                st.dataframe(summarize(simulations, stats).round(2), use_container_width=True)
+                                c1, c2 = st.columns(2)
+                                for column, metric in ((c1, 'Return [%]'), (c2, 'Max. Drawdown [%]')):
+                                    fig = go.Figure([go.Histogram(x=paths[metric], name=method, opacity=0.6) for method, paths in simulations.items()])
+                                    fig.add_vline(x=stats[metric], line_dash="dash", annotation_text="Backtest")
+                                    fig.update_layout(title=metric, barmode="overlay", height=350)
+                                    column.plotly_chart(fig, use_container_width=True)
                         else: 
                             st.error("Could not fetch data.")
                     except ValueError as e: 
                         st.error(e)    
-    with tabs[7]:
+    with tabs[8]:
         st.header("➗ Pairs Trading Screener")
         nordic_indices = get_nordic_indices()
         index_to_scan = st.selectbox("Select an Index to Find Pairs In:", options=list(nordic_indices.keys()), key="pairs_index")
@@ -485,5 +715,9 @@ def run_app():
             else:
                 st.warning("No cointegrated pairs found in this index.")
 
+    with st.sidebar:
+        st.write("---")
+        render_diagnostics(rerun_started)
+
 if __name__ == "__main__":
     run_app()